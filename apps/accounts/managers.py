@@ -11,11 +11,12 @@ class UserManager(BaseUserManager):
 		schema = getattr(connection, "schema_name", "") or ""
 		if schema and schema != "public":
 			try:
+				from apps.entitlements.gauges import GAUGE_USERS, get_usage_gauge
 				from apps.entitlements.services import QUOTA_MAX_USERS, enforce_quota, get_tenant_by_schema
 
 				tenant_row = get_tenant_by_schema(schema)
 				if tenant_row:
-					used = self.model.objects.count()
+					used = get_usage_gauge(tenant_row, GAUGE_USERS)
 					enforce_quota(
 						tenant_row,
 						key=QUOTA_MAX_USERS,
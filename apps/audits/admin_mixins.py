@@ -3,7 +3,7 @@ from __future__ import annotations
 from django.contrib import admin
 
 from apps.audits.services import audit_log
-from apps.audits.utils import model_diff
+from apps.audits.utils import track_changes, tracked_changes
 
 
 class AdminAuditMixin(admin.ModelAdmin):
@@ -16,25 +16,20 @@ class AdminAuditMixin(admin.ModelAdmin):
 	audit_action_prefix = "admin"
 	audit_exclude_fields = set()
 	
+	def __init__(self, model, admin_site):
+		super().__init__(model, admin_site)
+		track_changes(model)
+	
 	def save_model(self, request, obj, form, change):
-		previous = None
-		if change and obj.pk:
-			try:
-				previous = obj.__class__.objects.get(pk=obj.pk)
-			except obj.__class__.DoesNotExist:
-				previous = None
+		# Diff against the values snapshotted when the admin loaded obj (no re-fetch).
+		changes = tracked_changes(obj) if change else {}
+		for f in list(changes.keys()):
+			# allow opt-out fields
+			if f in self.audit_exclude_fields:
+				changes.pop(f, None)
 		
 		super().save_model(request, obj, form, change)
 		
-		changes = {}
-		if change and previous is not None:
-			changes = model_diff(obj, previous)
-			
-			# allow opt-out fields
-			for f in list(changes.keys()):
-				if f in self.audit_exclude_fields:
-					changes.pop(f, None)
-		
 		audit_log(
 			action=f"{self.audit_action_prefix}.{'updated' if change else 'created'}",
 			obj=obj,
@@ -10,20 +10,25 @@ class AuditsConfig(AppConfig):
         # Import signal modules ONLY when Django app registry is ready.
         # Production-grade default: audit CRUD across the whole project.
         # We auto-register all models in the local "apps.*" namespace, excluding:
-        # - AuditEvent itself (avoid recursion)
+        # - AuditEvent / AuditOutbox themselves (avoid recursion)
         # - auto-created / proxy models (noise)
+        # - AUDIT_EXCLUDED_MODELS (log / telemetry tables written on every request)
+        # Receivers are connected per audited model, so other models pay nothing.
         from django.apps import apps as django_apps
 
+        from apps.audits.batch import connect_celery_signals
         from apps.audits.model_audit import register_model
-        from apps.audits.models import AuditEvent
+        from apps.audits.models import AuditEvent, AuditOutbox
 
         from . import (
             auth_signals,  # noqa: F401
             model_audit,  # noqa: F401
         )
 
+        connect_celery_signals()
+
         for model in django_apps.get_models():
-            if model is AuditEvent:
+            if model in (AuditEvent, AuditOutbox):
                 continue
             if model._meta.auto_created or model._meta.proxy:
                 continue
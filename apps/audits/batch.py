@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+from apps.logs.prometheus import record_audit_write
+
+from .models import AuditEvent
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+log = logging.getLogger(__name__)
+
+# Committed audit events waiting for one bulk_create per schema (request / task scope).
+_batch: ContextVar[list[tuple[str, AuditEvent]] | None] = ContextVar("audit_batch", default=None)
+
+
+def enqueue_audit_event(event: AuditEvent) -> None:
+	# on_commit callback: callbacks of rolled-back transactions / savepoints never run,
+	# so only committed events reach the batch.
+	batch = _batch.get()
+	if batch is None:
+		write_audit_events(getattr(connection, "schema_name", "") or "public", [event])
+		return
+	batch.append((getattr(connection, "schema_name", "") or "public", event))
+	if len(batch) >= int(getattr(settings, "AUDIT_BATCH_MAX_EVENTS", 500)):
+		flush_audit_batch()
+
+
+def write_audit_events(schema: str, events: list[AuditEvent]) -> None:
+	if schema_context is not None and getattr(connection, "schema_name", schema) != schema:
+		with schema_context(schema):
+			AuditEvent.objects.bulk_create(events)
+	else:
+		AuditEvent.objects.bulk_create(events)
+	for event in events:
+		record_audit_write(event.status)
+
+
+def start_audit_batch():
+	"""
+	Buffer deferred audit events until end_audit_batch() (AuditContextMiddleware does
+	this per request, a Celery signal per task). Returns a reset token.
+	"""
+	return _batch.set([])
+
+
+def flush_audit_batch() -> int:
+	"""
+	Write the buffered events: one INSERT per schema. Never raises.
+	"""
+	batch = _batch.get()
+	if not batch:
+		return 0
+	items = batch[:]
+	batch.clear()
+	by_schema: dict[str, list[AuditEvent]] = defaultdict(list)
+	for schema, event in items:
+		by_schema[schema].append(event)
+	written = 0
+	for schema, events in by_schema.items():
+		try:
+			write_audit_events(schema, events)
+			written += len(events)
+		except Exception:
+			log.exception("Failed to write %s audit events to %s", len(events), schema)
+	return written
+
+
+def end_audit_batch(token) -> int:
+	written = flush_audit_batch()
+	try:
+		_batch.reset(token)
+	except ValueError:
+		# Reset from a different context: just stop buffering here.
+		_batch.set(None)
+	return written
+
+
+_task_tokens: dict[str, object] = {}
+
+
+def _task_prerun(sender=None, task_id=None, **kwargs) -> None:
+	if task_id:
+		_task_tokens[task_id] = start_audit_batch()
+
+
+def _task_postrun(sender=None, task_id=None, **kwargs) -> None:
+	token = _task_tokens.pop(task_id, None) if task_id else None
+	if token is not None:
+		end_audit_batch(token)
+
+
+def connect_celery_signals() -> None:
+	try:
+		from celery.signals import task_postrun, task_prerun
+	except Exception:  # pragma: no cover
+		return
+	task_prerun.connect(_task_prerun, weak=False, dispatch_uid="hh_audit_batch_prerun")
+	task_postrun.connect(_task_postrun, weak=False, dispatch_uid="hh_audit_batch_postrun")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.utils import timezone
+
+from apps.onboarding.models import TenantRequest
+
+
+class _Rollback(Exception):
+	pass
+
+
+class Command(BaseCommand):
+	help = (
+		"Microbenchmark of model-audit signal overhead: signal dispatch and save() throughput "
+		"for an unaudited model (Session) and an audited one (onboarding.TenantRequest). "
+		"Runs in the public schema inside a transaction that is rolled back."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("--iterations", type=int, default=2000)
+
+	def _report(self, name: str, n: int, seconds: float) -> None:
+		self.stdout.write(f"{name:<32} {n / seconds:>10.0f} ops/s {seconds / n * 1e6:>9.1f} µs/op")
+
+	def _time(self, name: str, n: int, fn) -> None:
+		start = time.perf_counter()
+		for i in range(n):
+			fn(i)
+		self._report(name, n, time.perf_counter() - start)
+
+	def handle(self, *args, **opts):
+		n = max(int(opts["iterations"]), 1)
+		try:
+			with transaction.atomic():
+				session = Session.objects.create(session_key="bench-audit", session_data="", expire_date=timezone.now())
+				request = TenantRequest.objects.create(company_name="bench", contact_name="b", contact_email="b@example.com")
+				session = Session.objects.get(pk=session.pk)
+				request = TenantRequest.objects.get(pk=request.pk)
+
+				self._time("post_init dispatch (unaudited)", n * 10, lambda i: post_init.send(sender=Session, instance=session))
+				self._time(
+					"post_save dispatch (unaudited)",
+					n * 10,
+					lambda i: post_save.send(sender=Session, instance=session, created=False, update_fields=None, raw=False, using="default"),
+				)
+				self._time("Session() init (unaudited)", n * 10, lambda i: Session(session_key=f"k{i}", session_data=""))
+
+				def save_session(i):
+					session.session_data = str(i)
+					session.save()
+
+				def save_request(i):
+					request.notes = str(i)
+					request.save()
+
+				self._time("save() unaudited (Session)", n, save_session)
+				self._time("save() audited (TenantRequest)", n, save_request)
+				raise _Rollback
+		except _Rollback:
+			pass
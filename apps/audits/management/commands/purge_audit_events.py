@@ -6,6 +6,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from apps.audits.models import AuditEvent
+from apps.core.partitioning import purge_before
 
 try:
 	from django_tenants.utils import schema_context
@@ -14,7 +15,7 @@ except Exception:  # pragma: no cover
 
 
 class Command(BaseCommand):
-	help = "Purge old audit events (retention). Uses hard delete."
+	help = "Purge old audit events (retention). Drops expired created_at partitions; hard-deletes legacy rows."
 
 	def add_arguments(self, parser):
 		parser.add_argument("--days", type=int, default=90, help="Delete events older than N days (default: 90).")
@@ -29,9 +30,13 @@ class Command(BaseCommand):
 		cutoff = timezone.now() - timedelta(days=days)
 
 		def purge_current_schema(label: str):
-			count = AuditEvent.objects.filter(created_at__lt=cutoff).count()
-			deleted = AuditEvent.objects.filter(created_at__lt=cutoff).hard_delete()
-			self.stdout.write(f"{label}: deleted {count} events (hard_delete={deleted}).")
+			# Whole partitions older than the cutoff are dropped; rows only get deleted
+			# from the default partition (history from before partitioning).
+			rows, removed = purge_before(AuditEvent, cutoff)
+			reclaimed = sum(size for _, size in removed)
+			self.stdout.write(
+				f"{label}: dropped {len(removed)} partitions ({reclaimed} bytes), deleted {rows} legacy rows."
+			)
 
 		all_tenants = bool(opts["all_tenants"])
 		if not all_tenants:
@@ -79,6 +79,10 @@ class AuditContextMiddleware(MiddlewareMixin):
 			)
 		)
 		request._audit_ctx_token = token
+		# Imported here: this module is loaded by the logging config before models are ready.
+		from apps.audits.batch import start_audit_batch
+
+		request._audit_batch_token = start_audit_batch()
 		
 		# Optional: expose request_id in response for debugging
 		request.audit_request_id = request_id
@@ -99,6 +103,13 @@ class AuditContextMiddleware(MiddlewareMixin):
 		rid = getattr(request, "audit_request_id", None)
 		if rid:
 			response["X-Request-ID"] = rid
+		# Write the request's committed audit events (one INSERT per schema).
+		batch_token = getattr(request, "_audit_batch_token", None)
+		if batch_token is not None:
+			from apps.audits.batch import end_audit_batch
+
+			request._audit_batch_token = None
+			end_audit_batch(batch_token)
 		# prevent context leakage between requests
 		token = getattr(request, "_audit_ctx_token", None)
 		if token is not None:
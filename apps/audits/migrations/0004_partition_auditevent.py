@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def partition_auditevent(apps, schema_editor):
+    from apps.core.partitioning import convert_to_partitioned
+
+    convert_to_partitioned(schema_editor, apps.get_model('audits', 'AuditEvent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audits', '0003_auditevent_tags_auditevent_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditevent, migrations.RunPython.noop),
+    ]
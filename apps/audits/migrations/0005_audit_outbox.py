@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audits', '0004_partition_auditevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('payload', models.JSONField()),
+            ],
+        ),
+    ]
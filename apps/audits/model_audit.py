@@ -1,57 +1,98 @@
 from __future__ import annotations
 
-from django.db.models.signals import post_delete, post_save, pre_save
-from django.dispatch import receiver
+import random
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 from apps.audits.services import audit_log
-from apps.audits.utils import model_diff
+from apps.audits.utils import snapshot_values, track_changes, tracked_changes
 
 # Set of "app_label.ModelName"
 AUDIT_MODEL_ALLOWLIST: set[str] = set()
 
-_previous: dict[tuple[str, str], object] = {}
 
+@dataclass(frozen=True)
+class AuditedModel:
+	"""
+	Precomputed audit config of one model (AUDIT_MODEL_OPTIONS[key] over the defaults).
+	"""
 
-def register_model(model_class):
-	AUDIT_MODEL_ALLOWLIST.add(f"{model_class._meta.app_label}.{model_class.__name__}")
+	key: str
+	exclude_fields: frozenset[str] = frozenset()
+	diff: bool = True
+	sample_rate: float = 1.0
 
+	def sampled(self) -> bool:
+		return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+
+# model class -> config, filled by register_model() at startup
+AUDITED_MODELS: dict[type, AuditedModel] = {}
+
+
+def model_key(model_class) -> str:
+	return f"{model_class._meta.app_label}.{model_class.__name__}"
 
-@receiver(pre_save)
-def capture_previous(sender, instance, **kwargs):
-	key = f"{getattr(sender, '_meta', None) and sender._meta.app_label}.{getattr(sender, '__name__', '')}"
-	if key not in AUDIT_MODEL_ALLOWLIST:
-		return
-	if not getattr(instance, "pk", None):
-		return
-	try:
-		_previous[(key, str(instance.pk))] = sender.objects.get(pk=instance.pk)
-	except sender.DoesNotExist:
-		pass
+
+def is_excluded(key: str) -> bool:
+	"""
+	AUDIT_EXCLUDED_MODELS entries are "app.Model" or "app.*".
+	"""
+	excluded = set(getattr(settings, "AUDIT_EXCLUDED_MODELS", ()))
+	return key in excluded or f"{key.split('.', 1)[0]}.*" in excluded
+
+
+def register_model(model_class) -> AuditedModel | None:
+	"""
+	Audit creates / updates / deletes of `model_class`: its own post_save / post_delete
+	receivers (unaudited models pay nothing) and, with diff on, load-time snapshots.
+	"""
+	key = model_key(model_class)
+	if is_excluded(key):
+		return None
+	options = (getattr(settings, "AUDIT_MODEL_OPTIONS", {}) or {}).get(key, {})
+	config = AuditedModel(
+		key=key,
+		exclude_fields=frozenset(options.get("exclude_fields", ())),
+		diff=bool(options.get("diff", True)),
+		sample_rate=float(options.get("sample_rate", 1.0)),
+	)
+	AUDITED_MODELS[model_class] = config
+	AUDIT_MODEL_ALLOWLIST.add(key)
+	if config.diff:
+		track_changes(model_class)
+	post_save.connect(audit_model_save, sender=model_class, weak=False, dispatch_uid=f"hh_audit_save:{key}")
+	post_delete.connect(audit_model_delete, sender=model_class, weak=False, dispatch_uid=f"hh_audit_delete:{key}")
+	return config
 
 
-@receiver(post_save)
 def audit_model_save(sender, instance, created, **kwargs):
-	key = f"{getattr(sender, '_meta', None) and sender._meta.app_label}.{getattr(sender, '__name__', '')}"
-	if key not in AUDIT_MODEL_ALLOWLIST:
-		return
-	
+	config = AUDITED_MODELS[sender]
 	changes = {}
-	if not created:
-		prev = _previous.pop((key, str(instance.pk)), None)
-		if prev is not None:
-			changes = model_diff(instance, prev)
-	
+	if config.diff:
+		if not created:
+			changes = tracked_changes(instance, kwargs.get("update_fields"))
+			for name in config.exclude_fields.intersection(changes):
+				del changes[name]
+		# The saved state is the baseline for the next save of this instance (only the
+		# saved fields after save(update_fields=...)).
+		update_fields = kwargs.get("update_fields")
+		snapshot_values(instance, None if created or update_fields is None else set(update_fields))
+	if not config.sampled():
+		return
+
 	audit_log(
-		action=f"model.{key}.{'created' if created else 'updated'}",
+		action=f"model.{config.key}.{'created' if created else 'updated'}",
 		obj=instance,
 		changes=changes,
 		metadata={"source": "signal"},
 	)
 
 
-@receiver(post_delete)
 def audit_model_delete(sender, instance, **kwargs):
-	key = f"{getattr(sender, '_meta', None) and sender._meta.app_label}.{getattr(sender, '__name__', '')}"
-	if key not in AUDIT_MODEL_ALLOWLIST:
+	config = AUDITED_MODELS[sender]
+	if not config.sampled():
 		return
-	audit_log(action=f"model.{key}.deleted", obj=instance, metadata={"source": "signal"})
\ No newline at end of file
+	audit_log(action=f"model.{config.key}.deleted", obj=instance, metadata={"source": "signal"})
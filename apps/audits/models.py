@@ -29,6 +29,9 @@ class AuditEvent(models.Model):
 	Stored per schema:
 	  - In public schema: platform/control-plane audit events
 	  - In tenant schemas: tenant/user/business audit events
+
+	The table is RANGE-partitioned on created_at (see apps.core.partitioning);
+	retention detaches/drops whole partitions instead of deleting rows.
 	"""
 	
 	created_at = models.DateTimeField(default=timezone.now, db_index=True)
@@ -85,4 +88,19 @@ class AuditEvent(models.Model):
 
 	def delete(self, *args, **kwargs):
 		# Use AuditEvent.objects.filter(...).hard_delete() for retention purges.
-		raise ValidationError("AuditEvent cannot be deleted via ORM delete().")
\ No newline at end of file
+		raise ValidationError("AuditEvent cannot be deleted via ORM delete().")
+
+
+class AuditOutbox(models.Model):
+	"""
+	Transactional outbox for audit events (AUDIT_WRITE_MODE="outbox"), stored per schema.
+
+	audit_log() appends the serialized event in the caller's transaction (narrow row,
+	no secondary indexes); apps.audits.outbox drains it into AuditEvent in batches.
+	"""
+
+	created_at = models.DateTimeField(default=timezone.now)
+	payload = models.JSONField()
+
+	def __str__(self) -> str:
+		return f"[{self.created_at:%Y-%m-%d %H:%M:%S}] {self.payload.get('action', '')}"
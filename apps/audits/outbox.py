@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.logs.prometheus import record_audit_write
+
+from .models import AuditEvent, AuditOutbox
+from .utils import to_jsonable
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+def outbox_enabled() -> bool:
+	return (getattr(settings, "AUDIT_WRITE_MODE", "direct") or "direct").strip().lower() == "outbox"
+
+
+def _batch_size() -> int:
+	return max(int(getattr(settings, "AUDIT_OUTBOX_BATCH_SIZE", 1000)), 1)
+
+
+def event_payload(event: AuditEvent) -> dict:
+	return {
+		f.attname: to_jsonable(getattr(event, f.attname))
+		for f in AuditEvent._meta.concrete_fields
+		if not f.primary_key and f.attname != "updated_at"
+	}
+
+
+def append_to_outbox(event: AuditEvent) -> None:
+	"""
+	Queue `event` in the current schema's outbox, inside the caller's transaction
+	(rolled back with it). AUDIT_OUTBOX_SYNC drains right after commit (tests).
+	"""
+	AuditOutbox.objects.create(created_at=event.created_at, payload=event_payload(event))
+	if getattr(settings, "AUDIT_OUTBOX_SYNC", False):
+		transaction.on_commit(drain_current_schema)
+
+
+def _drain_batch(batch_size: int) -> int:
+	table = connection.ops.quote_name(AuditOutbox._meta.db_table)
+	with transaction.atomic():
+		with connection.cursor() as cur:
+			# SKIP LOCKED: concurrent drainers take disjoint batches instead of waiting.
+			cur.execute(
+				f"""
+				WITH batch AS (
+					SELECT id FROM {table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+				)
+				DELETE FROM {table} o USING batch WHERE o.id = batch.id
+				RETURNING o.payload
+				""",
+				[batch_size],
+			)
+			rows = cur.fetchall()
+		events = [AuditEvent(**(json.loads(p) if isinstance(p, str) else p)) for (p,) in rows]
+		AuditEvent.objects.bulk_create(events, batch_size=batch_size)
+	for event in events:
+		record_audit_write(event.status)
+	return len(events)
+
+
+def drain_current_schema(*, batch_size: int | None = None, max_batches: int | None = None) -> int:
+	"""
+	Move outbox rows of the connection's current schema into AuditEvent, one
+	transaction per batch (delete + insert commit together).
+	"""
+	batch_size = batch_size or _batch_size()
+	moved = 0
+	batches = 0
+	while max_batches is None or batches < max_batches:
+		n = _drain_batch(batch_size)
+		moved += n
+		batches += 1
+		if n < batch_size:
+			break
+	return moved
+
+
+def _schemas() -> list[str]:
+	from apps.platform.retention import list_schemas
+
+	return list_schemas()
+
+
+def drain_audit_outbox(*, schemas: list[str] | None = None, max_batches: int | None = None) -> dict[str, int]:
+	"""
+	Drain every schema's outbox (public + tenants by default). Returns {schema: moved}.
+	"""
+	moved: dict[str, int] = {}
+	for schema in schemas or _schemas():
+		if schema_context is None:
+			moved[schema] = drain_current_schema(max_batches=max_batches)
+			continue
+		with schema_context(schema):
+			moved[schema] = drain_current_schema(max_batches=max_batches)
+	return moved
+
+
+def outbox_lag(*, schemas: list[str] | None = None, now=None) -> list[dict]:
+	"""
+	Per schema: { schema, pending, oldest_at, lag_s } (only schemas with pending rows).
+	"""
+	now = now or timezone.now()
+	table = connection.ops.quote_name(AuditOutbox._meta.db_table)
+	out: list[dict] = []
+	for schema in schemas or _schemas():
+
+		def _lag():
+			with connection.cursor() as cur:
+				cur.execute(f"SELECT COUNT(*), MIN(created_at) FROM {table}")
+				return cur.fetchone()
+
+		if schema_context is None:
+			pending, oldest = _lag()
+		else:
+			with schema_context(schema):
+				pending, oldest = _lag()
+		if pending:
+			out.append(
+				{
+					"schema": schema,
+					"pending": int(pending),
+					"oldest_at": oldest,
+					"lag_s": max((now - oldest).total_seconds(), 0.0) if oldest else 0.0,
+				}
+			)
+	return sorted(out, key=lambda r: -r["lag_s"])
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
+from itertools import islice
+
+from django.conf import settings
+from django.db import models, transaction
+
+from apps.audits.utils import safe_value, snapshot_values, tracked_changes
+
+# Set while QuerySet.bulk_update() runs its own update() calls (audited once, by bulk_update).
+_in_bulk_update: ContextVar[bool] = ContextVar("audit_in_bulk_update", default=False)
+
+
+def _chunk_size() -> int:
+	return max(int(getattr(settings, "AUDIT_BULK_CHUNK_SIZE", 1000)), 1)
+
+
+def _chunks(items, size: int):
+	it = iter(items)
+	index = 0
+	while chunk := list(islice(it, size)):
+		yield index, chunk
+		index += 1
+
+
+class AuditedQuerySet(models.QuerySet):
+	"""
+	update() / bulk_create() / bulk_update() that also write one aggregated AuditEvent
+	per AUDIT_BULK_CHUNK_SIZE rows ("model.<app.Model>.bulk_updated" etc.), with the
+	affected pks in metadata. Per-row signals are still not sent.
+
+	Models excluded from auditing (AUDIT_EXCLUDED_MODELS) just run the bulk operation.
+	"""
+
+	def _audit_config(self):
+		from apps.audits.model_audit import AUDITED_MODELS
+
+		return AUDITED_MODELS.get(self.model)
+
+	def _audit_chunk(self, config, operation: str, index: int, chunk: list, changes: dict, *, extra: dict | None = None) -> None:
+		from apps.audits.services import audit_log
+
+		audit_log(
+			action=f"model.{config.key}.{operation}",
+			object_type=config.key,
+			message=f"{len(chunk)} rows",
+			changes=changes,
+			metadata={
+				"source": "bulk",
+				"count": len(chunk),
+				"pks": [str(pk) for pk in chunk],
+				"chunk": index + 1,
+				**(extra or {}),
+			},
+		)
+
+	def _audit_bulk(self, config, operation: str, pks: list, changes_for, *, extra: dict | None = None) -> None:
+		size = _chunk_size()
+		chunks = (len(pks) + size - 1) // size
+		for index, chunk in _chunks(pks, size):
+			self._audit_chunk(config, operation, index, chunk, changes_for(chunk), extra={"chunks": chunks, **(extra or {})})
+
+	def update(self, **kwargs):
+		config = self._audit_config()
+		if config is None or _in_bulk_update.get():
+			return super().update(**kwargs)
+		if self.query.is_sliced:
+			raise TypeError("Cannot update a query once a slice has been taken.")
+		values = {
+			name: {"to": safe_value(name, value)} for name, value in kwargs.items() if name not in config.exclude_fields
+		}
+		rows = 0
+		with transaction.atomic(using=self.db, savepoint=False):
+			# Lock the matching rows (pks streamed, not loaded at once): the audited pks
+			# are exactly the rows updated, and rows that start matching later are untouched.
+			size = _chunk_size()
+			locked = self.select_for_update(of=("self",)).order_by("pk").values_list("pk", flat=True)
+			base = self.model._base_manager.using(self.db)
+			for index, chunk in _chunks(locked.iterator(chunk_size=size), size):
+				rows += models.QuerySet.update(base.filter(pk__in=chunk), **kwargs)
+				self._audit_chunk(config, "bulk_updated", index, chunk, values)
+		return rows
+
+	update.alters_data = True
+
+	def bulk_create(self, objs, *args, **kwargs):
+		config = self._audit_config()
+		created = super().bulk_create(objs, *args, **kwargs)
+		if config is not None:
+			pks = [obj.pk for obj in created if obj.pk is not None]
+			if pks:
+				self._audit_bulk(config, "bulk_created", pks, lambda chunk: {})
+			if config.diff:
+				for obj in created:
+					snapshot_values(obj)
+		return created
+
+	def bulk_update(self, objs, fields, *args, **kwargs):
+		config = self._audit_config()
+		if config is None:
+			return super().bulk_update(objs, fields, *args, **kwargs)
+		objs = list(objs)
+		fields = list(fields)
+		by_pk = {}
+		if config.diff:
+			# Per-row diffs of the updated fields against load-time snapshots (no query).
+			for obj in objs:
+				diff = tracked_changes(obj, set(fields))
+				for name in config.exclude_fields.intersection(diff):
+					del diff[name]
+				if diff:
+					by_pk[str(obj.pk)] = diff
+		token = _in_bulk_update.set(True)
+		try:
+			rows = super().bulk_update(objs, fields, *args, **kwargs)
+		finally:
+			_in_bulk_update.reset(token)
+		if config.diff:
+			for obj in objs:
+				snapshot_values(obj, set(fields))
+		pks = [obj.pk for obj in objs]
+		self._audit_bulk(
+			config,
+			"bulk_updated",
+			pks,
+			lambda chunk: {str(pk): by_pk[str(pk)] for pk in chunk if str(pk) in by_pk},
+			extra={"fields": fields},
+		)
+		return rows
+
+	bulk_update.alters_data = True
+
+
+class AuditedManager(models.Manager.from_queryset(AuditedQuerySet)):
+	pass
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from typing import Any
 
-from django.db import transaction
+from django.db import connection, transaction
 
+from .batch import enqueue_audit_event, write_audit_events
 from .middleware import get_audit_context
 from .models import AuditEvent, AuditStatus
+from .outbox import append_to_outbox, outbox_enabled
 from .utils import to_jsonable
 
 
@@ -34,15 +36,24 @@ def audit_log(
 		request_id: str = "",
 		ip_address: str | None = None,
 		user_agent: str = "",
+		object_type: str = "",
 		# If True (default), write after transaction commit. If False, write immediately.
 		defer: bool = True,
 ) -> None:
 	"""
 	Appends an audit event after the current DB transaction commits.
 	Safe to call anywhere.
+
+	Inside a request / Celery task, committed events are batched and written with one
+	INSERT per schema at response / task end; elsewhere at commit. defer=False
+	(failure alerts) writes immediately.
+
+	AUDIT_WRITE_MODE="outbox": the event is appended to the schema's AuditOutbox in the
+	caller's transaction instead and moved to AuditEvent by drain_audit_outbox_task.
 	"""
 	ctx = get_audit_context()
-	object_type, object_id, object_repr = _obj_meta(obj)
+	obj_type, object_id, object_repr = _obj_meta(obj)
+	object_type = object_type or obj_type
 	
 	payload = dict(
 		action=action,
@@ -63,10 +74,10 @@ def audit_log(
 		user_agent=user_agent or (ctx.user_agent if ctx else ""),
 	)
 	
-	def _write():
-		AuditEvent.objects.create(**payload)
-
-	if defer:
-		transaction.on_commit(_write)
+	event = AuditEvent(**payload)
+	if defer and outbox_enabled():
+		append_to_outbox(event)
+	elif defer:
+		transaction.on_commit(lambda: enqueue_audit_event(event))
 	else:
-		_write()
\ No newline at end of file
+		write_audit_events(getattr(connection, "schema_name", "") or "public", [event])
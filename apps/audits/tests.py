@@ -1,2 +1,228 @@
+from __future__ import annotations
 
-# Create your tests here.
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.db import connection, transaction
+from django.db.models.signals import post_init, post_save
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.audits.batch import end_audit_batch, start_audit_batch
+from apps.audits.middleware import AuditContextMiddleware
+from apps.audits.model_audit import AUDITED_MODELS, AuditedModel, audit_model_save
+from apps.audits.models import AuditEvent, AuditOutbox, AuditStatus
+from apps.audits.outbox import drain_audit_outbox
+from apps.audits.services import audit_log
+from apps.logs.models import LogEntry
+from apps.onboarding.models import TenantRequest
+from apps.platform.models import RouteLatency
+
+
+class AuditBatchTests(TestCase):
+	def test_request_events_are_written_in_one_insert_at_response_end(self):
+		def view(request):
+			for i in range(5):
+				with self.captureOnCommitCallbacks(execute=True):
+					audit_log(action=f"test.step{i}")
+			self.assertFalse(AuditEvent.objects.filter(action__startswith="test.").exists())
+			return HttpResponse("ok")
+
+		request = RequestFactory().get("/wizard/")
+		mw = AuditContextMiddleware(view)
+		with CaptureQueriesContext(connection) as queries:
+			response = mw(request)
+
+		inserts = [q["sql"] for q in queries if q["sql"].startswith('INSERT INTO "audits_auditevent"')]
+		self.assertEqual(len(inserts), 1)
+
+		events = AuditEvent.objects.filter(action__startswith="test.")
+		self.assertEqual(events.count(), 5)
+		self.assertEqual(set(events.values_list("request_id", flat=True)), {response["X-Request-ID"]})
+
+	def test_rolled_back_savepoint_events_are_not_written(self):
+		token = start_audit_batch()
+		with self.captureOnCommitCallbacks(execute=True):
+			audit_log(action="test.kept")
+			try:
+				with transaction.atomic():
+					audit_log(action="test.rolled_back")
+					raise RuntimeError
+			except RuntimeError:
+				pass
+		end_audit_batch(token)
+
+		self.assertEqual(list(AuditEvent.objects.filter(action__startswith="test.").values_list("action", flat=True)), ["test.kept"])
+
+	def test_failures_are_written_immediately(self):
+		token = start_audit_batch()
+		try:
+			audit_log(action="test.failed", status=AuditStatus.FAILURE, defer=False)
+			self.assertTrue(AuditEvent.objects.filter(action="test.failed").exists())
+		finally:
+			end_audit_batch(token)
+
+
+class ModelChangeTrackingTests(TestCase):
+	def test_update_is_diffed_without_refetching(self):
+		item = TenantRequest.objects.create(company_name="Acme", contact_name="Ann", contact_email="ann@example.com")
+		item = TenantRequest.objects.get(pk=item.pk)
+		item.company_name = "Acme Homes"
+		item.contact_email = "ann@acme.example"
+
+		with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+			item.save()
+
+		self.assertEqual([q["sql"] for q in queries if q["sql"].startswith("SELECT")], [])
+		event = AuditEvent.objects.get(action="model.onboarding.TenantRequest.updated")
+		self.assertEqual(set(event.changes), {"company_name", "contact_email", "updated_at"})
+		self.assertEqual(event.changes["company_name"], {"from": "Acme", "to": "Acme Homes"})
+		self.assertEqual(event.changes["contact_email"], {"from": "ann@example.com", "to": "ann@acme.example"})
+
+	def test_next_save_diffs_against_saved_state_and_deferred_fields_are_skipped(self):
+		item = TenantRequest.objects.create(company_name="a", contact_name="Ann", contact_email="ann@example.com")
+		item = TenantRequest.objects.only("company_name").get(pk=item.pk)
+		with self.captureOnCommitCallbacks(execute=True):
+			item.company_name = "b"
+			item.save()
+			item.company_name = "c"
+			item.save()
+
+		changes = list(
+			AuditEvent.objects.filter(action="model.onboarding.TenantRequest.updated")
+			.order_by("created_at")
+			.values_list("changes", flat=True)
+		)
+		self.assertEqual(changes, [{"company_name": {"from": "a", "to": "b"}}, {"company_name": {"from": "b", "to": "c"}}])
+
+	def test_partial_save_keeps_unsaved_edits_in_the_next_diff(self):
+		item = TenantRequest.objects.create(company_name="a", contact_name="Ann", contact_email="ann@example.com")
+		item = TenantRequest.objects.get(pk=item.pk)
+		with self.captureOnCommitCallbacks(execute=True):
+			item.company_name = "b"
+			item.contact_name = "Bob"
+			item.save(update_fields=["company_name"])
+			item.save(update_fields=["contact_name"])
+
+		changes = list(
+			AuditEvent.objects.filter(action="model.onboarding.TenantRequest.updated")
+			.order_by("created_at")
+			.values_list("changes", flat=True)
+		)
+		self.assertEqual(changes, [{"company_name": {"from": "a", "to": "b"}}, {"contact_name": {"from": "Ann", "to": "Bob"}}])
+
+
+class AuditSignalDispatchTests(TestCase):
+	def test_receivers_are_connected_per_audited_model_only(self):
+		self.assertIn(TenantRequest, AUDITED_MODELS)
+		self.assertTrue(post_save.has_listeners(TenantRequest))
+		self.assertTrue(post_init.has_listeners(TenantRequest))
+		# Telemetry / log tables and non-apps models have no audit receivers at all.
+		for model in (Session, LogEntry, RouteLatency):
+			self.assertNotIn(model, AUDITED_MODELS)
+			self.assertFalse(any(r is audit_model_save for r in post_save._live_receivers(model)[0]))
+		self.assertFalse(post_init.has_listeners(Session))
+
+	def test_model_options_exclude_fields_and_sampling(self):
+		item = TenantRequest.objects.create(company_name="a", contact_name="Ann", contact_email="ann@example.com")
+		item = TenantRequest.objects.get(pk=item.pk)
+		config = AuditedModel(key="onboarding.TenantRequest", exclude_fields=frozenset({"updated_at", "notes"}))
+		with mock.patch.dict(AUDITED_MODELS, {TenantRequest: config}), self.captureOnCommitCallbacks(execute=True):
+			item.company_name = "b"
+			item.notes = "secret-ish"
+			item.save()
+			with mock.patch.dict(AUDITED_MODELS, {TenantRequest: AuditedModel(key=config.key, sample_rate=0.0)}):
+				item.save()
+
+		events = AuditEvent.objects.filter(action="model.onboarding.TenantRequest.updated")
+		self.assertEqual([e.changes for e in events], [{"company_name": {"from": "a", "to": "b"}}])
+
+
+def _tenant_request(name: str) -> TenantRequest:
+	return TenantRequest(company_name=name, contact_name="Ann", contact_email="ann@example.com")
+
+
+class BulkAuditTests(TestCase):
+	def _events(self, operation: str):
+		return list(AuditEvent.objects.filter(action=f"model.onboarding.TenantRequest.{operation}").order_by("created_at"))
+
+	@override_settings(AUDIT_BULK_CHUNK_SIZE=2)
+	def test_bulk_create_and_update_write_one_event_per_chunk(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			created = TenantRequest.objects.bulk_create([_tenant_request(f"c{i}") for i in range(3)])
+			rows = TenantRequest.objects.filter(company_name__startswith="c").update(status="approved")
+
+		self.assertEqual(rows, 3)
+		self.assertEqual(self._events("created"), [])
+		bulk_created = self._events("bulk_created")
+		self.assertEqual(bulk_created[0].object_type, "onboarding.TenantRequest")
+		self.assertEqual([e.metadata["pks"] for e in bulk_created], [[str(o.pk) for o in created][:2], [str(created[2].pk)]])
+		updated = self._events("bulk_updated")
+		self.assertEqual([e.metadata["count"] for e in updated], [2, 1])
+		self.assertEqual(sorted(pk for e in updated for pk in e.metadata["pks"]), sorted(str(o.pk) for o in created))
+		self.assertEqual(updated[0].changes, {"status": {"to": "approved"}})
+
+	def test_update_locks_matching_rows_and_rejects_slices(self):
+		TenantRequest.objects.bulk_create([_tenant_request(f"l{i}") for i in range(2)])
+		qs = TenantRequest.objects.filter(company_name__startswith="l")
+		with self.assertRaisesMessage(TypeError, "Cannot update a query once a slice has been taken."):
+			qs[:1].update(status="approved")
+
+		with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+			self.assertEqual(qs.update(status="approved"), 2)
+
+		self.assertEqual(len([q for q in queries if "FOR UPDATE" in q["sql"]]), 1)
+		(event,) = self._events("bulk_updated")
+		self.assertEqual(sorted(event.metadata["pks"]), sorted(str(pk) for pk in qs.values_list("pk", flat=True)))
+
+	def test_bulk_update_records_per_row_diffs_without_queries(self):
+		TenantRequest.objects.bulk_create([_tenant_request(f"u{i}") for i in range(2)])
+		objs = list(TenantRequest.objects.filter(company_name__startswith="u").order_by("company_name"))
+		objs[0].company_name = "renamed"
+
+		with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+			TenantRequest.objects.bulk_update(objs, ["company_name"])
+
+		self.assertEqual([q["sql"] for q in queries if q["sql"].startswith("SELECT")], [])
+		(event,) = self._events("bulk_updated")
+		self.assertEqual(event.metadata["fields"], ["company_name"])
+		self.assertEqual(event.changes, {str(objs[0].pk): {"company_name": {"from": "u0", "to": "renamed"}}})
+
+
+@override_settings(AUDIT_WRITE_MODE="outbox")
+class AuditOutboxTests(TestCase):
+	def test_events_go_to_outbox_in_the_callers_transaction(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			audit_log(action="test.kept", metadata={"n": 1})
+			try:
+				with transaction.atomic():
+					audit_log(action="test.rolled_back")
+					raise RuntimeError
+			except RuntimeError:
+				pass
+
+		self.assertFalse(AuditEvent.objects.filter(action__startswith="test.").exists())
+		self.assertEqual([o.payload["action"] for o in AuditOutbox.objects.all()], ["test.kept"])
+
+	def test_drain_moves_rows_in_batches(self):
+		for i in range(5):
+			audit_log(action=f"test.e{i}", actor_email="ann@example.com")
+		created_at = AuditOutbox.objects.order_by("id").first().created_at
+
+		with override_settings(AUDIT_OUTBOX_BATCH_SIZE=2):
+			moved = drain_audit_outbox(schemas=["public"])
+
+		self.assertEqual(moved, {"public": 5})
+		self.assertFalse(AuditOutbox.objects.exists())
+		events = AuditEvent.objects.filter(action__startswith="test.").order_by("action")
+		self.assertEqual([e.action for e in events], [f"test.e{i}" for i in range(5)])
+		self.assertEqual(events[0].actor_email, "ann@example.com")
+		self.assertEqual(events[0].created_at, created_at)
+
+	@override_settings(AUDIT_OUTBOX_SYNC=True)
+	def test_sync_mode_drains_on_commit(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			audit_log(action="test.sync")
+		self.assertTrue(AuditEvent.objects.filter(action="test.sync").exists())
+		self.assertFalse(AuditOutbox.objects.exists())
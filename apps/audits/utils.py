@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 import datetime as _dt
 from decimal import Decimal
 from typing import Any
@@ -65,4 +66,77 @@ def model_diff(instance, previous) -> dict:
 		old = getattr(previous, name, None)
 		if new != old:
 			changes[name] = {"from": safe_value(name, old), "to": safe_value(name, new)}
-	return changes
\ No newline at end of file
+	return changes
+
+
+# Per-model (name, attname) of concrete fields whose loaded values are snapshotted.
+_TRACKED_FIELDS: dict[type, tuple[tuple[str, str], ...]] = {}
+_UNLOADED = object()
+
+
+def track_changes(model_class) -> None:
+	"""
+	Snapshot `model_class` field values when instances are loaded (a post_init receiver
+	for this class only), so tracked_changes() can diff them without re-fetching the row.
+	"""
+	if model_class in _TRACKED_FIELDS:
+		return
+	from django.db.models.signals import post_init
+
+	_TRACKED_FIELDS[model_class] = tuple((f.name, f.attname) for f in model_class._meta.concrete_fields)
+	post_init.connect(_snapshot_loaded, sender=model_class, weak=False, dispatch_uid=f"hh_audit_track:{model_class._meta.label}")
+
+
+def _snapshot_loaded(sender, instance, **kwargs):
+	# Loaded (or pk-constructed) instances only; new rows have nothing to diff against.
+	if instance.pk is not None:
+		snapshot_values(instance)
+
+
+def _tracked_fields(instance):
+	cls = instance.__class__
+	return _TRACKED_FIELDS.get(cls) or _TRACKED_FIELDS.get(cls._meta.concrete_model)
+
+
+def snapshot_values(instance, fields: set[str] | frozenset[str] | None = None) -> None:
+	"""
+	Store the instance's current field values as one tuple (deferred fields stay
+	unloaded; JSON / array values are copied so in-place edits still show up).
+	`fields` (e.g. save(update_fields=...)) refreshes only those entries of an existing
+	snapshot: unsaved edits to other fields still differ from the stored row.
+	"""
+	tracked = _tracked_fields(instance)
+	if tracked is None:
+		return
+	values = instance.__dict__
+	current = tuple(
+		copy.deepcopy(v) if isinstance(v, (dict, list)) else v
+		for v in (values.get(attname, _UNLOADED) for _, attname in tracked)
+	)
+	previous = values.get("_audit_snapshot") if fields is not None else None
+	if previous is not None:
+		current = tuple(
+			new if name in fields or attname in fields else old
+			for (name, attname), old, new in zip(tracked, previous, current, strict=False)
+		)
+	instance._audit_snapshot = current
+
+
+def tracked_changes(instance, fields: set[str] | frozenset[str] | None = None) -> dict:
+	"""
+	model_diff() against the values snapshotted at load / last save (no query).
+	`fields` limits the diff (e.g. save(update_fields=...)). {} without a snapshot.
+	"""
+	tracked = _tracked_fields(instance)
+	snapshot = instance.__dict__.get("_audit_snapshot")
+	if tracked is None or snapshot is None:
+		return {}
+	values = instance.__dict__
+	changes: dict = {}
+	for (name, attname), old in zip(tracked, snapshot, strict=False):
+		if old is _UNLOADED or (fields is not None and name not in fields and attname not in fields):
+			continue
+		new = values.get(attname, _UNLOADED)
+		if new is not _UNLOADED and new != old:
+			changes[name] = {"from": safe_value(name, old), "to": safe_value(name, new)}
+	return changes
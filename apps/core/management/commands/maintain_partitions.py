@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.partitioning import PARTITIONED_MODELS, ensure_partitions, is_partitioned, purge_before
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+class Command(BaseCommand):
+	help = "Pre-create upcoming created_at partitions and drop partitions past retention (LogEntry, AuditEvent)."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--ahead", type=int, default=None, help="Future partitions to keep ready (default: PARTITION_PREMAKE).")
+		parser.add_argument(
+			"--all-tenants",
+			action="store_true",
+			help="If run from public schema, maintain public + all tenant schemas.",
+		)
+		parser.add_argument("--no-retention", action="store_true", help="Only create partitions; never drop.")
+		parser.add_argument("--detach-only", action="store_true", help="Detach expired partitions instead of dropping them.")
+
+	def handle(self, *args, **opts):
+		models = [django_apps.get_model(label) for label in PARTITIONED_MODELS]
+		now = timezone.now()
+
+		def maintain_current_schema(label: str):
+			for model in models:
+				table = model._meta.db_table
+				if not is_partitioned(table):
+					self.stdout.write(f"{label}: {table} is not partitioned (run migrations), skipping.")
+					continue
+
+				created = ensure_partitions(table, ahead=opts["ahead"])
+				msg = f"{label}: {table} created={len(created)}"
+
+				days = int(getattr(settings, PARTITIONED_MODELS[model._meta.label], 0) or 0)
+				if days > 0 and not opts["no_retention"]:
+					rows, removed = purge_before(model, now - timedelta(days=days), detach_only=opts["detach_only"])
+					reclaimed = sum(size for _, size in removed)
+					msg += f" {'detached' if opts['detach_only'] else 'dropped'}={len(removed)} ({reclaimed} bytes) default_rows_deleted={rows}"
+				self.stdout.write(msg)
+
+		if not opts["all_tenants"]:
+			maintain_current_schema("current schema")
+			return
+
+		if schema_context is None:
+			raise RuntimeError("django-tenants not available; cannot use --all-tenants.")
+
+		from apps.tenancy.models import Tenant
+
+		with schema_context("public"):
+			maintain_current_schema("public")
+			tenants = list(Tenant.objects.exclude(schema_name="public").values_list("schema_name", flat=True))
+
+		for schema_name in tenants:
+			with schema_context(schema_name):
+				maintain_current_schema(schema_name)
@@ -5,6 +5,8 @@ import uuid
 from django.db import models
 from django.utils import timezone
 
+from apps.audits.querysets import AuditedManager
+
 
 class TimeStampedUUIDModel(models.Model):
 	"""
@@ -13,6 +15,7 @@ class TimeStampedUUIDModel(models.Model):
 	- created_at / updated_at timestamps
 
 	We keep the default integer PK for safety and add a UUID separately.
+	`objects` audits bulk update() / bulk_create() / bulk_update() (apps.audits.querysets).
 	"""
 
 	uid = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
@@ -20,5 +23,7 @@ class TimeStampedUUIDModel(models.Model):
 	created_at = models.DateTimeField(default=timezone.now, db_index=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
+	objects = AuditedManager()
+
 	class Meta:
 		abstract = True
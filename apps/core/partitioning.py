@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db import transaction
+
+# Append-only tables stored as native Postgres range partitions on `created_at`.
+# model label -> settings name holding its retention (days; 0/None = keep forever)
+PARTITIONED_MODELS: dict[str, str] = {
+	"logs.LogEntry": "LOG_RETENTION_DAYS",
+	"audits.AuditEvent": "AUDIT_RETENTION_DAYS",
+}
+
+PARTITION_KEY = "created_at"
+GRANULARITIES = ("month", "day")
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+	name: str
+	start: datetime | None
+	end: datetime | None
+
+	@property
+	def is_default(self) -> bool:
+		return self.start is None
+
+
+def partition_granularity() -> str:
+	value = (getattr(settings, "PARTITION_GRANULARITY", "month") or "month").strip().lower()
+	return value if value in GRANULARITIES else "month"
+
+
+def partition_premake() -> int:
+	return max(int(getattr(settings, "PARTITION_PREMAKE", 3)), 0)
+
+
+def period_start(ts: datetime, granularity: str) -> datetime:
+	ts = ts.astimezone(UTC)
+	if granularity == "day":
+		return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+	return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start: datetime, granularity: str) -> datetime:
+	if granularity == "day":
+		return start + timedelta(days=1)
+	if start.month == 12:
+		return start.replace(year=start.year + 1, month=1)
+	return start.replace(month=start.month + 1)
+
+
+def partition_name(table: str, start: datetime, granularity: str) -> str:
+	suffix = start.strftime("%Y%m%d" if granularity == "day" else "%Y%m")
+	return f"{table}_p{suffix}"
+
+
+def default_partition_name(table: str) -> str:
+	return f"{table}_default"
+
+
+def _parse_bound(raw: str) -> datetime:
+	raw = raw.strip()
+	# Postgres prints offsets as "+00" / "+05:30"; fromisoformat wants "+00:00".
+	if re.search(r"[+-]\d{2}$", raw):
+		raw += ":00"
+	return datetime.fromisoformat(raw).astimezone(UTC)
+
+
+def _literal(ts: datetime) -> str:
+	# Bounds are generated here (never user input); DDL can't take bind params.
+	return "'" + ts.astimezone(UTC).strftime("%Y-%m-%d %H:%M:%S+00") + "'"
+
+
+def is_partitioned(table: str, *, connection=None) -> bool:
+	connection = connection or default_connection
+	with connection.cursor() as cur:
+		cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+		row = cur.fetchone()
+	return bool(row) and row[0] == "p"
+
+
+def list_partitions(table: str, *, connection=None) -> list[Partition]:
+	"""
+	Partitions of `table` in the current schema, oldest first (default partition last).
+	"""
+	connection = connection or default_connection
+	with connection.cursor() as cur:
+		cur.execute(
+			"""
+			SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+			FROM pg_inherits i
+			JOIN pg_class child ON child.oid = i.inhrelid
+			WHERE i.inhparent = to_regclass(%s)
+			""",
+			[table],
+		)
+		rows = cur.fetchall()
+
+	out: list[Partition] = []
+	for name, bound in rows:
+		m = _BOUND_RE.search(bound or "")
+		if m:
+			out.append(Partition(name=name, start=_parse_bound(m.group(1)), end=_parse_bound(m.group(2))))
+		else:
+			out.append(Partition(name=name, start=None, end=None))
+	out.sort(key=lambda p: (p.is_default, p.start or datetime.max.replace(tzinfo=UTC)))
+	return out
+
+
+def create_partition(table: str, start: datetime, end: datetime, *, granularity: str, connection=None) -> str | None:
+	"""
+	Create the [start, end) partition unless an existing one overlaps it.
+
+	Rows already sitting in the default partition for that range are moved into
+	the new partition (Postgres refuses to create it otherwise).
+	"""
+	connection = connection or default_connection
+	for p in list_partitions(table, connection=connection):
+		if not p.is_default and p.start < end and start < p.end:
+			return None
+
+	qn = connection.ops.quote_name
+	name = partition_name(table, start, granularity)
+	default = default_partition_name(table)
+	has_default = any(p.is_default for p in list_partitions(table, connection=connection))
+	range_sql = f"{qn(PARTITION_KEY)} >= {_literal(start)} AND {qn(PARTITION_KEY)} < {_literal(end)}"
+
+	with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+		moving = False
+		if has_default:
+			cur.execute(f"SELECT EXISTS (SELECT 1 FROM {qn(default)} WHERE {range_sql})")
+			moving = bool(cur.fetchone()[0])
+		if moving:
+			cur.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+		cur.execute(
+			f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+			f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+		)
+		if moving:
+			cur.execute(f"INSERT INTO {qn(name)} SELECT * FROM {qn(default)} WHERE {range_sql}")
+			cur.execute(f"DELETE FROM {qn(default)} WHERE {range_sql}")
+			cur.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT")
+	return name
+
+
+def ensure_partitions(
+	table: str,
+	*,
+	granularity: str | None = None,
+	ahead: int | None = None,
+	now: datetime | None = None,
+	connection=None,
+) -> list[str]:
+	"""
+	Make sure the current period and the next `ahead` periods have partitions.
+	Returns the names of partitions that were created.
+	"""
+	granularity = granularity or partition_granularity()
+	ahead = partition_premake() if ahead is None else max(int(ahead), 0)
+	start = period_start(now or datetime.now(tz=UTC), granularity)
+
+	created: list[str] = []
+	for _ in range(ahead + 1):
+		end = next_period(start, granularity)
+		name = create_partition(table, start, end, granularity=granularity, connection=connection)
+		if name:
+			created.append(name)
+		start = end
+	return created
+
+
+def drop_partitions_before(table: str, cutoff: datetime, *, detach_only: bool = False, connection=None) -> list[tuple[str, int]]:
+	"""
+	Detach (and by default drop) every range partition whose upper bound is <= cutoff.
+	Returns [(partition_name, bytes)] for what was removed.
+	"""
+	connection = connection or default_connection
+	qn = connection.ops.quote_name
+	removed: list[tuple[str, int]] = []
+	for p in list_partitions(table, connection=connection):
+		if p.is_default or p.end > cutoff:
+			continue
+		with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+			cur.execute("SELECT pg_total_relation_size(to_regclass(%s))", [p.name])
+			size = int(cur.fetchone()[0] or 0)
+			cur.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(p.name)}")
+			if not detach_only:
+				cur.execute(f"DROP TABLE {qn(p.name)}")
+		removed.append((p.name, size))
+	return removed
+
+
+def purge_before(model, cutoff: datetime, *, detach_only: bool = False, connection=None) -> tuple[int, list[tuple[str, int]]]:
+	"""
+	Retention for a partitioned append-only model in the current schema.
+
+	Whole partitions older than `cutoff` are detached/dropped. Rows that live in
+	the default partition (pre-partitioning history) are deleted row-wise.
+	Falls back to a plain row delete if the table is not partitioned.
+
+	Returns (rows_deleted, removed_partitions).
+	"""
+	connection = connection or default_connection
+	table = model._meta.db_table
+	qn = connection.ops.quote_name
+
+	if not is_partitioned(table, connection=connection):
+		rows = model._base_manager.filter(created_at__lt=cutoff)._raw_delete(connection.alias)
+		return int(rows or 0), []
+
+	removed = drop_partitions_before(table, cutoff, detach_only=detach_only, connection=connection)
+	rows = 0
+	if any(p.is_default for p in list_partitions(table, connection=connection)):
+		with connection.cursor() as cur:
+			cur.execute(
+				f"DELETE FROM {qn(default_partition_name(table))} WHERE {qn(PARTITION_KEY)} < %s",
+				[cutoff],
+			)
+			rows = int(cur.rowcount or 0)
+	return rows, removed
+
+
+def convert_to_partitioned(schema_editor, model, *, granularity: str | None = None, ahead: int | None = None) -> None:
+	"""
+	Migration helper: rebuild `model`'s table (current schema) as a RANGE-partitioned
+	table on created_at, keeping columns, identity sequence, data and Django's index names.
+
+	- primary key becomes (id, created_at) (Postgres requires the partition key in it)
+	- existing rows older than the current period land in the default partition
+	- idempotent: does nothing if the table is already partitioned
+	"""
+	connection = schema_editor.connection
+	table = model._meta.db_table
+	if is_partitioned(table, connection=connection):
+		return
+
+	qn = connection.ops.quote_name
+	legacy = f"{table}_legacy"
+	pk = model._meta.pk.column
+	with connection.cursor() as cur:
+		cur.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+		cur.execute(
+			f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+			f"PARTITION BY RANGE ({qn(PARTITION_KEY)})"
+		)
+		cur.execute(f"CREATE TABLE {qn(default_partition_name(table))} PARTITION OF {qn(table)} DEFAULT")
+
+	ensure_partitions(table, granularity=granularity, ahead=ahead, connection=connection)
+
+	with connection.cursor() as cur:
+		cur.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+		cur.execute(f"DROP TABLE {qn(legacy)}")
+		cur.execute(
+			f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_pkey')} PRIMARY KEY ({qn(pk)}, {qn(PARTITION_KEY)})"
+		)
+		cur.execute(
+			f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE((SELECT MAX({qn(pk)}) FROM {qn(table)}), 0) + 1, false)",
+			[table, pk],
+		)
+
+	# Recreate Django-managed indexes (same names as before) on the partitioned parent.
+	for sql in schema_editor._model_indexes_sql(model):
+		schema_editor.execute(sql)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from collections.abc import Callable
+
+from django.db import connection
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+	"""
+	Runs `callback` every `interval` seconds on a lazily started daemon thread.
+
+	- start() is cheap and idempotent; call it from the hot path
+	- fork-aware: a forked worker (gunicorn preload) starts its own thread
+	- flush() runs the callback on the calling thread (tests, shutdown)
+	- the callback runs once more at interpreter exit
+	- callback errors are logged and swallowed; the DB connection is closed after each run
+	"""
+
+	def __init__(self, name: str, interval: float, callback: Callable[[], None]):
+		self.name = name
+		self.interval = max(float(interval), 0.05)
+		self.callback = callback
+
+		self._lock = threading.Lock()
+		self._run_lock = threading.Lock()
+		self._stop = threading.Event()
+		self._thread: threading.Thread | None = None
+		self._pid: int | None = None
+		self._atexit_registered = False
+
+	def start(self) -> None:
+		pid = os.getpid()
+		thread = self._thread
+		if thread is not None and self._pid == pid and thread.is_alive():
+			return
+		with self._lock:
+			thread = self._thread
+			if thread is not None and self._pid == pid and thread.is_alive():
+				return
+			if self._pid is not None and self._pid != pid:
+				# Forked: the parent's locks may be held by a thread that no longer exists.
+				self._run_lock = threading.Lock()
+			self._pid = pid
+			self._stop.clear()
+			self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+			self._thread.start()
+			if not self._atexit_registered:
+				atexit.register(self.close)
+				self._atexit_registered = True
+
+	def flush(self) -> None:
+		with self._run_lock:
+			try:
+				self.callback()
+			except Exception:
+				log.exception("Periodic flush %s failed", self.name)
+
+	def close(self, timeout: float = 5.0) -> None:
+		self._stop.set()
+		thread = self._thread
+		if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+			thread.join(timeout)
+		self.flush()
+
+	def _loop(self) -> None:
+		while not self._stop.wait(self.interval):
+			self.flush()
+			# Long-lived thread: don't keep an idle connection checked out between runs.
+			connection.close()
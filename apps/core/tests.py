@@ -1,2 +1,36 @@
+from __future__ import annotations
 
-# Create your tests here.
+from datetime import UTC, datetime
+
+from django.test import TestCase
+
+from apps.core.partitioning import (
+	ensure_partitions,
+	is_partitioned,
+	list_partitions,
+	partition_name,
+	purge_before,
+)
+from apps.logs.models import LogEntry
+
+
+class PartitioningTests(TestCase):
+	table = LogEntry._meta.db_table
+
+	def test_log_table_is_partitioned(self):
+		self.assertTrue(is_partitioned(self.table))
+		self.assertTrue(any(p.is_default for p in list_partitions(self.table)))
+
+	def test_ensure_partitions_moves_default_rows_and_purge_drops_them(self):
+		old = datetime(2020, 3, 15, tzinfo=UTC)
+		LogEntry.objects.create(level="INFO", logger="t", message="old", created_at=old)
+
+		created = ensure_partitions(self.table, granularity="month", ahead=0, now=old)
+		self.assertEqual(created, [partition_name(self.table, datetime(2020, 3, 1, tzinfo=UTC), "month")])
+		# Idempotent
+		self.assertEqual(ensure_partitions(self.table, granularity="month", ahead=0, now=old), [])
+		self.assertEqual(LogEntry.objects.filter(message="old").count(), 1)
+
+		rows, removed = purge_before(LogEntry, datetime(2020, 4, 1, tzinfo=UTC))
+		self.assertEqual([name for name, _ in removed], created)
+		self.assertFalse(LogEntry.objects.filter(message="old").exists())
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from apps.entitlements.models import FeatureFlag, Plan, QuotaUsage, TenantPlan
+from apps.entitlements.models import FeatureFlag, Plan, QuotaUsage, TenantPlan, UsageGauge
 
 
 @admin.register(Plan)
@@ -29,3 +29,10 @@ class QuotaUsageAdmin(admin.ModelAdmin):
 	list_display = ("tenant", "key", "period", "period_start", "value", "updated_at")
 	list_filter = ("period", "key")
 	search_fields = ("tenant__slug", "key")
+
+
+@admin.register(UsageGauge)
+class UsageGaugeAdmin(admin.ModelAdmin):
+	list_display = ("tenant", "key", "value", "updated_at", "reconciled_at")
+	list_filter = ("key",)
+	search_fields = ("tenant__slug", "key")
@@ -5,3 +5,9 @@ class EntitlementsConfig(AppConfig):
 	default_auto_field = "django.db.models.BigAutoField"
 	name = "apps.entitlements"
 	verbose_name = "Entitlements"
+
+	def ready(self):
+		from apps.entitlements import cache, gauges
+
+		cache.connect_signals()
+		gauges.connect_signals()
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+_SHARED_PREFIX = "entitlements:snapshot"
+_GENERATION_KEY = "entitlements:generation"
+
+# {tenant_id: EntitlementSnapshot | None} for the current request (see EntitlementSnapshotMiddleware).
+_request_memo: ContextVar[dict | None] = ContextVar("entitlements_request_memo", default=None)
+
+
+def _frozen(d: dict) -> MappingProxyType:
+	return MappingProxyType(dict(d))
+
+
+@dataclass(frozen=True)
+class EntitlementSnapshot:
+	"""
+	A tenant's effective entitlements: plan quotas / feature flags with the
+	TenantPlan overrides applied. Immutable; shared between requests and threads.
+	"""
+
+	tenant_id: str
+	plan_code: str
+	status: str
+	quotas: MappingProxyType = field(default_factory=lambda: _frozen({}))
+	features: MappingProxyType = field(default_factory=lambda: _frozen({}))
+
+	@classmethod
+	def from_tenant_plan(cls, tp) -> EntitlementSnapshot:
+		def _dict(value) -> dict:
+			return dict(value) if isinstance(value, dict) else {}
+
+		quotas = {**_dict(tp.plan.quotas), **_dict(tp.quota_overrides)}
+		features = {k: bool(v) for k, v in {**_dict(tp.plan.feature_flags), **_dict(tp.feature_overrides)}.items()}
+		return cls(
+			tenant_id=str(tp.tenant_id),
+			plan_code=tp.plan.code,
+			status=tp.status,
+			quotas=_frozen(quotas),
+			features=_frozen(features),
+		)
+
+	def quota_limit(self, key: str) -> int | None:
+		"""
+		None => no limit configured (unlimited); otherwise the limit.
+		"""
+		limit = self.quotas.get(key)
+		if limit is None:
+			return None
+		try:
+			return int(limit)
+		except Exception:
+			return None
+
+	def feature_enabled(self, key: str) -> bool:
+		return bool(self.features.get(key, False))
+
+	def to_dict(self) -> dict[str, Any]:
+		return {
+			"tenant_id": self.tenant_id,
+			"plan_code": self.plan_code,
+			"status": self.status,
+			"quotas": dict(self.quotas),
+			"features": dict(self.features),
+		}
+
+	@classmethod
+	def from_dict(cls, d: dict[str, Any]) -> EntitlementSnapshot:
+		return cls(
+			tenant_id=d["tenant_id"],
+			plan_code=d["plan_code"],
+			status=d["status"],
+			quotas=_frozen(d.get("quotas") or {}),
+			features=_frozen(d.get("features") or {}),
+		)
+
+
+class _LRU:
+	"""
+	Small thread-safe LRU with a per-entry TTL (monotonic clock).
+	"""
+
+	def __init__(self, *, clock=time.monotonic):
+		self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+		self._lock = threading.Lock()
+		self._clock = clock
+
+	def get(self, key: str, default=None):
+		with self._lock:
+			item = self._data.get(key)
+			if item is None:
+				return default
+			expires, value = item
+			if expires <= self._clock():
+				del self._data[key]
+				return default
+			self._data.move_to_end(key)
+			return value
+
+	def set(self, key: str, value, *, ttl_s: float, maxsize: int) -> None:
+		with self._lock:
+			self._data[key] = (self._clock() + ttl_s, value)
+			self._data.move_to_end(key)
+			while len(self._data) > maxsize:
+				self._data.popitem(last=False)
+
+	def pop(self, key: str) -> None:
+		with self._lock:
+			self._data.pop(key, None)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+
+
+_local = _LRU()
+_MISSING = object()
+
+
+def _local_ttl_s() -> float:
+	return float(getattr(settings, "ENTITLEMENT_CACHE_TTL_S", 30))
+
+
+def _shared_ttl_s() -> int:
+	return int(getattr(settings, "ENTITLEMENT_SHARED_CACHE_TTL_S", 300))
+
+
+def default_cache_is_shared() -> bool:
+	"""
+	False for per-process (LocMem) or no-op default caches, i.e. without REDIS_CACHE_URL.
+	"""
+	return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _shared_key(tenant_id: str) -> str:
+	generation = cache.get(_GENERATION_KEY) or 0
+	return f"{_SHARED_PREFIX}:{generation}:{tenant_id}"
+
+
+def _load(tenant_id: str) -> EntitlementSnapshot | None:
+	from apps.entitlements.models import TenantPlan
+
+	if schema_context is None:
+		return None
+	with schema_context("public"):
+		tp = TenantPlan.objects.select_related("plan").filter(tenant_id=tenant_id).first()
+	return EntitlementSnapshot.from_tenant_plan(tp) if tp else None
+
+
+def get_entitlements(tenant) -> EntitlementSnapshot | None:
+	"""
+	The tenant's EntitlementSnapshot (None without a TenantPlan). Lookup order:
+
+	- request memo (several checks on one page cost nothing)
+	- per-process LRU (ENTITLEMENT_CACHE_TTL_S / ENTITLEMENT_CACHE_MAX_TENANTS)
+	- shared Django cache (ENTITLEMENT_SHARED_CACHE_TTL_S), only when it is actually
+	  shared between processes (Redis); a per-process LocMem cache is skipped
+	- TenantPlan + Plan query (PUBLIC schema)
+
+	Plan / TenantPlan saves invalidate this process and the shared tier; other
+	processes' LRU entries expire within ENTITLEMENT_CACHE_TTL_S (with or without Redis).
+	"""
+	tenant_id = str(getattr(tenant, "id", "") or "")
+	if not tenant_id:
+		return None
+	memo = _request_memo.get()
+	if memo is not None and tenant_id in memo:
+		return memo[tenant_id]
+
+	if not getattr(settings, "ENTITLEMENT_CACHE_ENABLED", True):
+		snapshot = _load(tenant_id)
+	else:
+		snapshot = _local.get(tenant_id, _MISSING)
+		if snapshot is _MISSING:
+			if not default_cache_is_shared():
+				snapshot = _load(tenant_id)
+			else:
+				key = _shared_key(tenant_id)
+				cached = cache.get(key, _MISSING)
+				if cached is _MISSING:
+					snapshot = _load(tenant_id)
+					cache.set(key, snapshot.to_dict() if snapshot else None, timeout=_shared_ttl_s())
+				else:
+					snapshot = EntitlementSnapshot.from_dict(cached) if cached else None
+			_local.set(
+				tenant_id,
+				snapshot,
+				ttl_s=_local_ttl_s(),
+				maxsize=int(getattr(settings, "ENTITLEMENT_CACHE_MAX_TENANTS", 1024)),
+			)
+
+	if memo is not None:
+		memo[tenant_id] = snapshot
+	return snapshot
+
+
+def invalidate_tenant(tenant_id) -> None:
+	tenant_id = str(tenant_id)
+	_local.pop(tenant_id)
+	cache.delete(_shared_key(tenant_id))
+	memo = _request_memo.get()
+	if memo is not None:
+		memo.pop(tenant_id, None)
+
+
+def invalidate_all() -> None:
+	"""
+	A Plan changed: every tenant on it is stale. Bumping the generation orphans all
+	shared entries (they expire on their own TTL).
+	"""
+	_local.clear()
+	try:
+		cache.incr(_GENERATION_KEY)
+	except ValueError:
+		cache.set(_GENERATION_KEY, 1, timeout=None)
+	memo = _request_memo.get()
+	if memo is not None:
+		memo.clear()
+
+
+def start_request_memo():
+	return _request_memo.set({})
+
+
+def end_request_memo(token) -> None:
+	_request_memo.reset(token)
+
+
+def _tenant_plan_changed(sender, instance, **kwargs) -> None:
+	# Now (this transaction reads its own writes) and again after commit, in case
+	# another process cached the old row in between.
+	invalidate_tenant(instance.tenant_id)
+	transaction.on_commit(lambda: invalidate_tenant(instance.tenant_id))
+
+
+def _plan_changed(sender, instance, **kwargs) -> None:
+	invalidate_all()
+	transaction.on_commit(invalidate_all)
+
+
+def connect_signals() -> None:
+	from apps.entitlements.models import Plan, TenantPlan
+
+	post_save.connect(_tenant_plan_changed, sender=TenantPlan, dispatch_uid="entitlements.cache.tenant_plan_saved", weak=False)
+	post_delete.connect(_tenant_plan_changed, sender=TenantPlan, dispatch_uid="entitlements.cache.tenant_plan_deleted", weak=False)
+	post_save.connect(_plan_changed, sender=Plan, dispatch_uid="entitlements.cache.plan_saved", weak=False)
+	post_delete.connect(_plan_changed, sender=Plan, dispatch_uid="entitlements.cache.plan_deleted", weak=False)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from apps.entitlements.cache import default_cache_is_shared
+from apps.entitlements.models import QuotaUsage
+from apps.entitlements.services import (
+	QUOTA_API_REQUESTS_PER_DAY,
+	_enforcement_mode,
+	_utc_now,
+	_window_end,
+	_window_start,
+	enforce_quota,
+	get_effective_quota_limit,
+	increment_and_enforce,
+)
+from apps.logs.prometheus import record_quota_check, record_quota_usage
+from apps.tenancy.models import Tenant
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+log = logging.getLogger(__name__)
+
+# Counters kept in the cache and reconciled into QuotaUsage: (usage key, period).
+CACHED_COUNTERS = ((QUOTA_API_REQUESTS_PER_DAY, "day"),)
+
+# Adds the increments counted in the cache since the last reconcile; fallback
+# increments written to the row while the cache was down are kept.
+_RECONCILE_SQL = """
+INSERT INTO {table} (uid, tags, created_at, updated_at, tenant_id, key, period, period_start, period_end, value)
+VALUES (%(uid)s, '[]'::jsonb, %(now)s, %(now)s, %(tenant_id)s, %(key)s, %(period)s, %(start)s, %(end)s, %(delta)s)
+ON CONFLICT (tenant_id, key, period, period_start) DO UPDATE
+SET value = {table}.value + EXCLUDED.value, updated_at = EXCLUDED.updated_at
+"""
+
+_RECONCILE_LOCK = "entitlements:usage:reconcile"
+
+_WARN_EVERY_S = 60.0
+_last_warning = 0.0
+
+# Base keys this process must re-read from QuotaUsage: it counted in the DB while
+# the cache was down, so the cached base is missing those increments.
+_stale_bases: set[str] = set()
+
+
+def _backend() -> str:
+	return (getattr(settings, "QUOTA_COUNTER_BACKEND", "cache") or "cache").strip().lower()
+
+
+def counter_key(tenant_id, key: str, period: str, start: datetime) -> str:
+	"""
+	Cache key of the increments not yet reconciled into QuotaUsage.
+	"""
+	return f"entitlements:usage:{tenant_id}:{key}:{period}:{start:%Y%m%d}"
+
+
+def base_key(tenant_id, key: str, period: str, start: datetime) -> str:
+	"""
+	Cache key of the QuotaUsage value as of the last reconcile (or DB read).
+	"""
+	return f"{counter_key(tenant_id, key, period, start)}:base"
+
+
+def _timeout_s(end: datetime | None, now: datetime) -> int:
+	# Keep a closed window around for a day so the reconcile task still sees its final count.
+	if end is None:
+		return 60 * 60 * 24 * 40
+	return int((end - now).total_seconds()) + 60 * 60 * 24
+
+
+def _db_value(tenant_id, key: str, period: str, start: datetime) -> int:
+	qs = QuotaUsage.objects.filter(tenant_id=tenant_id, key=key, period=period, period_start=start)
+	if schema_context is None:
+		return int(qs.values_list("value", flat=True).first() or 0)
+	with schema_context("public"):
+		return int(qs.values_list("value", flat=True).first() or 0)
+
+
+def _cache_incr(tenant, key: str, period: str, delta: int) -> tuple[int, str, datetime]:
+	"""
+	INCR the window's unreconciled count; returns (stored base + that count, counter key, window start).
+	"""
+	now = _utc_now()
+	start = _window_start(period, now)
+	timeout = _timeout_s(_window_end(period, start), now)
+	ckey = counter_key(tenant.id, key, period, start)
+	try:
+		pending = cache.incr(ckey, delta)
+	except ValueError:
+		pending = delta if cache.add(ckey, delta, timeout=timeout) else cache.incr(ckey, delta)
+
+	bkey = base_key(tenant.id, key, period, start)
+	base = None if bkey in _stale_bases else cache.get(bkey)
+	if base is None:
+		base = _db_value(tenant.id, key, period, start)
+		cache.set(bkey, base, timeout=timeout)
+		_stale_bases.discard(bkey)
+	return int(base) + pending, ckey, start
+
+
+def _warn_fallback(exc: Exception) -> None:
+	global _last_warning
+	now = time.monotonic()
+	if now - _last_warning >= _WARN_EVERY_S:
+		_last_warning = now
+		log.warning("Quota counter cache unavailable, falling back to the database: %s", exc)
+
+
+def count_and_enforce(
+	tenant,
+	*,
+	key: str,
+	period: str,
+	action: str,
+	obj=None,
+	metadata: dict[str, Any] | None = None,
+	delta: int = 1,
+) -> int:
+	"""
+	increment_and_enforce() for high-frequency counters: an atomic cache INCR per
+	(tenant, key, window) instead of a locked QuotaUsage row, with the limit from the
+	cached entitlement snapshot. The value checked is the stored QuotaUsage value (cached)
+	plus the increments not yet reconciled. Returns the new value.
+
+	- hard mode: an over-limit increment is undone and ValidationError raised
+	- QUOTA_COUNTER_BACKEND="db", a per-process default cache (LocMem: every worker
+	  would count on its own and the reconcile task would see nothing) or a cache
+	  error: increment_and_enforce() (DB row lock); this process then re-reads the
+	  stored value once the cache is back
+
+	reconcile_usage_counters() adds the cached increments to QuotaUsage.
+	"""
+	if _backend() == "cache" and default_cache_is_shared():
+		try:
+			value, ckey, _ = _cache_incr(tenant, key, period, int(delta))
+		except Exception as e:
+			_warn_fallback(e)
+			start = _window_start(period, _utc_now())
+			_stale_bases.add(base_key(tenant.id, key, period, start))
+		else:
+			needed = int(delta)
+			used = value - needed
+			limit = get_effective_quota_limit(tenant, key)
+			if limit is not None and value > int(limit):
+				if _enforcement_mode() == "hard":
+					try:
+						cache.decr(ckey, needed)
+					except Exception:
+						pass
+				# Audits / logs; raises ValidationError in hard mode.
+				enforce_quota(tenant, key=key, used=used, needed=needed, action=action, obj=obj, metadata=metadata)
+			else:
+				record_quota_check(key, "allowed")
+			record_quota_usage(key, needed)
+			return value
+
+	return increment_and_enforce(tenant, key=key, period=period, action=action, obj=obj, metadata=metadata, delta=delta)
+
+
+def reconcile_usage_counters(*, now: datetime | None = None) -> int:
+	"""
+	Add the increments counted in the cache (current + previous window) to QuotaUsage
+	(PUBLIC schema), one upsert per counter (no audit events), then refresh the cached
+	base values and take the added increments off the cached counts. Increments written
+	to the DB while the cache was down are kept. Returns rows written.
+	"""
+	if schema_context is None:
+		return 0
+	# Overlapping runs would add the same increments twice.
+	if not cache.add(_RECONCILE_LOCK, 1, timeout=int(getattr(settings, "QUOTA_COUNTER_FLUSH_INTERVAL_S", 60)) * 5):
+		return 0
+	try:
+		return _reconcile(now or _utc_now())
+	finally:
+		cache.delete(_RECONCILE_LOCK)
+
+
+def _reconcile(now: datetime) -> int:
+	written = 0
+	table = connection.ops.quote_name(QuotaUsage._meta.db_table)
+	with schema_context("public"):
+		tenant_ids = list(Tenant.objects.exclude(schema_name="public").values_list("id", flat=True))
+		for key, period in CACHED_COUNTERS:
+			current = _window_start(period, now)
+			windows = {current, _window_start(period, current - timedelta(seconds=1))}
+			for start in windows:
+				end = _window_end(period, start)
+				timeout = _timeout_s(end, now)
+				for i in range(0, len(tenant_ids), 500):
+					chunk = tenant_ids[i : i + 500]
+					ckeys = {counter_key(tid, key, period, start): tid for tid in chunk}
+					bkeys = {base_key(tid, key, period, start): tid for tid in chunk}
+					pending = {ckey: int(n) for ckey, n in cache.get_many(list(ckeys)).items() if int(n) > 0}
+					cached_bases = cache.get_many(list(bkeys))
+					if not pending and not cached_bases:
+						continue
+					with connection.cursor() as cur:
+						for ckey, n in pending.items():
+							params = {
+								"uid": uuid.uuid4(),
+								"now": now,
+								"tenant_id": ckeys[ckey],
+								"key": key,
+								"period": period,
+								"start": start,
+								"end": end,
+								"delta": n,
+							}
+							cur.execute(_RECONCILE_SQL.format(table=table), params)
+					active = {ckeys[ckey] for ckey in pending} | {bkeys[bkey] for bkey in cached_bases}
+					stored = dict(
+						QuotaUsage.objects.filter(tenant_id__in=active, key=key, period=period, period_start=start).values_list(
+							"tenant_id", "value"
+						)
+					)
+					# New base first, then take the added increments off: in between a check
+					# over-counts (never under-counts) by the increments being moved.
+					cache.set_many(
+						{base_key(tid, key, period, start): int(stored.get(tid) or 0) for tid in active}, timeout=timeout
+					)
+					for ckey, n in pending.items():
+						cache.decr(ckey, n)
+					written += len(pending)
+	return written
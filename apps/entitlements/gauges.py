@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import uuid
+
+from django.apps import apps as django_apps
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from apps.entitlements.models import UsageGauge
+from apps.entitlements.services import get_tenant_by_schema
+from apps.tenancy.models import Tenant
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+GAUGE_UNITS = "units"
+GAUGE_USERS = "users"
+GAUGE_PROPERTIES = "properties"
+GAUGE_DOCUMENTS = "documents"
+
+# Tenant-schema model -> gauge key. Rows created with bulk_create() / raw SQL are not
+# seen by the signals; reconcile_usage_gauges() corrects that drift nightly.
+GAUGED_MODELS = {
+	"properties.Unit": GAUGE_UNITS,
+	"accounts.User": GAUGE_USERS,
+	"properties.Property": GAUGE_PROPERTIES,
+	"documents.Document": GAUGE_DOCUMENTS,
+}
+
+_ADD_SQL = """
+INSERT INTO {table} (uid, tags, created_at, updated_at, tenant_id, key, value)
+VALUES (%(uid)s, '[]'::jsonb, %(now)s, %(now)s, %(tenant_id)s, %(key)s, %(delta)s)
+ON CONFLICT (tenant_id, key) DO UPDATE
+SET value = GREATEST({table}.value + EXCLUDED.value, 0), updated_at = EXCLUDED.updated_at
+RETURNING (xmax = 0) AS inserted
+"""
+
+_SET_SQL = """
+INSERT INTO {table} (uid, tags, created_at, updated_at, tenant_id, key, value, reconciled_at)
+VALUES (%(uid)s, '[]'::jsonb, %(now)s, %(now)s, %(tenant_id)s, %(key)s, %(value)s, %(now)s)
+ON CONFLICT (tenant_id, key) DO UPDATE
+SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at, reconciled_at = EXCLUDED.reconciled_at
+-- the subquery sees the snapshot from before this statement: the previous value
+RETURNING (SELECT value FROM {table} WHERE tenant_id = %(tenant_id)s AND key = %(key)s)
+"""
+
+# Reconcile: make sure the gauge row exists, then hold its lock while counting so a
+# concurrent add_to_gauge() lands either before the count or on top of it.
+_ENSURE_SQL = """
+INSERT INTO {table} (uid, tags, created_at, updated_at, tenant_id, key, value)
+VALUES (%(uid)s, '[]'::jsonb, %(now)s, %(now)s, %(tenant_id)s, %(key)s, 0)
+ON CONFLICT (tenant_id, key) DO NOTHING
+"""
+
+_LOCK_SQL = "SELECT value FROM {table} WHERE tenant_id = %(tenant_id)s AND key = %(key)s FOR UPDATE"
+
+
+def _table() -> str:
+	return connection.ops.quote_name(UsageGauge._meta.db_table)
+
+
+def _model_for(key: str):
+	for label, gauge_key in GAUGED_MODELS.items():
+		if gauge_key == key:
+			return django_apps.get_model(label)
+	raise KeyError(key)
+
+
+def _set_gauge(tenant_id, key: str, value: int) -> int | None:
+	"""
+	Upsert the gauge to `value` (PUBLIC schema); returns the previous value (None if new).
+	"""
+	params = {"uid": uuid.uuid4(), "now": timezone.now(), "tenant_id": tenant_id, "key": key, "value": int(value)}
+	with schema_context("public"), connection.cursor() as cur:
+		cur.execute(_SET_SQL.format(table=_table()), params)
+		row = cur.fetchone()
+	return row[0] if row else None
+
+
+def add_to_gauge(tenant, key: str, delta: int) -> None:
+	"""
+	Adjust the tenant's gauge by `delta` in the caller's transaction (rolled back with
+	it). Must run in the tenant's schema: a gauge seen for the first time is initialised
+	with a full count there.
+	"""
+	params = {"uid": uuid.uuid4(), "now": timezone.now(), "tenant_id": tenant.id, "key": key, "delta": int(delta)}
+	with schema_context("public"), connection.cursor() as cur:
+		cur.execute(_ADD_SQL.format(table=_table()), params)
+		inserted = bool(cur.fetchone()[0])
+	if inserted:
+		_set_gauge(tenant.id, key, _model_for(key)._base_manager.count())
+
+
+def get_usage_gauge(tenant, key: str) -> int:
+	"""
+	O(1) read of a tenant's gauge. A missing gauge is initialised from a full count in
+	the tenant's schema.
+	"""
+	with schema_context("public"):
+		value = UsageGauge.objects.filter(tenant_id=tenant.id, key=key).values_list("value", flat=True).first()
+	if value is not None:
+		return int(value)
+	with schema_context(tenant.schema_name):
+		count = _model_for(key)._base_manager.count()
+	_set_gauge(tenant.id, key, count)
+	return count
+
+
+def get_usage_gauges(tenant) -> dict[str, int]:
+	"""
+	All of a tenant's gauges ({key: value}) in one query; missing keys are absent.
+	"""
+	with schema_context("public"):
+		return dict(UsageGauge.objects.filter(tenant_id=tenant.id).values_list("key", "value"))
+
+
+def _current_tenant():
+	schema = getattr(connection, "schema_name", "") or ""
+	if schema_context is None or not schema or schema == "public":
+		return None
+	return get_tenant_by_schema(schema)
+
+
+def _on_created(sender, instance, created, **kwargs) -> None:
+	if not created:
+		return
+	tenant = _current_tenant()
+	if tenant is not None:
+		add_to_gauge(tenant, GAUGED_MODELS[sender._meta.label], 1)
+
+
+def _on_deleted(sender, instance, **kwargs) -> None:
+	tenant = _current_tenant()
+	if tenant is not None:
+		add_to_gauge(tenant, GAUGED_MODELS[sender._meta.label], -1)
+
+
+def connect_signals() -> None:
+	for label in GAUGED_MODELS:
+		model = django_apps.get_model(label)
+		post_save.connect(_on_created, sender=model, dispatch_uid=f"entitlements.gauges.created.{label}", weak=False)
+		post_delete.connect(_on_deleted, sender=model, dispatch_uid=f"entitlements.gauges.deleted.{label}", weak=False)
+
+
+def _recount(tenant, key: str) -> tuple[int | None, int]:
+	"""
+	Recount one gauge under its row lock; returns (previous value or None if new, count).
+	"""
+	params = {"uid": uuid.uuid4(), "now": timezone.now(), "tenant_id": tenant.id, "key": key}
+	with transaction.atomic():
+		with schema_context("public"), connection.cursor() as cur:
+			cur.execute(_ENSURE_SQL.format(table=_table()), params)
+			created = cur.rowcount == 1
+			cur.execute(_LOCK_SQL.format(table=_table()), params)
+			was = cur.fetchone()[0]
+		with schema_context(tenant.schema_name):
+			count = _model_for(key)._base_manager.count()
+		_set_gauge(tenant.id, key, count)
+	return (None if created else int(was)), count
+
+
+def reconcile_usage_gauges(*, schemas: list[str] | None = None) -> list[dict]:
+	"""
+	Recount every gauged model in each tenant schema and store the result.
+	Returns the gauges that had drifted: [{ schema, key, was, now }].
+	"""
+	if schema_context is None:
+		return []
+	with schema_context("public"):
+		tenants = list(Tenant.objects.exclude(schema_name="public").only("id", "schema_name"))
+	drift: list[dict] = []
+	for tenant in tenants:
+		if schemas and tenant.schema_name not in schemas:
+			continue
+		for key in GAUGED_MODELS.values():
+			was, count = _recount(tenant, key)
+			if was is not None and was != count:
+				drift.append({"schema": tenant.schema_name, "key": key, "was": was, "now": count})
+	return drift
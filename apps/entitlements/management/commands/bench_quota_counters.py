@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from apps.entitlements.models import Plan, QuotaUsage, TenantPlan
+from apps.entitlements.services import increment_and_enforce
+from apps.tenancy.models import Tenant
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+class Command(BaseCommand):
+	help = (
+		"Concurrency benchmark of increment_and_enforce(): N threads incrementing one tenant's "
+		"usage counter (DB path). Uses a throwaway tenant row (no schema) that is removed afterwards."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("--threads", type=int, default=16)
+		parser.add_argument("--iterations", type=int, default=200, help="Increments per thread.")
+		parser.add_argument("--limit", type=int, default=0, help="Quota limit (0 = threads * iterations, never hit).")
+		parser.add_argument("--mode", choices=["soft", "hard"], default="hard")
+
+	def handle(self, *args, **opts):
+		if schema_context is None:
+			self.stderr.write("django-tenants is required.")
+			return
+		threads = max(int(opts["threads"]), 1)
+		iterations = max(int(opts["iterations"]), 1)
+		total = threads * iterations
+		limit = int(opts["limit"]) or total
+		key = f"bench_{uuid.uuid4().hex[:8]}"
+
+		with schema_context("public"):
+			tenant = Tenant(name="Quota bench", slug=key.replace("_", "-"), schema_name=key)
+			tenant.auto_create_schema = False
+			tenant.save()
+			plan = Plan.objects.create(code=key.replace("_", "-"), name="Quota bench", is_active=False, quotas={key: limit})
+			TenantPlan.objects.create(tenant=tenant, plan=plan)
+
+		errors: list[Exception] = []
+		blocked = [0]
+		lock = threading.Lock()
+
+		def worker():
+			try:
+				with schema_context("public"):
+					for _ in range(iterations):
+						try:
+							increment_and_enforce(tenant, key=key, period="day", action="bench.quota.exceeded")
+						except ValidationError:
+							with lock:
+								blocked[0] += 1
+			except Exception as e:  # pragma: no cover
+				errors.append(e)
+			finally:
+				connection.close()
+
+		try:
+			with override_settings(ENTITLEMENTS_ENFORCEMENT=opts["mode"]):
+				pool = [threading.Thread(target=worker) for _ in range(threads)]
+				start = time.perf_counter()
+				for t in pool:
+					t.start()
+				for t in pool:
+					t.join()
+				elapsed = time.perf_counter() - start
+
+			with schema_context("public"):
+				value = QuotaUsage.objects.filter(tenant=tenant, key=key).values_list("value", flat=True).first()
+			self.stdout.write(
+				f"threads={threads} increments={total} limit={limit} mode={opts['mode']}\n"
+				f"{total / elapsed:>10.0f} increments/s {elapsed / total * 1e6:>9.1f} µs/increment (wall)\n"
+				f"final value={value} blocked={blocked[0]} errors={len(errors)}"
+			)
+			for e in errors[:3]:
+				self.stderr.write(repr(e))
+		finally:
+			with schema_context("public"):
+				QuotaUsage.objects.filter(tenant=tenant).delete()
+				TenantPlan.objects.filter(tenant=tenant).delete()
+				plan.delete()
+				Tenant.objects.filter(pk=tenant.pk).delete()
@@ -2,7 +2,28 @@ from __future__ import annotations
 
 from django.http import HttpResponse
 
-from apps.entitlements.services import QUOTA_API_REQUESTS_PER_DAY, get_tenant_by_schema, increment_and_enforce
+from apps.entitlements.cache import end_request_memo, start_request_memo
+from apps.entitlements.counters import count_and_enforce
+from apps.entitlements.ratelimit import api_key_id, check_rate_limit
+from apps.entitlements.services import QUOTA_API_REQUESTS_PER_DAY, get_tenant_by_schema
+from apps.tenancy.models import Tenant
+
+
+class EntitlementSnapshotMiddleware:
+	"""
+	Memoises entitlement snapshots for the duration of a request, so pages with
+	several quota / feature checks resolve each tenant's entitlements once.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		token = start_request_memo()
+		try:
+			return self.get_response(request)
+		finally:
+			end_request_memo(token)
 
 
 class ApiQuotaMiddleware:
@@ -13,6 +34,9 @@ class ApiQuotaMiddleware:
 	- only counts paths starting with /api/ (by default)
 	- soft mode: allows but logs/audits via entitlements service
 	- hard mode: returns 429 when over quota
+	- counts in the cache (Redis) per tenant/day; see apps.entitlements.counters
+	- burst limit: token buckets per tenant / API key from Plan.quotas (always enforced,
+	  429 + Retry-After; RateLimit-* headers on every counted response)
 	"""
 
 	def __init__(self, get_response):
@@ -26,12 +50,20 @@ class ApiQuotaMiddleware:
 
 		tenant = getattr(request, "tenant", None)
 		schema = getattr(tenant, "schema_name", "") if tenant else ""
-		tenant_row = get_tenant_by_schema(schema)
+		# request.tenant is the row TenantMainMiddleware already loaded.
+		tenant_row = tenant if isinstance(tenant, Tenant) and schema != "public" else get_tenant_by_schema(schema)
 		if not tenant_row:
 			return self.get_response(request)
 
+		limited = check_rate_limit(tenant_row, api_key=api_key_id(request))
+		if limited is not None and not limited.allowed:
+			response = HttpResponse("API rate limit exceeded.", status=429)
+			for name, value in limited.headers().items():
+				response[name] = value
+			return response
+
 		try:
-			increment_and_enforce(
+			count_and_enforce(
 				tenant_row,
 				key=QUOTA_API_REQUESTS_PER_DAY,
 				period="day",
@@ -44,5 +76,9 @@ class ApiQuotaMiddleware:
 			# Hard mode can raise; for API routes we translate into 429.
 			return HttpResponse("API quota exceeded.", status=429)
 
-		return self.get_response(request)
+		response = self.get_response(request)
+		if limited is not None:
+			for name, value in limited.headers().items():
+				response.setdefault(name, value)
+		return response
 
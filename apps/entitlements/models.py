@@ -111,3 +111,26 @@ class QuotaUsage(TimeStampedUUIDModel):
 
 	def __str__(self) -> str:
 		return f"{self.tenant.slug} {self.key}={self.value} ({self.period})"
+
+
+class UsageGauge(TimeStampedUUIDModel):
+	"""
+	Current count of a tenant's billable objects (stored in PUBLIC schema), e.g.
+	key="units" / "users" / "properties" / "documents".
+
+	Maintained transactionally by apps.entitlements.gauges (insert / delete signals in
+	the tenant schema) and corrected nightly by reconcile_usage_gauges().
+	"""
+
+	tenant = models.ForeignKey("tenancy.Tenant", on_delete=models.CASCADE, related_name="usage_gauges")
+	key = models.SlugField()
+	value = models.BigIntegerField(default=0)
+	reconciled_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["tenant", "key"], name="entitlements_usage_gauge_unique"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.tenant.slug} {self.key}={self.value}"
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils import timezone
+
+from apps.entitlements.cache import get_entitlements
+from apps.logs.prometheus import record_quota_check
+
+try:
+	from django.core.cache.backends.redis import RedisCache
+except Exception:  # pragma: no cover
+	RedisCache = None
+
+log = logging.getLogger(__name__)
+
+# Plan.quotas keys (tokens refilled per second / bucket size). A bucket is only
+# enforced when its plan (or TenantPlan override) sets both.
+QUOTA_API_RATE_PER_SECOND = "api_rate_per_second"
+QUOTA_API_BURST = "api_burst"
+QUOTA_API_KEY_RATE_PER_SECOND = "api_key_rate_per_second"
+QUOTA_API_KEY_BURST = "api_key_burst"
+
+_THROTTLED_PREFIX = "entitlements:throttled"
+
+# KEYS[1] = bucket; ARGV = rate/s, burst, cost. Redis' clock, so web nodes agree.
+# Returns {allowed, tokens left (string: Lua numbers are truncated in replies)}.
+_TOKEN_BUCKET_LUA = """
+redis.replicate_commands()
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+  tokens = burst
+  ts = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+	allowed: bool
+	limit: int  # burst
+	remaining: int
+	reset_s: int  # until the bucket is full again
+	retry_after_s: int  # 0 when allowed
+	scope: str = "tenant"  # "tenant" | "api_key"
+
+	def headers(self) -> dict[str, str]:
+		"""
+		IETF RateLimit header fields (+ Retry-After when throttled).
+		"""
+		out = {
+			"RateLimit-Limit": str(self.limit),
+			"RateLimit-Remaining": str(self.remaining),
+			"RateLimit-Reset": str(self.reset_s),
+		}
+		if not self.allowed:
+			out["Retry-After"] = str(self.retry_after_s)
+		return out
+
+
+def _result(allowed: bool, tokens: float, rate: float, burst: int, cost: int, scope: str) -> RateLimitResult:
+	return RateLimitResult(
+		allowed=allowed,
+		limit=burst,
+		remaining=max(int(tokens), 0),
+		reset_s=max(math.ceil((burst - tokens) / rate), 0),
+		retry_after_s=0 if allowed else max(math.ceil((cost - tokens) / rate), 1),
+		scope=scope,
+	)
+
+
+class _LocalBuckets:
+	"""
+	In-process token buckets (no Redis, or Redis unavailable): per worker process, so
+	the effective limit is multiplied by the number of processes.
+	"""
+
+	def __init__(self, *, clock=time.monotonic, max_buckets: int = 10_000):
+		self._buckets: dict[str, tuple[float, float]] = {}
+		self._lock = threading.Lock()
+		self._clock = clock
+		self._max_buckets = max_buckets
+
+	def take(self, key: str, rate: float, burst: int, cost: int) -> tuple[bool, float]:
+		now = self._clock()
+		with self._lock:
+			tokens, ts = self._buckets.get(key, (float(burst), now))
+			tokens = min(float(burst), tokens + max(now - ts, 0.0) * rate)
+			allowed = tokens >= cost
+			if allowed:
+				tokens -= cost
+			if len(self._buckets) >= self._max_buckets and key not in self._buckets:
+				self._buckets.clear()
+			self._buckets[key] = (tokens, now)
+			return allowed, tokens
+
+	def clear(self) -> None:
+		with self._lock:
+			self._buckets.clear()
+
+
+_local = _LocalBuckets()
+_script = None
+_script_lock = threading.Lock()
+
+
+def _redis_take(key: str, rate: float, burst: int, cost: int) -> tuple[bool, float] | None:
+	"""
+	None when the default cache is not Redis.
+	"""
+	global _script
+	backend = caches["default"]
+	if RedisCache is None or not isinstance(backend, RedisCache):
+		return None
+	client = backend._cache.get_client(write=True)
+	if _script is None:
+		with _script_lock:
+			if _script is None:
+				_script = client.register_script(_TOKEN_BUCKET_LUA)
+	allowed, tokens = _script(keys=[backend.make_key(key)], args=[rate, burst, cost], client=client)
+	return bool(int(allowed)), float(tokens)
+
+
+def _take(key: str, rate: float, burst: int, cost: int) -> tuple[bool, float]:
+	if getattr(settings, "API_RATE_LIMIT_BACKEND", "cache") == "cache":
+		try:
+			taken = _redis_take(key, rate, burst, cost)
+			if taken is not None:
+				return taken
+		except Exception as e:
+			log.warning("Rate limit cache unavailable, using in-process buckets: %s", e)
+	return _local.take(key, rate, burst, cost)
+
+
+def api_key_id(request) -> str:
+	"""
+	Short, non-reversible id of the request's API key (X-API-Key or Bearer token); "" if none.
+	"""
+	raw = (request.headers.get("X-API-Key") or "").strip()
+	if not raw:
+		auth = request.headers.get("Authorization") or ""
+		if auth.lower().startswith("bearer "):
+			raw = auth[7:].strip()
+	if not raw:
+		return ""
+	return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _bucket_config(snapshot, rate_key: str, burst_key: str) -> tuple[float, int] | None:
+	try:
+		rate = float(snapshot.quotas.get(rate_key) or 0)
+		burst = int(snapshot.quotas.get(burst_key) or 0)
+	except (TypeError, ValueError):
+		return None
+	if rate <= 0 or burst <= 0:
+		return None
+	return rate, burst
+
+
+def check_rate_limit(tenant, *, api_key: str = "", cost: int = 1) -> RateLimitResult | None:
+	"""
+	Take `cost` tokens from the API key's bucket (when the plan defines one and the
+	request carries a key), then from the tenant's. None when no bucket applies.
+
+	Throttled requests are remembered for the Platform "Throttled" page.
+	"""
+	snapshot = get_entitlements(tenant)
+	if not snapshot:
+		return None
+	# Narrowest bucket first: a key over its own limit must not drain the tenant's bucket.
+	buckets = []
+	key_cfg = _bucket_config(snapshot, QUOTA_API_KEY_RATE_PER_SECOND, QUOTA_API_KEY_BURST) if api_key else None
+	if key_cfg:
+		buckets.append(("api_key", f"entitlements:bucket:{tenant.id}:{api_key}", *key_cfg))
+	tenant_cfg = _bucket_config(snapshot, QUOTA_API_RATE_PER_SECOND, QUOTA_API_BURST)
+	if tenant_cfg:
+		buckets.append(("tenant", f"entitlements:bucket:{tenant.id}", *tenant_cfg))
+
+	result = None
+	for scope, key, rate, burst in buckets:
+		allowed, tokens = _take(key, rate, burst, cost)
+		current = _result(allowed, tokens, rate, burst, cost, scope)
+		if not allowed:
+			record_quota_check(QUOTA_API_RATE_PER_SECOND, "throttled")
+			_remember_throttled(tenant, current, api_key=api_key if scope == "api_key" else "")
+			return current
+		# Headers describe the bucket closest to running out.
+		if result is None or current.remaining < result.remaining:
+			result = current
+	if result is not None:
+		record_quota_check(QUOTA_API_RATE_PER_SECOND, "allowed")
+	return result
+
+
+def _remember_throttled(tenant, result: RateLimitResult, *, api_key: str) -> None:
+	key = f"{_THROTTLED_PREFIX}:{tenant.id}"
+	try:
+		prev = cache.get(key) or {}
+		cache.set(
+			key,
+			{
+				"tenant_id": str(tenant.id),
+				"schema": getattr(tenant, "schema_name", ""),
+				"scope": result.scope,
+				"api_key": api_key,
+				"count": int(prev.get("count", 0)) + 1,
+				"first_at": prev.get("first_at") or timezone.now(),
+				"last_at": timezone.now(),
+				"retry_after_s": result.retry_after_s,
+			},
+			timeout=int(getattr(settings, "API_THROTTLED_WINDOW_S", 300)),
+		)
+	except Exception:
+		pass
+
+
+def get_throttled_tenants(tenant_ids: list) -> list[dict]:
+	"""
+	Tenants throttled within the last API_THROTTLED_WINDOW_S, most recent first.
+	"""
+	rows: list[dict] = []
+	for i in range(0, len(tenant_ids), 500):
+		keys = [f"{_THROTTLED_PREFIX}:{tid}" for tid in tenant_ids[i : i + 500]]
+		try:
+			rows.extend(cache.get_many(keys).values())
+		except Exception:
+			return rows
+	return sorted(rows, key=lambda r: r["last_at"], reverse=True)
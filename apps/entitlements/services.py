@@ -1,18 +1,20 @@
 from __future__ import annotations
 
 import logging
+import uuid
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import F
+from django.db import connection
 
 from apps.audits.models import AuditStatus
 from apps.audits.services import audit_log
+from apps.entitlements.cache import get_entitlements
 from apps.entitlements.models import QuotaUsage, TenantPlan
+from apps.logs.prometheus import record_quota_check, record_quota_usage
 from apps.tenancy.models import Tenant
 
 try:
@@ -96,12 +98,16 @@ def get_current_tenant_plan(tenant) -> TenantPlan | None:
 def get_tenant_by_schema(schema_name: str) -> Tenant | None:
 	"""
 	Resolve a tenant row from PUBLIC schema by schema_name.
+	Reuses the tenant django-tenants already loaded for this connection (no query).
 	"""
 	if schema_context is None:
 		return None
 	schema_name = (schema_name or "").strip()
 	if not schema_name or schema_name == "public":
 		return None
+	current = getattr(connection, "tenant", None)
+	if isinstance(current, Tenant) and current.schema_name == schema_name:
+		return current
 	with schema_context("public"):
 		return Tenant.objects.filter(schema_name=schema_name).first()
 
@@ -111,46 +117,20 @@ def get_effective_quota_limit(tenant, key: str) -> int | None:
 	Returns:
 	  - None => no limit configured (treat as unlimited)
 	  - >= 0 => limit
-	"""
-	tp = get_current_tenant_plan(tenant)
-	if not tp:
-		return None
-
-	limit = None
-	try:
-		limit = (tp.plan.quotas or {}).get(key)
-	except Exception:
-		limit = None
-
-	try:
-		if key in (tp.quota_overrides or {}):
-			limit = tp.quota_overrides.get(key)
-	except Exception:
-		pass
 
-	if limit is None:
-		return None
-	try:
-		return int(limit)
-	except Exception:
+	Served from the cached EntitlementSnapshot (apps.entitlements.cache).
+	"""
+	snapshot = get_entitlements(tenant)
+	if not snapshot:
 		return None
+	return snapshot.quota_limit(key)
 
 
 def is_feature_enabled(tenant, key: str) -> bool:
-	tp = get_current_tenant_plan(tenant)
-	if not tp:
+	snapshot = get_entitlements(tenant)
+	if not snapshot:
 		return False
-	val = False
-	try:
-		val = bool((tp.plan.feature_flags or {}).get(key, False))
-	except Exception:
-		val = False
-	try:
-		if key in (tp.feature_overrides or {}):
-			val = bool(tp.feature_overrides.get(key))
-	except Exception:
-		pass
-	return val
+	return snapshot.feature_enabled(key)
 
 
 def get_usage_counter(tenant, key: str, period: str = "month") -> QuotaUsage:
@@ -207,6 +187,7 @@ def enforce_quota(
 	metadata: dict[str, Any] | None = None,
 ) -> QuotaCheck:
 	qc = check_quota(tenant, key=key, used=used, needed=needed)
+	record_quota_check(key, "allowed" if qc.allowed else ("blocked" if qc.mode == "hard" else "exceeded"))
 	if qc.allowed:
 		return qc
 
@@ -242,6 +223,43 @@ def enforce_quota(
 	return qc
 
 
+_UPSERT_USAGE_SQL = """
+INSERT INTO {table} (uid, tags, created_at, updated_at, tenant_id, key, period, period_start, period_end, value)
+SELECT %(uid)s, '[]'::jsonb, %(now)s, %(now)s, %(tenant_id)s, %(key)s, %(period)s, %(start)s, %(end)s, %(delta)s
+WHERE %(limit)s::bigint IS NULL OR %(delta)s <= %(limit)s::bigint
+ON CONFLICT (tenant_id, key, period, period_start) DO UPDATE
+SET value = {table}.value + EXCLUDED.value, updated_at = EXCLUDED.updated_at
+WHERE %(limit)s::bigint IS NULL OR {table}.value + EXCLUDED.value <= %(limit)s::bigint
+RETURNING value
+"""
+
+
+def upsert_usage(tenant, *, key: str, period: str, delta: int, limit: int | None = None) -> int | None:
+	"""
+	One statement (PUBLIC schema): create the window's counter row if missing and add
+	`delta` unless that takes it over `limit`. Returns the new value, or None when the
+	increment was refused (nothing written). Concurrent callers serialise on the row.
+	"""
+	now = _utc_now()
+	start = _window_start(period, now)
+	table = connection.ops.quote_name(QuotaUsage._meta.db_table)
+	params = {
+		"uid": uuid.uuid4(),
+		"now": now,
+		"tenant_id": tenant.id,
+		"key": key,
+		"period": period,
+		"start": start,
+		"end": _window_end(period, start),
+		"delta": int(delta),
+		"limit": None if limit is None else int(limit),
+	}
+	with schema_context("public"), connection.cursor() as cur:
+		cur.execute(_UPSERT_USAGE_SQL.format(table=table), params)
+		row = cur.fetchone()
+	return int(row[0]) if row else None
+
+
 def increment_usage(tenant, key: str, delta: int = 1, period: str = "month") -> int:
 	"""
 	Generic usage incrementer (PUBLIC schema).
@@ -250,60 +268,75 @@ def increment_usage(tenant, key: str, delta: int = 1, period: str = "month") ->
 	if schema_context is None:
 		raise RuntimeError("schema_context unavailable")
 
-	counter = get_usage_counter(tenant, key=key, period=period)
-	with schema_context("public"):
-		with transaction.atomic():
-			QuotaUsage.objects.filter(pk=counter.pk).update(value=F("value") + int(delta))
-			counter.refresh_from_db(fields=["value"])
-			return int(counter.value)
+	value = upsert_usage(tenant, key=key, period=period, delta=delta)
+	record_quota_usage(key, int(delta))
+	return int(value)
 
 
-def increment_and_enforce(
+def _upsert_and_enforce(
 	tenant,
 	*,
-	key: str,
+	quota_key: str,
+	usage_key: str,
 	period: str,
+	delta: int,
 	action: str,
 	obj=None,
 	metadata: dict[str, Any] | None = None,
-	delta: int = 1,
 ) -> int:
 	"""
-	Atomic (PUBLIC schema):
-	- lock usage row
-	- check limit
-	- increment if allowed
+	- hard mode: conditional upsert; a refused increment is audited and raises
+	- soft mode: unconditional upsert; going over the limit is audited / logged
 	"""
 	if schema_context is None:
 		raise RuntimeError("schema_context unavailable")
 
-	limit = get_effective_quota_limit(tenant, key)
-	mode = _enforcement_mode()
-	counter = get_usage_counter(tenant, key=key, period=period)
-
-	with schema_context("public"):
-		with transaction.atomic():
-			locked = QuotaUsage.objects.select_for_update().get(pk=counter.pk)
-			used = int(locked.value or 0)
-			needed = int(delta)
-
-			if limit is not None and (used + needed) > int(limit):
-				enforce_quota(
-					tenant,
-					key=key,
-					used=used,
-					needed=needed,
-					action=action,
-					obj=obj,
-					metadata=metadata,
+	limit = get_effective_quota_limit(tenant, quota_key)
+	hard = _enforcement_mode() == "hard"
+	needed = int(delta)
+
+	value = upsert_usage(tenant, key=usage_key, period=period, delta=needed, limit=limit if hard else None)
+	if value is None:
+		# Refused: read the current value for the audit event (raises ValidationError).
+		with schema_context("public"):
+			used = int(
+				QuotaUsage.objects.filter(
+					tenant_id=tenant.id, key=usage_key, period=period, period_start=_window_start(period, _utc_now())
 				)
-				# soft mode falls through (records audit/log), still increment for tracking.
-				if mode == "hard":
-					return used
+				.values_list("value", flat=True)
+				.first()
+				or 0
+			)
+		enforce_quota(tenant, key=quota_key, used=used, needed=needed, action=action, obj=obj, metadata=metadata)
+		return used
+
+	if limit is not None and value > int(limit):
+		enforce_quota(tenant, key=quota_key, used=value - needed, needed=needed, action=action, obj=obj, metadata=metadata)
+	else:
+		record_quota_check(quota_key, "allowed")
+	record_quota_usage(usage_key, needed)
+	return value
 
-			locked.value = used + needed
-			locked.save(update_fields=["value", "updated_at"])
-			return int(locked.value)
+
+def increment_and_enforce(
+	tenant,
+	*,
+	key: str,
+	period: str,
+	action: str,
+	obj=None,
+	metadata: dict[str, Any] | None = None,
+	delta: int = 1,
+) -> int:
+	"""
+	Atomic (PUBLIC schema), one INSERT ... ON CONFLICT DO UPDATE:
+	- create the window's usage row if missing
+	- check limit
+	- increment if allowed (soft mode: always, over-limit is audited)
+	"""
+	return _upsert_and_enforce(
+		tenant, quota_key=key, usage_key=key, period=period, delta=delta, action=action, obj=obj, metadata=metadata
+	)
 
 
 def add_storage_bytes(tenant, delta_bytes: int, *, metadata: dict[str, Any] | None = None) -> int:
@@ -317,31 +350,12 @@ def add_storage_bytes(tenant, delta_bytes: int, *, metadata: dict[str, Any] | No
 		return 0
 
 	# Atomic: enforce + increment together on the usage counter row
-	if schema_context is None:
-		raise RuntimeError("schema_context unavailable")
-
-	mode = _enforcement_mode()
-	limit = get_effective_quota_limit(tenant, QUOTA_MAX_STORAGE_BYTES)
-	counter = get_usage_counter(tenant, key=USAGE_STORAGE_BYTES, period="month")
-
-	with schema_context("public"):
-		with transaction.atomic():
-			locked = QuotaUsage.objects.select_for_update().get(pk=counter.pk)
-			used = int(locked.value or 0)
-
-			if limit is not None and (used + delta) > int(limit):
-				enforce_quota(
-					tenant,
-					key=QUOTA_MAX_STORAGE_BYTES,
-					used=used,
-					needed=delta,
-					action="quota.max_storage_bytes.exceeded",
-					obj=None,
-					metadata={**(metadata or {}), "delta_bytes": delta, "usage_key": USAGE_STORAGE_BYTES},
-				)
-				if mode == "hard":
-					return used
-
-			locked.value = used + delta
-			locked.save(update_fields=["value", "updated_at"])
-			return int(locked.value)
+	return _upsert_and_enforce(
+		tenant,
+		quota_key=QUOTA_MAX_STORAGE_BYTES,
+		usage_key=USAGE_STORAGE_BYTES,
+		period="month",
+		delta=delta,
+		action="quota.max_storage_bytes.exceeded",
+		metadata={**(metadata or {}), "delta_bytes": delta, "usage_key": USAGE_STORAGE_BYTES},
+	)
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import logging
+
+from celery import shared_task
+
+log = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def reconcile_usage_counters_task() -> int:
+	"""
+	Every QUOTA_COUNTER_FLUSH_INTERVAL_S: copy cached API request counters into QuotaUsage.
+	"""
+	from apps.entitlements.counters import reconcile_usage_counters
+
+	return reconcile_usage_counters()
+
+
+@shared_task(ignore_result=True)
+def reconcile_usage_gauges_task() -> int:
+	"""
+	Nightly: recount units / users / properties / documents per tenant and fix drifted gauges.
+	"""
+	from apps.entitlements.gauges import reconcile_usage_gauges
+
+	drift = reconcile_usage_gauges()
+	for d in drift:
+		log.warning("Usage gauge drift corrected: %s", d)
+	return len(drift)
@@ -1,18 +1,46 @@
 from __future__ import annotations
 
+from unittest import mock
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase, override_settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from apps.entitlements.models import Plan, TenantPlan
+from apps.entitlements.cache import (
+	_SHARED_PREFIX,
+	end_request_memo,
+	get_entitlements,
+	invalidate_tenant,
+	start_request_memo,
+)
+from apps.entitlements.counters import count_and_enforce, reconcile_usage_counters
+from apps.entitlements.gauges import (
+	GAUGE_PROPERTIES,
+	GAUGE_UNITS,
+	get_usage_gauge,
+	get_usage_gauges,
+	reconcile_usage_gauges,
+)
+from apps.entitlements.middleware import ApiQuotaMiddleware
+from apps.entitlements.models import Plan, QuotaUsage, TenantPlan, UsageGauge
+from apps.entitlements.ratelimit import get_throttled_tenants
 from apps.entitlements.services import (
+	QUOTA_API_REQUESTS_PER_DAY,
 	QUOTA_MAX_STORAGE_BYTES,
 	QUOTA_MAX_UNITS,
 	USAGE_STORAGE_BYTES,
 	add_storage_bytes,
 	check_quota,
 	get_effective_quota_limit,
+	increment_and_enforce,
 	increment_usage,
+	is_feature_enabled,
 )
+from apps.portfolio.models import Portfolio
+from apps.properties.models import Property, Unit
 from apps.tenancy.models import Tenant
 
 try:
@@ -73,3 +101,225 @@ class EntitlementsServicesTests(TestCase):
 			self.assertTrue(
 				QuotaUsage.objects.filter(tenant=self.tenant, key=USAGE_STORAGE_BYTES).exists()
 			)
+
+	def test_increment_and_enforce_single_statement_hard_and_soft(self):
+		def bump():
+			return increment_and_enforce(self.tenant, key=QUOTA_MAX_UNITS, period="day", action="quota.max_units.exceeded")
+
+		get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS)  # warm the entitlement cache
+		with override_settings(ENTITLEMENTS_ENFORCEMENT="hard"):
+			with CaptureQueriesContext(connection) as queries:
+				self.assertEqual(bump(), 1)
+			self.assertEqual(len([q for q in queries if not q["sql"].startswith("SET search_path")]), 1)
+			self.assertEqual(bump(), 2)
+			with self.assertRaises(ValidationError):
+				bump()
+		# Soft mode records the overage but still counts it.
+		self.assertEqual(bump(), 3)
+		with schema_context("public"):
+			self.assertEqual(QuotaUsage.objects.get(tenant=self.tenant, key=QUOTA_MAX_UNITS).value, 3)
+
+
+class EntitlementCacheTests(TestCase):
+	def setUp(self):
+		if schema_context is None:
+			self.skipTest("django-tenants not available")
+
+		with schema_context("public"):
+			self.tenant = Tenant.objects.create(name="Cache", slug="cache", schema_name="cache")
+			self.plan = Plan.objects.create(code="cached", name="Cached", quotas={QUOTA_MAX_UNITS: 5}, feature_flags={"crm": True})
+			self.tenant_plan = TenantPlan.objects.create(tenant=self.tenant, plan=self.plan)
+
+	def test_repeated_checks_hit_the_cache(self):
+		self.assertEqual(get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS), 5)
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS), 5)
+			self.assertTrue(is_feature_enabled(self.tenant, "crm"))
+			self.assertFalse(is_feature_enabled(self.tenant, "api"))
+		self.assertEqual(len(queries), 0)
+
+	def test_plan_and_override_saves_invalidate(self):
+		self.assertEqual(get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS), 5)
+		with schema_context("public"):
+			self.plan.quotas = {QUOTA_MAX_UNITS: 7}
+			self.plan.save(update_fields=["quotas"])
+		self.assertEqual(get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS), 7)
+
+		with schema_context("public"):
+			self.tenant_plan.quota_overrides = {QUOTA_MAX_UNITS: 9}
+			self.tenant_plan.feature_overrides = {"crm": False}
+			self.tenant_plan.save(update_fields=["quota_overrides", "feature_overrides"])
+		self.assertEqual(get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS), 9)
+		self.assertFalse(is_feature_enabled(self.tenant, "crm"))
+
+	def test_per_process_default_cache_skips_shared_tier(self):
+		# Tests run on LocMem: a snapshot stored there would only be seen by this process.
+		cache.clear()
+		invalidate_tenant(self.tenant.id)
+		self.assertEqual(get_entitlements(self.tenant).plan_code, "cached")
+		self.assertEqual([k for k in cache._cache if _SHARED_PREFIX in k], [])
+
+	@override_settings(ENTITLEMENT_CACHE_ENABLED=False)
+	def test_request_memo_without_process_cache(self):
+		token = start_request_memo()
+		try:
+			with CaptureQueriesContext(connection) as queries:
+				for _ in range(3):
+					get_effective_quota_limit(self.tenant, QUOTA_MAX_UNITS)
+					is_feature_enabled(self.tenant, "crm")
+		finally:
+			end_request_memo(token)
+		self.assertEqual(len([q for q in queries if "entitlements_tenantplan" in q["sql"]]), 1)
+
+
+class UsageCounterTests(TestCase):
+	def setUp(self):
+		if schema_context is None:
+			self.skipTest("django-tenants not available")
+
+		cache.clear()
+		# LocMem is shared within the test process; emulate Redis.
+		shared = mock.patch("apps.entitlements.counters.default_cache_is_shared", return_value=True)
+		shared.start()
+		self.addCleanup(shared.stop)
+		with schema_context("public"):
+			self.tenant = Tenant.objects.create(name="Api", slug="api", schema_name="api")
+			self.plan = Plan.objects.create(code="api", name="Api", quotas={QUOTA_API_REQUESTS_PER_DAY: 3})
+			TenantPlan.objects.create(tenant=self.tenant, plan=self.plan)
+
+	def _count(self):
+		return count_and_enforce(self.tenant, key=QUOTA_API_REQUESTS_PER_DAY, period="day", action="quota.api_requests_per_day.exceeded")
+
+	def _stored(self):
+		with schema_context("public"):
+			return list(QuotaUsage.objects.filter(tenant=self.tenant, key=QUOTA_API_REQUESTS_PER_DAY).values_list("value", flat=True))
+
+	@override_settings(ENTITLEMENTS_ENFORCEMENT="hard")
+	def test_counts_in_cache_without_row_locks_and_blocks_over_limit(self):
+		self._count()
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual([self._count(), self._count()], [2, 3])
+		self.assertEqual([q["sql"] for q in queries if "quotausage" in q["sql"].lower()], [])
+		with self.assertRaises(ValidationError):
+			self._count()
+		self.assertEqual(self._stored(), [])
+
+		with CaptureQueriesContext(connection) as queries:
+			reconcile_usage_counters()
+		self.assertEqual([q["sql"] for q in queries if "audit" in q["sql"].lower()], [])
+		self.assertEqual(self._stored(), [3])
+
+	@override_settings(ENTITLEMENTS_ENFORCEMENT="hard")
+	def test_fallback_increments_rejoin_the_cache_count(self):
+		self.assertEqual(self._count(), 1)
+		with mock.patch("apps.entitlements.counters.cache.incr", side_effect=ConnectionError("down")):
+			self._count()
+		self.assertEqual(self._stored(), [1])
+
+		# Cache back: the stored fallback increment counts towards the limit (1 + 1 + 1).
+		self.assertEqual(self._count(), 3)
+		with self.assertRaises(ValidationError):
+			self._count()
+
+		self.assertEqual(reconcile_usage_counters(), 1)
+		self.assertEqual(self._stored(), [3])
+		self.assertEqual(reconcile_usage_counters(), 0)
+		self.assertEqual(self._stored(), [3])
+		with self.assertRaises(ValidationError):
+			self._count()
+
+	def test_per_process_cache_counts_in_database(self):
+		with mock.patch("apps.entitlements.counters.default_cache_is_shared", return_value=False):
+			self.assertEqual([self._count(), self._count()], [1, 2])
+		self.assertEqual(self._stored(), [2])
+		self.assertEqual(reconcile_usage_counters(), 0)
+		self.assertEqual(self._stored(), [2])
+
+
+@override_settings(API_RATE_LIMIT_BACKEND="local")
+class ApiRateLimitTests(TestCase):
+	def setUp(self):
+		if schema_context is None:
+			self.skipTest("django-tenants not available")
+
+		with schema_context("public"):
+			self.tenant = Tenant.objects.create(name="Burst", slug="burst", schema_name="burst")
+			plan = Plan.objects.create(
+				code="burst",
+				name="Burst",
+				quotas={"api_rate_per_second": 0.001, "api_burst": 3, "api_key_rate_per_second": 0.001, "api_key_burst": 2},
+			)
+			TenantPlan.objects.create(tenant=self.tenant, plan=plan)
+		self.mw = ApiQuotaMiddleware(lambda request: HttpResponse("ok"))
+
+	def _get(self, **headers):
+		request = RequestFactory().get("/api/units/", headers=headers)
+		request.tenant = self.tenant
+		return self.mw(request)
+
+	def test_tenant_bucket_throttles_bursts_with_headers(self):
+		responses = [self._get() for _ in range(4)]
+
+		self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+		self.assertEqual(responses[0]["RateLimit-Limit"], "3")
+		self.assertEqual([r["RateLimit-Remaining"] for r in responses], ["2", "1", "0", "0"])
+		self.assertGreater(int(responses[3]["Retry-After"]), 0)
+		self.assertFalse(responses[2].has_header("Retry-After"))
+
+		(row,) = get_throttled_tenants([str(self.tenant.id)])
+		self.assertEqual((row["schema"], row["scope"], row["count"]), ("burst", "tenant", 1))
+
+	def test_api_key_bucket_is_separate_per_key(self):
+		statuses = [self._get(x_api_key="key-a").status_code for _ in range(3)]
+		self.assertEqual(statuses, [200, 200, 429])
+		self.assertEqual(self._get(x_api_key="key-b").status_code, 200)
+
+
+class UsageGaugeTests(TestCase):
+	def setUp(self):
+		if schema_context is None:
+			self.skipTest("django-tenants not available")
+
+		with schema_context("public"):
+			self.tenant = Tenant.objects.create(name="Gauge", slug="gauge", schema_name="gauge")
+
+	def _property(self, name: str) -> Property:
+		portfolio = Portfolio.objects.create(name=f"{name} portfolio")
+		return Property.objects.create(portfolio=portfolio, name=name, property_type="house")
+
+	def test_inserts_and_deletes_maintain_gauges(self):
+		with schema_context(self.tenant.schema_name):
+			prop = self._property("A")
+			Unit.objects.create(property=prop, unit_number="1")
+			Unit.objects.create(property=prop, unit_number="2")
+			Unit.objects.filter(unit_number="1").delete()
+
+		self.assertEqual(get_usage_gauges(self.tenant), {GAUGE_PROPERTIES: 1, GAUGE_UNITS: 1})
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(get_usage_gauge(self.tenant, GAUGE_UNITS), 1)
+		self.assertEqual(len([q for q in queries if not q["sql"].startswith("SET search_path")]), 1)
+
+		# Cascades count too.
+		with schema_context(self.tenant.schema_name):
+			prop.delete()
+		self.assertEqual(get_usage_gauges(self.tenant), {GAUGE_PROPERTIES: 0, GAUGE_UNITS: 0})
+
+	def test_reconcile_corrects_drift_from_bulk_create(self):
+		with schema_context(self.tenant.schema_name):
+			prop = self._property("B")
+			Unit.objects.create(property=prop, unit_number="0")
+			Unit.objects.bulk_create([Unit(property=prop, unit_number=str(i)) for i in range(1, 4)])
+		self.assertEqual(get_usage_gauge(self.tenant, GAUGE_UNITS), 1)
+
+		with CaptureQueriesContext(connection) as queries:
+			drift = reconcile_usage_gauges(schemas=[self.tenant.schema_name])
+
+		self.assertEqual(drift, [{"schema": "gauge", "key": GAUGE_UNITS, "was": 1, "now": 4}])
+		# The units gauge row is locked before the units are counted.
+		sql = [q["sql"] for q in queries]
+		lock = next(i for i, q in enumerate(sql) if "FOR UPDATE" in q and f"'{GAUGE_UNITS}'" in q)
+		count = next(i for i, q in enumerate(sql) if q.startswith("SELECT COUNT(*)") and "properties_unit" in q)
+		self.assertLess(lock, count)
+		self.assertEqual(get_usage_gauge(self.tenant, GAUGE_UNITS), 4)
+		with schema_context("public"):
+			self.assertIsNotNone(UsageGauge.objects.get(tenant=self.tenant, key=GAUGE_UNITS).reconciled_at)
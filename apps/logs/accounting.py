@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.db import connection
+
+from apps.core.periodic import PeriodicFlusher
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+@dataclass
+class UsageCounters:
+	requests: int = 0
+	wall_ms: float = 0.0
+	db_ms: float = 0.0
+	queries: int = 0
+	bytes_out: int = 0
+
+
+def hour_start(ts: datetime) -> datetime:
+	return ts.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+
+
+class TenantUsageAccumulator:
+	"""
+	In-process per-(tenant, hour) resource counters, added to platform.TenantUsageHour
+	every TENANT_USAGE_FLUSH_INTERVAL_S seconds by a background thread.
+	"""
+
+	def __init__(self, *, flush_interval: float | None = None):
+		interval = flush_interval or float(getattr(settings, "TENANT_USAGE_FLUSH_INTERVAL_S", 30))
+		self._counters: dict[tuple[str, datetime], UsageCounters] = {}
+		self._lock = threading.Lock()
+		self.flusher = PeriodicFlusher("tenant-usage-flusher", interval, self.flush_now)
+
+	def record(
+		self,
+		tenant_schema: str,
+		*,
+		wall_ms: float,
+		db_ms: float = 0.0,
+		queries: int = 0,
+		bytes_out: int = 0,
+		now: datetime | None = None,
+	) -> None:
+		self.flusher.start()
+		key = ((tenant_schema or "public")[:63], hour_start(now or datetime.now(tz=UTC)))
+		with self._lock:
+			c = self._counters.get(key)
+			if c is None:
+				c = self._counters[key] = UsageCounters()
+			c.requests += 1
+			c.wall_ms += wall_ms
+			c.db_ms += db_ms
+			c.queries += queries
+			c.bytes_out += bytes_out
+
+	def drain(self) -> dict[tuple[str, datetime], UsageCounters]:
+		with self._lock:
+			counters, self._counters = self._counters, {}
+		return counters
+
+	def flush(self) -> None:
+		self.flusher.flush()
+
+	def flush_now(self) -> int:
+		counters = self.drain()
+		if not counters:
+			return 0
+		rows = [
+			(schema, hour, c.requests, c.wall_ms, c.db_ms, c.queries, c.bytes_out)
+			for (schema, hour), c in counters.items()
+		]
+		if schema_context is not None:
+			with schema_context("public"):
+				upsert_usage_rows(rows)
+		else:
+			upsert_usage_rows(rows)
+		return len(rows)
+
+
+def upsert_usage_rows(rows: list[tuple]) -> None:
+	"""
+	Add counters to TenantUsageHour with one multi-row INSERT ... ON CONFLICT.
+	"""
+	if not rows:
+		return
+	from apps.platform.models import TenantUsageHour
+
+	table = connection.ops.quote_name(TenantUsageHour._meta.db_table)
+	values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, NOW())"] * len(rows))
+	params = [v for row in rows for v in row]
+	with connection.cursor() as cur:
+		cur.execute(
+			f"""
+			INSERT INTO {table} AS t
+				(tenant_schema, hour, requests, wall_ms, db_ms, queries, bytes_out, updated_at)
+			VALUES {values}
+			ON CONFLICT (tenant_schema, hour) DO UPDATE SET
+				requests = t.requests + EXCLUDED.requests,
+				wall_ms = t.wall_ms + EXCLUDED.wall_ms,
+				db_ms = t.db_ms + EXCLUDED.db_ms,
+				queries = t.queries + EXCLUDED.queries,
+				bytes_out = t.bytes_out + EXCLUDED.bytes_out,
+				updated_at = EXCLUDED.updated_at
+			""",
+			params,
+		)
+
+
+_accumulator: TenantUsageAccumulator | None = None
+_accumulator_lock = threading.Lock()
+
+
+def get_usage_accumulator() -> TenantUsageAccumulator:
+	global _accumulator
+	if _accumulator is None:
+		with _accumulator_lock:
+			if _accumulator is None:
+				_accumulator = TenantUsageAccumulator()
+	return _accumulator
+
+
+def response_bytes(response) -> int:
+	if getattr(response, "streaming", False):
+		try:
+			return int(response.get("Content-Length") or 0)
+		except (TypeError, ValueError):
+			return 0
+	return len(getattr(response, "content", b"") or b"")
+
+
+def record_tenant_usage(request, response, wall_ms: float) -> None:
+	if not getattr(settings, "TENANT_USAGE_ENABLED", True):
+		return
+	from apps.audits.middleware import get_audit_context
+
+	ctx = get_audit_context()
+	schema = (ctx.tenant_schema if ctx else "") or getattr(getattr(request, "tenant", None), "schema_name", "")
+	logger = getattr(request, "_db_query_logger", None)
+	get_usage_accumulator().record(
+		schema,
+		wall_ms=wall_ms,
+		db_ms=getattr(logger, "db_ms", 0.0),
+		queries=getattr(logger, "query_count", 0),
+		bytes_out=response_bytes(response),
+	)
@@ -5,3 +5,10 @@ class LogsConfig(AppConfig):
 	default_auto_field = "django.db.models.BigAutoField"
 	name = "apps.logs"
 	verbose_name = "Runtime Logs"
+
+	def ready(self):
+		from apps.logs import metrics_history, prometheus, sqlcomment
+
+		prometheus.connect_celery_signals()
+		metrics_history.connect_celery_signals()
+		sqlcomment.connect_signals()
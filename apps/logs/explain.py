@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+log = logging.getLogger(__name__)
+
+_EXPLAINABLE_RE = re.compile(r"^\s*(?:/\*.*?\*/\s*)*(SELECT|WITH)\b", re.I | re.S)
+_FILTER_COLUMN_RE = re.compile(r"(?<![:'.\w])\(?([a-z_][a-z0-9_]*)\)?(?:::[a-z ]+)?\s*(?:=|<>|<=|>=|<|>|~~\*?|IS\b|= ANY\b)", re.I)
+_MAX_PENDING = 20
+
+
+def _mode() -> str:
+	value = (getattr(settings, "SLOW_QUERY_EXPLAIN", "off") or "off").strip().lower()
+	return value if value in {"off", "thread", "celery"} else "off"
+
+
+def is_explainable(sql: str) -> bool:
+	"""
+	Plain reads only: EXPLAIN never runs the statement, but we still skip writes/DDL.
+	"""
+	return bool(_EXPLAINABLE_RE.match(sql or ""))
+
+
+def bind_params(sql: str, params, raw_connection) -> str:
+	"""
+	Inline `params` client-side so the statement can be explained later on another
+	connection (thread or Celery worker).
+	"""
+	if not params:
+		return sql
+	try:
+		from psycopg import ClientCursor
+	except ImportError:  # pragma: no cover - psycopg2
+		with raw_connection.cursor() as cur:
+			return cur.mogrify(sql, params).decode()
+	return ClientCursor(raw_connection).mogrify(sql, params)
+
+
+def _large_table_rows() -> int:
+	return int(getattr(settings, "QUERY_PLAN_LARGE_TABLE_ROWS", 10_000))
+
+
+def _walk(node: dict):
+	yield node
+	for child in node.get("Plans") or []:
+		yield from _walk(child)
+
+
+def filter_columns(filter_expr: str) -> list[str]:
+	"""
+	Column names compared in a plan node's Filter ("(status = 'x'::text)" -> ["status"]).
+	"""
+	seen: list[str] = []
+	for column in _FILTER_COLUMN_RE.findall(filter_expr or ""):
+		if column.lower() not in {"and", "or", "not"} and column not in seen:
+			seen.append(column)
+	return seen
+
+
+def analyse_plan(plan: dict, table_rows: dict[str, float]) -> list[dict]:
+	"""
+	Sequential scans in an EXPLAIN (FORMAT JSON) plan.
+
+	Each: { relation, table_rows, plan_rows, filter, large, index_candidate, columns }.
+	A scan is an index candidate when the table has at least QUERY_PLAN_LARGE_TABLE_ROWS
+	rows and the filter keeps under 10% of them.
+	"""
+	threshold = _large_table_rows()
+	scans: list[dict] = []
+	for node in _walk(plan.get("Plan") or {}):
+		if node.get("Node Type") != "Seq Scan":
+			continue
+		relation = node.get("Relation Name") or ""
+		rows = float(table_rows.get(relation) or 0)
+		plan_rows = float(node.get("Plan Rows") or 0)
+		filter_expr = node.get("Filter") or ""
+		large = rows >= threshold
+		scans.append(
+			{
+				"relation": relation,
+				"table_rows": int(rows),
+				"plan_rows": int(plan_rows),
+				"filter": filter_expr[:500],
+				"large": large,
+				"index_candidate": bool(large and filter_expr and plan_rows < rows * 0.1),
+				"columns": filter_columns(filter_expr),
+			}
+		)
+	return scans
+
+
+def _table_rows(cursor, relations: set[str]) -> dict[str, float]:
+	# Resolved through the current search_path, like the query itself.
+	out: dict[str, float] = {}
+	for relation in relations:
+		cursor.execute("SELECT c.reltuples FROM pg_class c WHERE c.oid = to_regclass(%s)", [relation])
+		row = cursor.fetchone()
+		out[relation] = float(row[0]) if row and row[0] is not None else 0.0
+	return out
+
+
+def explain_and_store(
+	*, sql: str, schema: str, fingerprint: str, normalized: str, duration_ms: int, request_id: str = ""
+):
+	"""
+	Run EXPLAIN (FORMAT JSON) for `sql` with the tenant's search_path and upsert the
+	platform.QueryPlan row for (fingerprint, schema).
+	"""
+	timeout_ms = int(getattr(settings, "SLOW_QUERY_EXPLAIN_TIMEOUT_MS", 2000))
+
+	def _explain() -> tuple[dict, list[dict]]:
+		with transaction.atomic(), connection.cursor() as cur:
+			cur.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+			cur.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+			raw = cur.fetchone()[0]
+			plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+			relations = {n.get("Relation Name") for n in _walk(plan.get("Plan") or {}) if n.get("Node Type") == "Seq Scan"}
+			return plan, analyse_plan(plan, _table_rows(cur, {r for r in relations if r}))
+
+	if schema_context is not None:
+		with schema_context(schema or "public"):
+			plan, scans = _explain()
+	else:
+		plan, scans = _explain()
+
+	defaults = {
+		"sql": normalized[:2000],
+		"plan": plan,
+		"total_cost": float((plan.get("Plan") or {}).get("Total Cost") or 0),
+		"seq_scans": scans,
+		"has_large_seq_scan": any(s["large"] for s in scans),
+		"has_index_candidate": any(s["index_candidate"] for s in scans),
+		"duration_ms": duration_ms,
+		"request_id": request_id[:64],
+	}
+	if schema_context is None:
+		return _upsert_plan(fingerprint, schema, defaults)
+	with schema_context("public"):
+		return _upsert_plan(fingerprint, schema, defaults)
+
+
+def _upsert_plan(fingerprint: str, schema: str, defaults: dict):
+	from django.db.models import F
+
+	from apps.platform.models import QueryPlan
+
+	plan, created = QueryPlan.objects.update_or_create(fingerprint=fingerprint, tenant_schema=schema, defaults=defaults)
+	if not created:
+		QueryPlan.objects.filter(pk=plan.pk).update(samples=F("samples") + 1)
+	return plan
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_pid: int | None = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+def _submit(fn, **kwargs) -> bool:
+	global _executor, _executor_pid, _pending
+	pid = os.getpid()
+	with _executor_lock:
+		if _executor is None or _executor_pid != pid:
+			_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+			_executor_pid = pid
+			_pending = 0
+		if _pending >= _MAX_PENDING:
+			return False
+		_pending += 1
+		executor = _executor
+
+	def run():
+		global _pending
+		try:
+			fn(**kwargs)
+		except Exception:
+			log.exception("EXPLAIN of slow query %s failed", kwargs.get("fingerprint"))
+		finally:
+			connection.close()
+			with _executor_lock:
+				_pending -= 1
+
+	executor.submit(run)
+	return True
+
+
+def maybe_explain(sql: str, params, *, many: bool, raw_connection, fingerprint: str, normalized: str, duration_ms: int) -> bool:
+	"""
+	Queue an EXPLAIN for a slow query (SLOW_QUERY_EXPLAIN = "thread" | "celery").
+
+	- reads only, SLOW_QUERY_EXPLAIN_SAMPLE_RATE of them
+	- one plan per fingerprint + schema every SLOW_QUERY_EXPLAIN_TTL_S (cache)
+	- never raises; returns True when queued
+	"""
+	mode = _mode()
+	if mode == "off" or many or not is_explainable(sql):
+		return False
+	try:
+		if random.random() >= float(getattr(settings, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1)):
+			return False
+		schema = getattr(connection, "schema_name", "") or "public"
+		ttl = int(getattr(settings, "SLOW_QUERY_EXPLAIN_TTL_S", 3600))
+		if not cache.add(f"logs:explain:{schema}:{fingerprint}", 1, timeout=ttl):
+			return False
+
+		from apps.audits.middleware import get_audit_context
+
+		ctx = get_audit_context()
+		kwargs = {
+			"sql": bind_params(sql, params, raw_connection),
+			"schema": schema,
+			"fingerprint": fingerprint,
+			"normalized": normalized,
+			"duration_ms": duration_ms,
+			"request_id": (ctx.request_id if ctx else "") or "",
+		}
+		if mode == "celery":
+			from apps.logs.tasks import explain_slow_query_task
+
+			explain_slow_query_task.delay(**kwargs)
+			return True
+		return _submit(explain_and_store, **kwargs)
+	except Exception:
+		log.debug("Could not queue EXPLAIN", exc_info=True)
+		return False
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+import atexit
 import logging
+import os
+import queue
 import sys
 import threading
+import time
+import weakref
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import UTC, datetime
 from typing import Any
 
 from django.apps import apps as django_apps
 from django.conf import settings
+from django.db import connection
 from django.utils import timezone
 
+from apps.logs.prometheus import record_log_drops, record_log_writes
+from apps.logs.sampling import LogRateLimiter, LogSamplingConfig, SuppressedSummary
+
 try:
 	# Reuse audit context if present (request id, tenant schema, actor, etc.)
 	from apps.audits.middleware import get_audit_context
@@ -21,19 +33,308 @@ except Exception:  # pragma: no cover
 	def to_jsonable(value: Any) -> Any:  # type: ignore
 		return value
 
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
 
 _tls = threading.local()
 
+_STANDARD_RECORD_ATTRS = {
+	"name","msg","args","levelname","levelno","pathname","filename","module","exc_info","exc_text",
+	"stack_info","lineno","funcName","created","msecs","relativeCreated","thread","threadName",
+	"processName","process","message","taskName",
+}
+
+
+def _debug_breadcrumb(msg: str) -> None:
+	# Keep some breadcrumbs in DEBUG so we can diagnose handler issues.
+	if getattr(settings, "DEBUG", False):
+		try:
+			print(msg, file=sys.stderr)
+		except Exception:
+			pass
+
+
+def _current_schema(ctx) -> str:
+	"""
+	Schema the record belongs to: the tenant captured in the audit context,
+	falling back to the schema the connection is currently pointed at.
+	"""
+	schema = (ctx.tenant_schema if ctx else "") or ""
+	if not schema:
+		schema = getattr(connection, "schema_name", "") or ""
+	return schema or "public"
+
+
+class LogBatchWriter:
+	"""
+	Bounded in-process queue of unsaved LogEntry rows, drained by a daemon thread.
+
+	- records are grouped by schema and written with one bulk_create per schema
+	- a flush happens every `flush_interval` seconds, or sooner once `batch_size` rows are queued
+	- when the queue is full new records are dropped and counted (never block the caller)
+	- remaining rows are flushed on interpreter shutdown
+	- `on_tick` (optional) runs on the writer thread before every periodic drain
+	"""
+
+	def __init__(
+		self,
+		*,
+		batch_size: int = 200,
+		flush_interval: float = 2.0,
+		max_queue: int = 10_000,
+		on_tick: Callable[[], None] | None = None,
+	):
+		self.batch_size = max(int(batch_size), 1)
+		self.flush_interval = max(float(flush_interval), 0.05)
+		self.max_queue = max(int(max_queue), 1)
+		self.on_tick = on_tick
+
+		self.dropped = 0
+		self.written = 0
+		self._dropped_reported = 0
+
+		self._queue: queue.Queue[tuple[str, Any]] = queue.Queue(maxsize=self.max_queue)
+		self._lock = threading.Lock()
+		self._drain_lock = threading.Lock()
+		self._wake = threading.Event()
+		self._stop = threading.Event()
+		self._thread: threading.Thread | None = None
+		self._pid: int | None = None
+		self._atexit_registered = False
+		if hasattr(os, "register_at_fork"):
+			ref = weakref.WeakMethod(self._reset_after_fork)
+			os.register_at_fork(after_in_child=lambda: (method := ref()) is not None and method())
+
+	def submit(self, schema: str, entry) -> bool:
+		self._ensure_started()
+		try:
+			self._queue.put_nowait((schema, entry))
+		except queue.Full:
+			with self._lock:
+				self.dropped += 1
+			record_log_drops("queue_full")
+			return False
+		if self._queue.qsize() >= self.batch_size:
+			self._wake.set()
+		return True
+
+	def stats(self) -> dict[str, int]:
+		return {"queued": self._queue.qsize(), "dropped": self.dropped, "written": self.written}
+
+	def flush(self) -> int:
+		"""
+		Drain everything currently queued on the calling thread.
+		"""
+		return self._drain()
+
+	def close(self, timeout: float = 5.0) -> None:
+		self._stop.set()
+		self._wake.set()
+		thread = self._thread
+		if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+			thread.join(timeout)
+		self._drain()
+
+	def _reset_after_fork(self) -> None:
+		# Forked (e.g. gunicorn preload): never reuse the parent's queue, locks or events;
+		# the parent may have held any of them at fork time.
+		self._queue = queue.Queue(maxsize=self.max_queue)
+		self._lock = threading.Lock()
+		self._drain_lock = threading.Lock()
+		self._wake = threading.Event()
+		self._stop = threading.Event()
+		self._thread = None
+		self._pid = os.getpid()
+		self.dropped = self.written = self._dropped_reported = 0
+
+	def _ensure_started(self) -> None:
+		pid = os.getpid()
+		thread = self._thread
+		if thread is not None and self._pid == pid and thread.is_alive():
+			return
+		if self._pid is not None and self._pid != pid:
+			# No os.register_at_fork(): reset before touching the (possibly held) lock.
+			self._reset_after_fork()
+		with self._lock:
+			thread = self._thread
+			if thread is not None and self._pid == pid and thread.is_alive():
+				return
+			self._pid = pid
+			self._stop.clear()
+			self._thread = threading.Thread(target=self._run, name="log-batch-writer", daemon=True)
+			self._thread.start()
+			if not self._atexit_registered:
+				atexit.register(self.close)
+				self._atexit_registered = True
+
+	def _run(self) -> None:
+		while not self._stop.is_set():
+			self._wake.wait(self.flush_interval)
+			self._wake.clear()
+			if self.on_tick is not None:
+				try:
+					self.on_tick()
+				except Exception:
+					pass
+			self._drain()
+
+	def _take(self) -> list[tuple[str, Any]]:
+		items: list[tuple[str, Any]] = []
+		while len(items) < self.batch_size:
+			try:
+				items.append(self._queue.get_nowait())
+			except queue.Empty:
+				break
+		return items
+
+	def _drain(self) -> int:
+		if not self._drain_lock.acquire(blocking=False):
+			return 0
+		# Anything logged while writing (e.g. a DB error) must not be re-queued.
+		_tls.in_emit = True
+		written = 0
+		used_db = False
+		try:
+			while True:
+				items = self._take()
+				if not items:
+					break
+				used_db = True
+				by_schema: dict[str, list] = defaultdict(list)
+				for schema, entry in items:
+					by_schema[schema].append(entry)
+				for schema, entries in by_schema.items():
+					written += self._write(schema, entries)
+
+			pending_drops = self.dropped - self._dropped_reported
+			if pending_drops > 0:
+				self._dropped_reported += pending_drops
+				used_db = True
+				self._write("public", [_dropped_records_entry(pending_drops, self.max_queue)])
+		finally:
+			_tls.in_emit = False
+			self._drain_lock.release()
+			if used_db and threading.current_thread() is self._thread:
+				# Background thread owns its own connection (also after a failed write, which
+				# may have left it broken); don't keep it idle between flushes.
+				try:
+					connection.close()
+				except Exception:
+					pass
+		self.written += written
+		return written
+
+	def _write(self, schema: str, entries: list) -> int:
+		from apps.logs.models import LogEntry
+
+		try:
+			if schema_context is not None:
+				with schema_context(schema or "public"):
+					LogEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+			else:
+				LogEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+			record_log_writes(e.level for e in entries)
+			return len(entries)
+		except Exception as e:
+			with self._lock:
+				self.dropped += len(entries)
+				self._dropped_reported += len(entries)
+			record_log_drops("write_error", len(entries))
+			_debug_breadcrumb(f"[LogBatchWriter] failed writing {len(entries)} rows to {schema}: {type(e).__name__}: {e}")
+			return 0
+
+
+def _suppressed_summary_entry(summary: SuppressedSummary):
+	from apps.logs.models import LogEntry
+
+	def _ts(value: float) -> str:
+		return datetime.fromtimestamp(value, tz=UTC).isoformat() if value else ""
+
+	return LogEntry(
+		created_at=timezone.now(),
+		level=summary.level,
+		logger=summary.logger,
+		message=f"Suppressed {summary.suppressed} similar records: {summary.template}"[:5000],
+		pathname=summary.pathname[:500],
+		lineno=summary.lineno,
+		process=os.getpid(),
+		tenant_schema=summary.schema,
+		extra={
+			"suppressed": summary.suppressed,
+			"fingerprint": summary.fingerprint,
+			"window_s": summary.window_s,
+			"first_suppressed_at": _ts(summary.first_suppressed),
+			"last_suppressed_at": _ts(summary.last_suppressed),
+		},
+	)
+
+
+def _dropped_records_entry(count: int, max_queue: int):
+	from apps.logs.models import LogEntry, LogLevel
+
+	return LogEntry(
+		created_at=timezone.now(),
+		level=LogLevel.WARNING,
+		logger="logs.handler",
+		message=f"Dropped {count} log records (queue full, max_queue={max_queue})",
+		module=__name__,
+		process=os.getpid(),
+		extra={"dropped": count, "max_queue": max_queue},
+	)
+
 
 class DatabaseLogHandler(logging.Handler):
 	"""
 	Persists Python logging records to the database (per schema).
 
+	Modes:
+	- "sync" (default): one INSERT on the calling thread per record
+	- "async": records are queued in-process and bulk-inserted per schema by
+	  a background thread (see LogBatchWriter); the schema is captured at emit time
+
+	With rate_limit=True (default) records pass through a LogRateLimiter first
+	(settings.LOG_SAMPLING): per-logger sampling plus a per-fingerprint burst limit,
+	with one "Suppressed N similar records" row written per closed window.
+
 	Important:
 	- Never raise from emit() (logging must not crash the app)
 	- Prevent recursion if DB write triggers logging
 	"""
 
+	def __init__(
+		self,
+		level: int = logging.NOTSET,
+		*,
+		mode: str = "sync",
+		batch_size: int = 200,
+		flush_interval: float = 2.0,
+		max_queue: int = 10_000,
+		rate_limit: bool = True,
+	):
+		super().__init__(level)
+		self.mode = (mode or "sync").strip().lower()
+		self.rate_limit = bool(rate_limit)
+		self._limiter: LogRateLimiter | None = None
+		self._last_sweep = 0.0
+		self.writer: LogBatchWriter | None = None
+		if self.mode == "async":
+			self.writer = LogBatchWriter(
+				batch_size=batch_size,
+				flush_interval=flush_interval,
+				max_queue=max_queue,
+				on_tick=self._write_summaries,
+			)
+
+	@property
+	def limiter(self) -> LogRateLimiter | None:
+		# Built lazily: LOGGING is configured before settings-dependent code should run.
+		if self.rate_limit and self._limiter is None:
+			self._limiter = LogRateLimiter(LogSamplingConfig.from_settings())
+		return self._limiter
+
 	def emit(self, record: logging.LogRecord) -> None:
 		if getattr(_tls, "in_emit", False):
 			return
@@ -42,61 +343,104 @@ class DatabaseLogHandler(logging.Handler):
 			if not django_apps.ready:
 				return
 
-			from apps.logs.models import LogEntry
-
 			ctx = get_audit_context() if get_audit_context else None
+			schema = _current_schema(ctx)
 
-			exc_text = ""
-			if record.exc_info:
-				try:
-					exc_text = self.formatException(record.exc_info)
-				except Exception:
-					exc_text = ""
-
-			# Capture structured "extra" data safely.
-			standard = {
-				"name","msg","args","levelname","levelno","pathname","filename","module","exc_info","exc_text",
-				"stack_info","lineno","funcName","created","msecs","relativeCreated","thread","threadName",
-				"processName","process","message",
-			}
-			record_extras = {k: v for k, v in record.__dict__.items() if k not in standard}
-			extra = {
-				"args": to_jsonable(getattr(record, "args", None)),
-				"stack_info": to_jsonable(getattr(record, "stack_info", None)),
-				**to_jsonable(record_extras),
-			}
-
-			LogEntry.objects.create(
-				created_at=timezone.now(),
-				level=record.levelname,
-				logger=record.name,
-				message=str(record.getMessage()),
-				pathname=getattr(record, "pathname", "") or "",
-				lineno=getattr(record, "lineno", None),
-				func_name=getattr(record, "funcName", "") or "",
-				module=getattr(record, "module", "") or "",
-				process=getattr(record, "process", None),
-				thread=getattr(record, "thread", None),
-				exc_text=exc_text[:10000],
-				request_id=(ctx.request_id if ctx else ""),
-				tenant_schema=(ctx.tenant_schema if ctx else ""),
-				request_method=(ctx.request_method if ctx else ""),
-				request_path=(ctx.request_path if ctx else ""),
-				actor_user_id=(ctx.actor_user_id if ctx else ""),
-				actor_email=(ctx.actor_email if ctx else ""),
-				ip_address=(ctx.ip_address if ctx else None),
-				user_agent=(ctx.user_agent if ctx else ""),
-				extra=to_jsonable(extra),
-			)
+			limiter = self.limiter
+			if limiter is not None:
+				if self.writer is None:
+					self._maybe_write_summaries()
+				if not limiter.allow(record, schema):
+					record_log_drops("rate_limited")
+					return
+
+			entry = self.build_entry(record, ctx)
+			if self.writer is not None:
+				self.writer.submit(schema, entry)
+			else:
+				entry.save(force_insert=True)
+				record_log_writes([entry.level])
 		except Exception as e:
-			# Keep some breadcrumbs in DEBUG so we can diagnose handler issues.
-			if getattr(settings, "DEBUG", False):
-				try:
-					print(f"[DatabaseLogHandler] failed: {type(e).__name__}: {e}", file=sys.stderr)
-				except Exception:
-					pass
+			_debug_breadcrumb(f"[DatabaseLogHandler] failed: {type(e).__name__}: {e}")
 			# Never let logging break request handling.
 			return
 		finally:
 			_tls.in_emit = False
 
+	def build_entry(self, record: logging.LogRecord, ctx=None):
+		"""
+		Build an unsaved LogEntry for `record`.
+		"""
+		from apps.logs.models import LogEntry
+
+		exc_text = ""
+		if record.exc_info:
+			try:
+				exc_text = self.formatException(record.exc_info)
+			except Exception:
+				exc_text = ""
+
+		# Capture structured "extra" data safely.
+		record_extras = {k: v for k, v in record.__dict__.items() if k not in _STANDARD_RECORD_ATTRS}
+		extra = {
+			"args": to_jsonable(getattr(record, "args", None)),
+			"stack_info": to_jsonable(getattr(record, "stack_info", None)),
+			**to_jsonable(record_extras),
+		}
+
+		return LogEntry(
+			created_at=timezone.now(),
+			level=record.levelname,
+			logger=record.name,
+			message=str(record.getMessage()),
+			pathname=getattr(record, "pathname", "") or "",
+			lineno=getattr(record, "lineno", None),
+			func_name=getattr(record, "funcName", "") or "",
+			module=getattr(record, "module", "") or "",
+			process=getattr(record, "process", None),
+			thread=getattr(record, "thread", None),
+			exc_text=exc_text[:10000],
+			request_id=(ctx.request_id if ctx else ""),
+			tenant_schema=(ctx.tenant_schema if ctx else ""),
+			request_method=(ctx.request_method if ctx else ""),
+			request_path=(ctx.request_path if ctx else ""),
+			actor_user_id=(ctx.actor_user_id if ctx else ""),
+			actor_email=(ctx.actor_email if ctx else ""),
+			ip_address=(ctx.ip_address if ctx else None),
+			user_agent=(ctx.user_agent if ctx else ""),
+			extra=to_jsonable(extra),
+		)
+
+	def _maybe_write_summaries(self) -> None:
+		# Sync mode has no background thread: sweep closed windows at most once a second.
+		now = time.monotonic()
+		if now - self._last_sweep < 1.0:
+			return
+		self._last_sweep = now
+		self._write_summaries()
+
+	def _write_summaries(self) -> None:
+		limiter = self._limiter
+		if limiter is None:
+			return
+		for summary in limiter.pop_summaries():
+			entry = _suppressed_summary_entry(summary)
+			if self.writer is not None:
+				self.writer.submit(summary.schema, entry)
+			elif schema_context is not None:
+				with schema_context(summary.schema or "public"):
+					entry.save(force_insert=True)
+				record_log_writes([entry.level])
+			else:
+				entry.save(force_insert=True)
+				record_log_writes([entry.level])
+
+	def flush(self) -> None:
+		if self.writer is not None:
+			self._write_summaries()
+			self.writer.flush()
+
+	def close(self) -> None:
+		if self.writer is not None:
+			self.writer.close()
+		super().close()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.audits.middleware import AuditContext
+from apps.audits.utils import to_jsonable
+from apps.logs.models import LogEntry
+
+LEVELS = {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}
+
+
+@dataclass(frozen=True)
+class ClientLogLimits:
+	max_events: int = 50
+	max_bytes: int = 64_000
+	window_s: int = 60
+	per_ip: int = 120
+	per_tenant: int = 1200
+
+	@classmethod
+	def from_settings(cls) -> ClientLogLimits:
+		raw = getattr(settings, "CLIENT_LOG_INGEST", None) or {}
+		return cls(
+			max_events=max(int(raw.get("max_events", 50)), 1),
+			max_bytes=max(int(raw.get("max_bytes", 64_000)), 1),
+			window_s=max(int(raw.get("window_s", 60)), 1),
+			per_ip=int(raw.get("per_ip", 120)),
+			per_tenant=int(raw.get("per_tenant", 1200)),
+		)
+
+
+def hit_rate_limit(scope: str, key: str, limit: int, window_s: int) -> bool:
+	"""
+	Fixed-window request counter in the Django cache. Returns True when `key` is over `limit`.
+	limit <= 0 disables the check. Cache failures fail open.
+	"""
+	if limit <= 0 or not key:
+		return False
+	bucket = int(time.time() // window_s)
+	cache_key = f"logs:ingest:{scope}:{key}:{bucket}"
+	try:
+		if cache.add(cache_key, 1, timeout=window_s + 5):
+			return False
+		return cache.incr(cache_key) > limit
+	except ValueError:
+		# Expired between add() and incr().
+		cache.set(cache_key, 1, timeout=window_s + 5)
+		return False
+	except Exception:
+		return False
+
+
+def normalize_events(data: Any) -> list[dict[str, Any]]:
+	"""
+	Accepts a single event object, a JSON array of events, or {"events": [...]}.
+	Non-object items are ignored.
+	"""
+	if isinstance(data, dict) and isinstance(data.get("events"), list):
+		data = data["events"]
+	if isinstance(data, dict):
+		data = [data]
+	if not isinstance(data, list):
+		return []
+	return [e for e in data if isinstance(e, dict)]
+
+
+def build_client_entries(events: list[dict[str, Any]], ctx: AuditContext | None) -> list[LogEntry]:
+	"""
+	Unsaved LogEntry rows for a batch of browser events.
+
+	Events with the same level + stack trace (or message when there is no stack)
+	collapse into one row; `extra["occurrences"]` records how many were merged.
+	"""
+	grouped: dict[tuple[str, str], tuple[dict[str, Any], int]] = {}
+	for event in events:
+		level = str(event.get("level") or "ERROR").upper()[:10]
+		if level not in LEVELS:
+			level = "ERROR"
+		message = str(event.get("message") or "")[:5000]
+		if not message:
+			continue
+		stack = str(event.get("stack") or "")[:10000]
+		key = (level, stack or message)
+		if key in grouped:
+			first, count = grouped[key]
+			grouped[key] = (first, count + 1)
+		else:
+			grouped[key] = ({**event, "level": level, "message": message, "stack": stack}, 1)
+
+	entries: list[LogEntry] = []
+	for event, count in grouped.values():
+		extra = to_jsonable({k: v for k, v in event.items() if k not in {"level", "message", "stack"}})
+		if count > 1:
+			extra["occurrences"] = count
+		entries.append(
+			LogEntry(
+				level=event["level"],
+				logger="frontend",
+				message=event["message"],
+				exc_text=event["stack"],
+				request_id=(ctx.request_id if ctx else ""),
+				tenant_schema=(ctx.tenant_schema if ctx else ""),
+				request_method=(ctx.request_method if ctx else ""),
+				request_path=(ctx.request_path if ctx else ""),
+				actor_user_id=(ctx.actor_user_id if ctx else ""),
+				actor_email=(ctx.actor_email if ctx else ""),
+				ip_address=(ctx.ip_address if ctx else None),
+				user_agent=(ctx.user_agent if ctx else ""),
+				extra=extra,
+			)
+		)
+	return entries
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.db import connection
+
+from apps.core.periodic import PeriodicFlusher
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+# Upper bounds (ms) of the fixed histogram buckets; one extra overflow bucket follows.
+LATENCY_BUCKETS_MS: tuple[int, ...] = (
+	5, 10, 25, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000,
+)
+BUCKET_COUNT = len(LATENCY_BUCKETS_MS) + 1
+
+# (route, method, status_class, tenant_schema)
+LatencyKey = tuple[str, str, str, str]
+
+
+@dataclass
+class Histogram:
+	buckets: list[int] = field(default_factory=lambda: [0] * BUCKET_COUNT)
+	count: int = 0
+	sum_ms: float = 0.0
+	max_ms: float = 0.0
+
+	def observe(self, duration_ms: float) -> None:
+		self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+		self.count += 1
+		self.sum_ms += duration_ms
+		if duration_ms > self.max_ms:
+			self.max_ms = duration_ms
+
+	def merge(self, buckets: list[int], count: int, sum_ms: float, max_ms: float) -> None:
+		for i, n in enumerate(buckets[:BUCKET_COUNT]):
+			self.buckets[i] += int(n)
+		self.count += int(count)
+		self.sum_ms += float(sum_ms)
+		self.max_ms = max(self.max_ms, float(max_ms))
+
+	def percentile(self, q: float) -> float | None:
+		"""
+		Estimated q-quantile (0..1), interpolated linearly inside the bucket.
+		The overflow bucket reports max_ms.
+		"""
+		if not self.count:
+			return None
+		rank = q * self.count
+		seen = 0
+		for i, n in enumerate(self.buckets):
+			if not n:
+				continue
+			if seen + n >= rank:
+				if i >= len(LATENCY_BUCKETS_MS):
+					return self.max_ms
+				lower = LATENCY_BUCKETS_MS[i - 1] if i else 0
+				upper = min(LATENCY_BUCKETS_MS[i], self.max_ms) if self.max_ms else LATENCY_BUCKETS_MS[i]
+				return lower + (upper - lower) * max(rank - seen, 0) / n
+			seen += n
+		return self.max_ms
+
+	@property
+	def mean_ms(self) -> float | None:
+		return self.sum_ms / self.count if self.count else None
+
+
+def status_class(status_code: int) -> str:
+	return f"{int(status_code) // 100}xx" if status_code else "0xx"
+
+
+def period_start(ts: datetime, period_s: int) -> datetime:
+	epoch = int(ts.timestamp())
+	return datetime.fromtimestamp(epoch - epoch % period_s, tz=UTC)
+
+
+class LatencyRecorder:
+	"""
+	Per-process latency histograms, keyed by (route, method, status class, tenant).
+
+	observe() is a dict lookup + list increment under a lock. A background flusher
+	moves the current histograms into RouteLatency (public schema) every
+	LATENCY_FLUSH_INTERVAL_S seconds, adding to the row for the current
+	LATENCY_PERIOD_S period so all workers merge into the same rows.
+	"""
+
+	def __init__(self, *, period_s: int | None = None, flush_interval: float | None = None, max_keys: int = 5000):
+		self.period_s = max(int(period_s or getattr(settings, "LATENCY_PERIOD_S", 60)), 1)
+		interval = flush_interval or float(getattr(settings, "LATENCY_FLUSH_INTERVAL_S", 30))
+		self.max_keys = max_keys
+		self._hists: dict[LatencyKey, Histogram] = {}
+		self._lock = threading.Lock()
+		self.flusher = PeriodicFlusher("latency-flusher", interval, self.flush_now)
+
+	def observe(self, key: LatencyKey, duration_ms: float) -> None:
+		self.flusher.start()
+		with self._lock:
+			hist = self._hists.get(key)
+			if hist is None:
+				if len(self._hists) >= self.max_keys:
+					# Bounded memory: fold unseen routes into one overflow key.
+					key = ("<other>", key[1], key[2], key[3])
+					hist = self._hists.get(key)
+				if hist is None:
+					hist = self._hists[key] = Histogram()
+			hist.observe(duration_ms)
+
+	def drain(self) -> dict[LatencyKey, Histogram]:
+		with self._lock:
+			hists, self._hists = self._hists, {}
+		return hists
+
+	def flush(self) -> None:
+		self.flusher.flush()
+
+	def flush_now(self, now: datetime | None = None) -> int:
+		hists = self.drain()
+		if not hists:
+			return 0
+		start = period_start(now or datetime.now(tz=UTC), self.period_s)
+		rows = [
+			(start, route[:200], method[:10], sc, schema[:63], h.count, h.sum_ms, h.max_ms, h.buckets)
+			for (route, method, sc, schema), h in hists.items()
+		]
+		if schema_context is not None:
+			with schema_context("public"):
+				upsert_latency_rows(rows)
+		else:
+			upsert_latency_rows(rows)
+		return len(rows)
+
+
+def upsert_latency_rows(rows: list[tuple]) -> None:
+	"""
+	Add histogram counts to RouteLatency with one multi-row INSERT ... ON CONFLICT.
+	"""
+	if not rows:
+		return
+	from apps.platform.models import RouteLatency
+
+	table = connection.ops.quote_name(RouteLatency._meta.db_table)
+	values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s::bigint[])"] * len(rows))
+	params = [v for row in rows for v in row]
+	with connection.cursor() as cur:
+		cur.execute(
+			f"""
+			INSERT INTO {table} AS t
+				(period_start, route, method, status_class, tenant_schema, count, sum_ms, max_ms, buckets)
+			VALUES {values}
+			ON CONFLICT (period_start, route, method, status_class, tenant_schema) DO UPDATE SET
+				count = t.count + EXCLUDED.count,
+				sum_ms = t.sum_ms + EXCLUDED.sum_ms,
+				max_ms = GREATEST(t.max_ms, EXCLUDED.max_ms),
+				buckets = ARRAY(
+					SELECT COALESCE(a, 0) + COALESCE(b, 0)
+					FROM unnest(t.buckets, EXCLUDED.buckets) AS u(a, b)
+				)
+			""",
+			params,
+		)
+
+
+_recorder: LatencyRecorder | None = None
+_recorder_lock = threading.Lock()
+
+
+def get_latency_recorder() -> LatencyRecorder:
+	global _recorder
+	if _recorder is None:
+		with _recorder_lock:
+			if _recorder is None:
+				_recorder = LatencyRecorder()
+	return _recorder
+
+
+def record_request_latency(request, status_code: int, duration_ms: float) -> None:
+	if not getattr(settings, "LATENCY_HISTOGRAMS_ENABLED", True):
+		return
+	match = getattr(request, "resolver_match", None)
+	route = (getattr(match, "view_name", "") or "") if match else ""
+	tenant = getattr(request, "tenant", None)
+	key = (
+		route or "<unresolved>",
+		(getattr(request, "method", "") or "").upper(),
+		status_class(status_code),
+		getattr(tenant, "schema_name", "") or "",
+	)
+	get_latency_recorder().observe(key, duration_ms)
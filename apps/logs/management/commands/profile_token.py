@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.logs.profiling import PROFILE_HEADER, make_profile_token
+
+
+class Command(BaseCommand):
+	help = "Print a signed X-HH-Profile header value (profiles any request that sends it)."
+
+	def handle(self, *args, **opts):
+		max_age = int(getattr(settings, "PROFILE_TOKEN_MAX_AGE_S", 3600))
+		self.stdout.write(f"{PROFILE_HEADER}: {make_profile_token()}")
+		self.stdout.write(f"(valid for {max_age}s)")
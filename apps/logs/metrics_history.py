@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from array import array
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.db import connection
+
+from apps.core.periodic import PeriodicFlusher
+from apps.logs.metrics import SystemMetrics, get_system_metrics
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+# resolution -> (bucket seconds, ring slots kept per host/pid/metric)
+RESOLUTIONS: dict[str, tuple[int, int]] = {
+	"1m": (60, 1440),
+	"1h": (3600, 24 * 14),
+	"1d": (86400, 365),
+}
+
+# pid 0 holds host-wide metrics (every process on the host merges into the same rows).
+HOST_PID = 0
+HOST_METRICS = ("load1", "mem_available_kb", "disk_used_bytes")
+PROCESS_METRICS = ("rss_kb",)
+METRIC_NAMES = (*HOST_METRICS, *PROCESS_METRICS)
+
+
+def metric_values(m: SystemMetrics) -> dict[str, float | None]:
+	return {
+		"load1": m.loadavg_1,
+		"mem_available_kb": m.mem_available_kb,
+		"disk_used_bytes": m.disk_used_bytes,
+		"rss_kb": m.rss_kb,
+	}
+
+
+class RingBuffer:
+	"""
+	Fixed-capacity (timestamp, value) samples in two array("d"); the oldest sample
+	is overwritten once full.
+	"""
+
+	def __init__(self, capacity: int):
+		self.capacity = max(int(capacity), 1)
+		self._ts = array("d", bytes(8 * self.capacity))
+		self._values = array("d", bytes(8 * self.capacity))
+		self._next = 0
+		self._size = 0
+
+	def __len__(self) -> int:
+		return self._size
+
+	def append(self, ts: float, value: float) -> None:
+		self._ts[self._next] = ts
+		self._values[self._next] = value
+		self._next = (self._next + 1) % self.capacity
+		self._size = min(self._size + 1, self.capacity)
+
+	def since(self, ts: float) -> list[tuple[float, float]]:
+		"""
+		Samples newer than `ts`, oldest first.
+		"""
+		start = (self._next - self._size) % self.capacity
+		out = []
+		for i in range(self._size):
+			j = (start + i) % self.capacity
+			if self._ts[j] > ts:
+				out.append((self._ts[j], self._values[j]))
+		return out
+
+
+def bucket_slot(ts: float, resolution: str) -> tuple[int, int]:
+	"""
+	(bucket start epoch, ring slot) of `ts` at `resolution`.
+	"""
+	step, slots = RESOLUTIONS[resolution]
+	start = int(ts) - int(ts) % step
+	return start, (start // step) % slots
+
+
+def rollup_samples(host: str, pid: int, metric: str, samples: list[tuple[float, float]]) -> list[tuple]:
+	"""
+	Rows (host, pid, resolution, slot, bucket_start, metric, min, max, sum, count)
+	for every resolution touched by `samples`.
+	"""
+	buckets: dict[tuple[str, int], list[float]] = {}
+	for ts, value in samples:
+		for resolution in RESOLUTIONS:
+			start, _ = bucket_slot(ts, resolution)
+			agg = buckets.get((resolution, start))
+			if agg is None:
+				buckets[(resolution, start)] = [value, value, value, 1]
+			else:
+				agg[0] = min(agg[0], value)
+				agg[1] = max(agg[1], value)
+				agg[2] += value
+				agg[3] += 1
+	rows = []
+	for (resolution, start), (lo, hi, total, count) in buckets.items():
+		_, slot = bucket_slot(start, resolution)
+		rows.append(
+			(host[:100], pid, resolution, slot, datetime.fromtimestamp(start, tz=UTC), metric, lo, hi, total, int(count))
+		)
+	return rows
+
+
+def upsert_metric_buckets(rows: list[tuple]) -> None:
+	"""
+	Merge rollups into SystemMetricBucket. A slot still holding an older bucket (the
+	ring wrapped around) is overwritten instead of merged.
+	"""
+	if not rows:
+		return
+	from apps.platform.models import SystemMetricBucket
+
+	table = connection.ops.quote_name(SystemMetricBucket._meta.db_table)
+	values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+	params = [v for row in rows for v in row]
+	with connection.cursor() as cur:
+		cur.execute(
+			f"""
+			INSERT INTO {table} AS t
+				(host, pid, resolution, slot, bucket_start, metric, min_value, max_value, sum_value, count)
+			VALUES {values}
+			ON CONFLICT (host, pid, resolution, slot, metric) DO UPDATE SET
+				min_value = CASE WHEN t.bucket_start = EXCLUDED.bucket_start
+					THEN LEAST(t.min_value, EXCLUDED.min_value) ELSE EXCLUDED.min_value END,
+				max_value = CASE WHEN t.bucket_start = EXCLUDED.bucket_start
+					THEN GREATEST(t.max_value, EXCLUDED.max_value) ELSE EXCLUDED.max_value END,
+				sum_value = CASE WHEN t.bucket_start = EXCLUDED.bucket_start
+					THEN t.sum_value + EXCLUDED.sum_value ELSE EXCLUDED.sum_value END,
+				count = CASE WHEN t.bucket_start = EXCLUDED.bucket_start
+					THEN t.count + EXCLUDED.count ELSE EXCLUDED.count END,
+				bucket_start = EXCLUDED.bucket_start
+			WHERE t.bucket_start <= EXCLUDED.bucket_start
+			""",
+			params,
+		)
+
+
+def prune_metric_buckets(now: datetime | None = None) -> int:
+	"""
+	Delete buckets older than their resolution's ring span. Live series overwrite
+	those slots anyway; this reaps the series of exited processes.
+	"""
+	from apps.platform.models import SystemMetricBucket
+
+	now = now or datetime.now(tz=UTC)
+	deleted = 0
+	for resolution, (step, slots) in RESOLUTIONS.items():
+		cutoff = datetime.fromtimestamp(now.timestamp() - step * slots, tz=UTC)
+		deleted += SystemMetricBucket.objects.filter(resolution=resolution, bucket_start__lt=cutoff).delete()[0]
+	return deleted
+
+
+class SystemMetricsSampler:
+	"""
+	Samples get_system_metrics() every SYSTEM_METRICS_SAMPLE_S seconds into per-metric
+	ring buffers, and every SYSTEM_METRICS_FLUSH_INTERVAL_S rolls the new samples up
+	into 1m / 1h / 1d SystemMetricBucket rows (public schema) for this host and pid.
+	"""
+
+	def __init__(self, *, sample_s: float | None = None, flush_interval: float | None = None, capacity: int | None = None):
+		sample_s = sample_s or float(getattr(settings, "SYSTEM_METRICS_SAMPLE_S", 15))
+		interval = flush_interval or float(getattr(settings, "SYSTEM_METRICS_FLUSH_INTERVAL_S", 60))
+		capacity = capacity or int(getattr(settings, "SYSTEM_METRICS_RING_SIZE", 240))
+		self.host = socket.gethostname()
+		self.capacity = capacity
+		self.rings = {name: RingBuffer(capacity) for name in METRIC_NAMES}
+		self._persisted_upto = 0.0
+		self._pid: int | None = None
+		self._lock = threading.Lock()
+		self.sampler = PeriodicFlusher("system-metrics-sampler", sample_s, self.sample)
+		self.flusher = PeriodicFlusher("system-metrics-flusher", interval, self.flush_now)
+
+	def start(self) -> None:
+		pid = os.getpid()
+		if self._pid != pid:
+			with self._lock:
+				if self._pid is not None and self._pid != pid:
+					# Forked: the parent's samples are not this process's RSS.
+					self.rings = {name: RingBuffer(self.capacity) for name in METRIC_NAMES}
+					self._persisted_upto = 0.0
+				self._pid = pid
+		self.sampler.start()
+		self.flusher.start()
+
+	def sample(self, now: float | None = None, metrics: SystemMetrics | None = None) -> None:
+		now = now or time.time()
+		values = metric_values(metrics or get_system_metrics())
+		with self._lock:
+			for name, value in values.items():
+				if value is not None:
+					self.rings[name].append(now, float(value))
+
+	def flush_now(self) -> int:
+		pid = os.getpid()
+		with self._lock:
+			since = self._persisted_upto
+			rows = []
+			for name, ring in self.rings.items():
+				samples = ring.since(since)
+				if samples:
+					self._persisted_upto = max(self._persisted_upto, samples[-1][0])
+					rows += rollup_samples(self.host, HOST_PID if name in HOST_METRICS else pid, name, samples)
+		if not rows:
+			return 0
+		if schema_context is not None:
+			with schema_context("public"):
+				upsert_metric_buckets(rows)
+		else:
+			upsert_metric_buckets(rows)
+		return len(rows)
+
+
+_sampler: SystemMetricsSampler | None = None
+_sampler_lock = threading.Lock()
+
+
+def get_system_sampler() -> SystemMetricsSampler:
+	global _sampler
+	if _sampler is None:
+		with _sampler_lock:
+			if _sampler is None:
+				_sampler = SystemMetricsSampler()
+	return _sampler
+
+
+def ensure_system_sampler(**kwargs) -> None:
+	"""
+	Start this process's sampler (cheap after the first call). Called per request and
+	per Celery task so every web and worker process is covered.
+	"""
+	if getattr(settings, "SYSTEM_METRICS_ENABLED", True):
+		get_system_sampler().start()
+
+
+def connect_celery_signals() -> None:
+	try:
+		from celery.signals import task_prerun
+	except Exception:  # pragma: no cover
+		return
+	task_prerun.connect(ensure_system_sampler, weak=False, dispatch_uid="hh_system_metrics_sampler")
@@ -7,7 +7,11 @@ from django.utils.deprecation import MiddlewareMixin
 
 from apps.audits.models import AuditStatus
 from apps.audits.services import audit_log
+from apps.logs.accounting import record_tenant_usage
+from apps.logs.latency import record_request_latency
+from apps.logs.metrics_history import ensure_system_sampler
 from apps.logs.perf import DBQueryLogger, log_slow_request
+from apps.logs.prometheus import record_request_metrics
 
 
 class ExceptionAlertMiddleware(MiddlewareMixin):
@@ -37,11 +41,24 @@ class PerformanceAlertMiddleware(MiddlewareMixin):
 	"""
 	- Measures request duration and logs slow requests (warning)
 	- Captures slow DB queries per request
+	- Reports repeated (N+1) queries as one "Query profile" log per request
+	- Feeds per-route latency histograms (apps.logs.latency)
+	- Attributes request/DB time, query count and bytes to the tenant (apps.logs.accounting)
+	- Feeds the /metrics request/DB series (apps.logs.prometheus)
+	- Starts this worker's system metrics sampler (apps.logs.metrics_history)
 	"""
 
 	def process_request(self, request):
-		request._perf_start = time.perf_counter()
-		request._db_query_logger = DBQueryLogger()
+		# ServerTimingMiddleware (when enabled) starts the clock before tenant resolution.
+		if getattr(request, "_perf_start", None) is None:
+			request._perf_start = time.perf_counter()
+		try:
+			ensure_system_sampler()
+		except Exception:
+			pass
+		request._db_query_logger = DBQueryLogger(
+			method=getattr(request, "method", "") or "", path=getattr(request, "path", "") or ""
+		)
 		request._db_query_logger.__enter__()
 
 	def process_response(self, request, response):
@@ -54,8 +71,21 @@ class PerformanceAlertMiddleware(MiddlewareMixin):
 
 		start = getattr(request, "_perf_start", None)
 		if start is not None:
-			dur_ms = int((time.perf_counter() - start) * 1000)
+			elapsed_ms = (time.perf_counter() - start) * 1000
+			dur_ms = int(elapsed_ms)
 			log_slow_request(getattr(request, "method", ""), getattr(request, "path", ""), dur_ms, getattr(response, "status_code", 0))
+			try:
+				record_request_latency(request, getattr(response, "status_code", 0), elapsed_ms)
+			except Exception:
+				pass
+			try:
+				record_tenant_usage(request, response, elapsed_ms)
+			except Exception:
+				pass
+			try:
+				record_request_metrics(request, getattr(response, "status_code", 0), elapsed_ms)
+			except Exception:
+				pass
 
 		# Turn 5xx responses into alerts even if they were handled.
 		if getattr(response, "status_code", 0) >= 500:
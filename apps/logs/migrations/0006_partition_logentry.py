@@ -0,0 +1,25 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def partition_logentry(apps, schema_editor):
+    from apps.core.partitioning import convert_to_partitioned
+
+    convert_to_partitioned(schema_editor, apps.get_model('logs', 'LogEntry'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0005_logentry_tags_logentry_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logentry',
+            name='uid',
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.RunPython(partition_logentry, migrations.RunPython.noop),
+    ]
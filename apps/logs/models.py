@@ -19,9 +19,13 @@ class LogEntry(models.Model):
 	Stored per schema:
 	  - public schema: platform/control-plane runtime logs
 	  - tenant schemas: tenant runtime logs
+
+	The table is RANGE-partitioned on created_at (see apps.core.partitioning), so
+	retention drops whole partitions and the primary key is (id, created_at).
+	`uid` is indexed but not unique: Postgres can't enforce uniqueness across partitions.
 	"""
 
-	uid = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True, unique=True)
+	uid = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
 	created_at = models.DateTimeField(default=timezone.now, db_index=True)
 	updated_at = models.DateTimeField(auto_now=True)
 	tags = models.JSONField(default=list, blank=True)
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import random
+import re
 import time
 from contextlib import ContextDecorator
+from dataclasses import dataclass, field
+from functools import lru_cache
 
 from django.conf import settings
 from django.db import connection
 
+from apps.logs.explain import maybe_explain
+from apps.logs.sqlcomment import strip_sql_comment
+
 
 def _slow_request_ms() -> int:
 	return int(getattr(settings, "SLOW_REQUEST_MS", 1000))
@@ -16,20 +24,113 @@ def _slow_db_query_ms() -> int:
 	return int(getattr(settings, "SLOW_DB_QUERY_MS", 200))
 
 
+def _profile_sample_rate() -> float:
+	return float(getattr(settings, "DB_QUERY_PROFILE_SAMPLE_RATE", 1.0))
+
+
+def _duplicate_query_threshold() -> int:
+	return int(getattr(settings, "DB_DUPLICATE_QUERY_THRESHOLD", 10))
+
+
+_SQL_COMMENT_RE = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER_RE = re.compile(r"(?<![\w.\"])-?\d+(?:\.\d+)?\b")
+_SQL_PARAM_RE = re.compile(r"%s|%\(\w+\)s|\$\d+")
+_SQL_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SQL_SPACE_RE = re.compile(r"\s+")
+
+# Connection housekeeping issued before (almost) every query by django-tenants.
+_PROFILE_IGNORED_PREFIXES = ("SET search_path",)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint_sql(sql: str) -> tuple[str, str]:
+	"""
+	Normalise SQL so queries differing only in literals/params share a fingerprint.
+	Returns (fingerprint, normalised_sql).
+
+	- comments dropped, strings/numbers/placeholders -> ?
+	- IN (?, ?, ...) -> IN (...) so batch sizes don't split fingerprints
+	"""
+	norm = _SQL_COMMENT_RE.sub(" ", sql)
+	norm = _SQL_STRING_RE.sub("?", norm)
+	norm = _SQL_PARAM_RE.sub("?", norm)
+	norm = _SQL_NUMBER_RE.sub("?", norm)
+	norm = _SQL_IN_LIST_RE.sub("(...)", norm)
+	norm = _SQL_SPACE_RE.sub(" ", norm).strip()
+	return hashlib.sha1(norm.encode("utf-8", "replace")).hexdigest()[:16], norm
+
+
+@dataclass
+class _FingerprintStats:
+	sql: str
+	count: int = 0
+	total_ms: float = 0.0
+
+
+@dataclass
+class QueryProfile:
+	"""
+	Query count, DB time and per-fingerprint repetition for one request.
+	"""
+
+	query_count: int = 0
+	total_ms: float = 0.0
+	fingerprints: dict[str, _FingerprintStats] = field(default_factory=dict)
+
+	def add(self, sql: str, dur_ms: float) -> None:
+		if sql.startswith(_PROFILE_IGNORED_PREFIXES):
+			return
+		# Per-request tags (request_id) would defeat the fingerprint cache.
+		fp, norm = fingerprint_sql(strip_sql_comment(sql))
+		stats = self.fingerprints.get(fp)
+		if stats is None:
+			stats = self.fingerprints[fp] = _FingerprintStats(sql=norm[:2000])
+		stats.count += 1
+		stats.total_ms += dur_ms
+		self.query_count += 1
+		self.total_ms += dur_ms
+
+	def duplicates(self, threshold: int) -> list[dict]:
+		"""
+		Fingerprints executed more than `threshold` times, most repeated first.
+		"""
+		hot = [(fp, s) for fp, s in self.fingerprints.items() if s.count > threshold]
+		hot.sort(key=lambda item: (item[1].count, item[1].total_ms), reverse=True)
+		return [
+			{"fingerprint": fp, "count": s.count, "total_ms": round(s.total_ms, 2), "sql": s.sql}
+			for fp, s in hot
+		]
+
+
 class DBQueryLogger(ContextDecorator):
 	"""
 	Per-request query logger using connection.execute_wrapper.
 	Logs:
-	- slow queries (> SLOW_DB_QUERY_MS)
+	- slow queries (> SLOW_DB_QUERY_MS); with SLOW_QUERY_EXPLAIN on, a sample of slow
+	  SELECTs is EXPLAINed off the request thread (apps.logs.explain)
 	- query errors (ERROR)
+	- one "Query profile" WARNING (logger db.profile) when a sampled request repeats a
+	  query fingerprint more than DB_DUPLICATE_QUERY_THRESHOLD times (N+1 pattern)
+
+	Only DB_QUERY_PROFILE_SAMPLE_RATE of requests are fingerprinted; the rest just
+	pay for the slow-query timer.
 	"""
 
-	def __init__(self):
+	def __init__(self, *, method: str = "", path: str = "", sample_rate: float | None = None):
 		self._cm = None
+		# Always-on totals (Server-Timing); search_path housekeeping excluded.
+		self.db_ms = 0.0
+		self.query_count = 0
+		self.method = method
+		self.path = path
+		rate = _profile_sample_rate() if sample_rate is None else sample_rate
+		self.profile: QueryProfile | None = QueryProfile() if rate > 0 and random.random() < rate else None
 
 	def __enter__(self):
 		threshold = _slow_db_query_ms()
 		log = logging.getLogger("db.query")
+		profile = self.profile
 
 		def wrapper(execute, sql, params, many, context):
 			start = time.perf_counter()
@@ -43,20 +144,63 @@ class DBQueryLogger(ContextDecorator):
 				)
 				raise
 			finally:
-				dur_ms = int((time.perf_counter() - start) * 1000)
+				elapsed_ms = (time.perf_counter() - start) * 1000
+				if not str(sql).startswith(_PROFILE_IGNORED_PREFIXES):
+					self.db_ms += elapsed_ms
+					self.query_count += 1
+				if profile is not None:
+					profile.add(str(sql), elapsed_ms)
+				dur_ms = int(elapsed_ms)
 				if dur_ms >= threshold:
+					fp, norm = fingerprint_sql(strip_sql_comment(str(sql)))
 					log.warning(
 						"Slow DB query",
-						extra={"duration_ms": dur_ms, "sql": str(sql)[:2000]},
+						extra={"duration_ms": dur_ms, "sql": str(sql)[:2000], "fingerprint": fp},
+					)
+					maybe_explain(
+						str(sql),
+						params,
+						many=many,
+						raw_connection=context["connection"].connection,
+						fingerprint=fp,
+						normalized=norm,
+						duration_ms=dur_ms,
 					)
 
 		self._cm = connection.execute_wrapper(wrapper)
 		return self._cm.__enter__()
 
 	def __exit__(self, exc_type, exc, tb):
+		result = False
 		if self._cm:
-			return self._cm.__exit__(exc_type, exc, tb)
-		return False
+			result = self._cm.__exit__(exc_type, exc, tb)
+			self._cm = None
+		if self.profile is not None:
+			self.report()
+		return result
+
+	def report(self) -> None:
+		profile = self.profile
+		if profile is None:
+			return
+		self.profile = None
+		duplicates = profile.duplicates(_duplicate_query_threshold())
+		if not duplicates:
+			return
+		logging.getLogger("db.profile").warning(
+			"Query profile: %s repeated queries on %s %s",
+			sum(d["count"] for d in duplicates),
+			self.method,
+			self.path,
+			extra={
+				"method": self.method,
+				"path": self.path,
+				"query_count": profile.query_count,
+				"db_ms": round(profile.total_ms, 2),
+				"distinct_queries": len(profile.fingerprints),
+				"duplicates": duplicates[:10],
+			},
+		)
 
 
 def log_slow_request(method: str, path: str, duration_ms: int, status_code: int):
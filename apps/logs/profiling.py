@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+from apps.logs.perf import _slow_request_ms
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+log = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-HH-Profile"
+PROFILE_PARAM = "_profile"
+_SIGNING_SALT = "apps.logs.profiling"
+_MAX_DEPTH = 128
+
+
+def make_profile_token() -> str:
+	"""
+	Token for the X-HH-Profile header (load tests, curl): valid for PROFILE_TOKEN_MAX_AGE_S.
+	"""
+	return signing.TimestampSigner(salt=_SIGNING_SALT).sign("profile")
+
+
+def _valid_token(value: str) -> bool:
+	try:
+		signing.TimestampSigner(salt=_SIGNING_SALT).unsign(
+			value, max_age=int(getattr(settings, "PROFILE_TOKEN_MAX_AGE_S", 3600))
+		)
+	except signing.BadSignature:
+		return False
+	return True
+
+
+def _frame_label(frame) -> str:
+	module = frame.f_globals.get("__name__") or os.path.basename(frame.f_code.co_filename)
+	return f"{module}:{frame.f_code.co_name}"
+
+
+def collapse_stack(frame) -> str:
+	"""
+	"root;...;leaf" for one frame chain (folded-stack format used by flamegraph tools).
+	"""
+	labels: list[str] = []
+	while frame is not None and len(labels) < _MAX_DEPTH:
+		labels.append(_frame_label(frame))
+		frame = frame.f_back
+	labels.reverse()
+	return ";".join(labels)
+
+
+class StackSampler:
+	"""
+	Statistical profiler: one daemon thread samples the stacks of registered threads
+	every `interval` seconds via sys._current_frames(). Idle (blocked) when nothing is
+	registered, so the cost is only paid while a request is being profiled.
+	"""
+
+	def __init__(self, interval: float):
+		self.interval = max(float(interval), 0.001)
+		self._targets: dict[int, Counter] = {}
+		self._lock = threading.Lock()
+		self._active = threading.Event()
+		self._thread: threading.Thread | None = None
+		self._pid: int | None = None
+
+	def start(self, thread_id: int) -> None:
+		self._ensure_started()
+		with self._lock:
+			self._targets[thread_id] = Counter()
+			self._active.set()
+
+	def stop(self, thread_id: int) -> Counter:
+		with self._lock:
+			stacks = self._targets.pop(thread_id, None) or Counter()
+			if not self._targets:
+				self._active.clear()
+		return stacks
+
+	def sample_once(self) -> None:
+		frames = sys._current_frames()
+		with self._lock:
+			for thread_id, stacks in self._targets.items():
+				frame = frames.get(thread_id)
+				if frame is not None:
+					stacks[collapse_stack(frame)] += 1
+
+	def _ensure_started(self) -> None:
+		pid = os.getpid()
+		thread = self._thread
+		if thread is not None and self._pid == pid and thread.is_alive():
+			return
+		with self._lock:
+			thread = self._thread
+			if thread is not None and self._pid == pid and thread.is_alive():
+				return
+			self._pid = pid
+			self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+			self._thread.start()
+
+	def _run(self) -> None:
+		while True:
+			self._active.wait()
+			self.sample_once()
+			time.sleep(self.interval)
+
+
+_sampler: StackSampler | None = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> StackSampler:
+	global _sampler
+	if _sampler is None:
+		with _sampler_lock:
+			if _sampler is None:
+				_sampler = StackSampler(int(getattr(settings, "PROFILE_INTERVAL_MS", 5)) / 1000.0)
+	return _sampler
+
+
+def profile_trigger(request) -> str:
+	"""
+	Why this request should be profiled: "manual" (staff ?_profile=1 or a signed
+	X-HH-Profile header), "slow" (speculative sample, kept only if the request turns
+	out slower than SLOW_REQUEST_MS) or "" (don't profile).
+	"""
+	if not getattr(settings, "PROFILING_ENABLED", True):
+		return ""
+	token = request.headers.get(PROFILE_HEADER, "")
+	if token and _valid_token(token):
+		return "manual"
+	if request.GET.get(PROFILE_PARAM) == "1" and getattr(getattr(request, "user", None), "is_staff", False):
+		return "manual"
+	rate = float(getattr(settings, "PROFILE_SLOW_SAMPLE_RATE", 0.0))
+	if rate > 0 and random.random() < rate:
+		return "slow"
+	return ""
+
+
+def save_profile(request, *, trigger: str, stacks: Counter, duration_ms: int, status_code: int):
+	from apps.platform.models import RequestProfile
+
+	match = getattr(request, "resolver_match", None)
+	tenant = getattr(request, "tenant", None)
+	profile = RequestProfile(
+		request_id=getattr(request, "audit_request_id", "") or "",
+		trigger=trigger,
+		tenant_schema=getattr(tenant, "schema_name", "") or "",
+		method=(getattr(request, "method", "") or "")[:10],
+		path=(getattr(request, "path", "") or "")[:300],
+		route=((getattr(match, "view_name", "") or "") if match else "")[:200],
+		status_code=status_code,
+		duration_ms=duration_ms,
+		samples=sum(stacks.values()),
+		interval_ms=int(getattr(settings, "PROFILE_INTERVAL_MS", 5)),
+		stacks="\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+	)
+	if schema_context is not None:
+		with schema_context("public"):
+			profile.save(force_insert=True)
+	else:
+		profile.save(force_insert=True)
+	return profile
+
+
+class RequestProfilerMiddleware:
+	"""
+	Samples the request thread's stack while the rest of the stack + view runs and
+	stores the folded stacks as platform.RequestProfile (Platform -> Profiles).
+
+	Place it after AuthenticationMiddleware (staff check). Manual profiles get an
+	X-HH-Profile-Id response header with the request id.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		trigger = profile_trigger(request)
+		if not trigger:
+			return self.get_response(request)
+
+		sampler = get_sampler()
+		thread_id = threading.get_ident()
+		sampler.start(thread_id)
+		start = time.perf_counter()
+		try:
+			response = self.get_response(request)
+		finally:
+			stacks = sampler.stop(thread_id)
+		duration_ms = int((time.perf_counter() - start) * 1000)
+
+		if trigger == "slow" and duration_ms < _slow_request_ms():
+			return response
+		try:
+			profile = save_profile(
+				request,
+				trigger=trigger,
+				stacks=stacks,
+				duration_ms=duration_ms,
+				status_code=getattr(response, "status_code", 0),
+			)
+		except Exception:
+			log.exception("Failed to store request profile")
+			return response
+		if trigger == "manual":
+			response["X-HH-Profile-Id"] = profile.request_id
+		return response
@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import bisect
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+from apps.core.periodic import PeriodicFlusher
+from apps.logs.latency import LATENCY_BUCKETS_MS, status_class
+from apps.logs.metrics import SystemMetrics, _read_rss_kb, get_system_metrics
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS_S: tuple[float, ...] = tuple(ms / 1000 for ms in LATENCY_BUCKETS_MS)
+TASK_BUCKETS_S: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+	name: str
+	kind: str  # "counter" | "histogram" | "gauge"
+	help: str
+	labels: tuple[str, ...] = ()
+	buckets: tuple[float, ...] = ()
+
+
+METRICS: dict[str, MetricSpec] = {}
+
+
+def register_metric(
+	name: str, kind: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = ()
+) -> MetricSpec:
+	spec = MetricSpec(name=name, kind=kind, help=help, labels=labels, buckets=tuple(float(b) for b in buckets))
+	METRICS[name] = spec
+	return spec
+
+
+HTTP_REQUEST_DURATION = register_metric(
+	"hh_http_request_duration_seconds",
+	"histogram",
+	"Request duration across the whole middleware stack.",
+	("route", "method", "status"),
+	REQUEST_BUCKETS_S,
+)
+DB_QUERIES = register_metric("hh_db_queries_total", "counter", "DB queries executed while serving requests.", ("route",))
+DB_QUERY_SECONDS = register_metric("hh_db_query_seconds_total", "counter", "Time spent in DB queries while serving requests.", ("route",))
+LOG_RECORDS_WRITTEN = register_metric("hh_log_records_written_total", "counter", "LogEntry rows written.", ("level",))
+LOG_RECORDS_DROPPED = register_metric("hh_log_records_dropped_total", "counter", "Log records not written.", ("reason",))
+AUDIT_EVENTS_WRITTEN = register_metric("hh_audit_events_written_total", "counter", "AuditEvent rows written.", ("status",))
+CELERY_TASK_DURATION = register_metric(
+	"hh_celery_task_duration_seconds", "histogram", "Celery task run time.", ("task", "state"), TASK_BUCKETS_S
+)
+QUOTA_CHECKS = register_metric("hh_quota_checks_total", "counter", "Quota checks by outcome.", ("key", "result"))
+QUOTA_USAGE_ADDED = register_metric("hh_quota_usage_added_total", "counter", "Usage added to quota counters.", ("key",))
+PROCESS_RSS = register_metric(
+	"hh_process_resident_memory_bytes", "gauge", "Resident memory of each live web/worker process.", ("host", "pid")
+)
+# Host-wide gauges, read by the scraping worker (apps.logs.metrics.get_system_metrics).
+LOAD_AVERAGE = register_metric("hh_load_average", "gauge", "System load average.", ("period",))
+MEMORY_TOTAL = register_metric("hh_memory_total_bytes", "gauge", "Total system memory.")
+MEMORY_AVAILABLE = register_metric("hh_memory_available_bytes", "gauge", "Available system memory.")
+DISK_TOTAL = register_metric("hh_disk_total_bytes", "gauge", "Size of the root filesystem.")
+DISK_USED = register_metric("hh_disk_used_bytes", "gauge", "Used bytes on the root filesystem.")
+DISK_FREE = register_metric("hh_disk_free_bytes", "gauge", "Free bytes on the root filesystem.")
+
+SeriesKey = tuple[str, tuple[str, ...]]
+
+
+@dataclass
+class MetricValues:
+	"""
+	Counter / histogram / gauge values for one process, or merged across processes.
+	Histograms are [count per bucket (+ overflow)..., sum].
+	"""
+
+	counters: dict[SeriesKey, float] = field(default_factory=dict)
+	histograms: dict[SeriesKey, list[float]] = field(default_factory=dict)
+	gauges: dict[SeriesKey, float] = field(default_factory=dict)
+
+	def to_json(self) -> dict:
+		return {
+			"counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+			"histograms": [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+			"gauges": [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+		}
+
+	def merge_json(self, data: dict, *, gauges: bool = True) -> None:
+		for name, labels, value in data.get("counters") or []:
+			key = (name, tuple(labels))
+			self.counters[key] = self.counters.get(key, 0.0) + float(value)
+		for name, labels, values in data.get("histograms") or []:
+			key = (name, tuple(labels))
+			current = self.histograms.get(key)
+			if current is None or len(current) != len(values):
+				self.histograms[key] = [float(v) for v in values]
+			else:
+				for i, v in enumerate(values):
+					current[i] += float(v)
+		if gauges:
+			for name, labels, value in data.get("gauges") or []:
+				self.gauges[(name, tuple(labels))] = float(value)
+
+
+class MetricsRegistry:
+	"""
+	Per-process metric values, shared with the other workers through files.
+
+	- inc()/observe() update cumulative in-memory totals under a lock
+	- a background flusher rewrites <METRICS_MULTIPROC_DIR>/<host>_<pid>_<token>.json
+	  every METRICS_FLUSH_INTERVAL_S seconds (write + atomic rename)
+	- collect_metrics() sums counters and histograms over every file, so a restarted
+	  worker's totals are kept until its file is older than METRICS_FILE_TTL_S
+	- a forked child starts from zero with its own file
+	"""
+
+	def __init__(self, *, directory: str | Path | None = None, flush_interval: float | None = None):
+		self.directory = Path(directory or getattr(settings, "METRICS_MULTIPROC_DIR", "/tmp/horstenhomes-metrics"))
+		interval = flush_interval or float(getattr(settings, "METRICS_FLUSH_INTERVAL_S", 10))
+		self._values = MetricValues()
+		self._lock = threading.Lock()
+		self._pid: int | None = None
+		self._path: Path | None = None
+		self.flusher = PeriodicFlusher("metrics-writer", interval, self.write_snapshot)
+
+	@property
+	def path(self) -> Path:
+		self._check_pid()
+		return self._path  # type: ignore[return-value]
+
+	def _check_pid(self) -> None:
+		pid = os.getpid()
+		if self._pid == pid:
+			return
+		with self._lock:
+			if self._pid == pid:
+				return
+			if self._pid is not None:
+				self._values = MetricValues()
+			self._pid = pid
+			self._path = self.directory / f"{socket.gethostname()}_{pid}_{uuid.uuid4().hex[:8]}.json"
+
+	def inc(self, spec: MetricSpec, labels: tuple[str, ...] = (), amount: float = 1.0) -> None:
+		self._check_pid()
+		self.flusher.start()
+		key = (spec.name, labels)
+		with self._lock:
+			counters = self._values.counters
+			counters[key] = counters.get(key, 0.0) + amount
+
+	def observe(self, spec: MetricSpec, labels: tuple[str, ...], value: float) -> None:
+		self._check_pid()
+		self.flusher.start()
+		key = (spec.name, labels)
+		with self._lock:
+			values = self._values.histograms.get(key)
+			if values is None:
+				values = self._values.histograms[key] = [0.0] * (len(spec.buckets) + 2)
+			values[bisect.bisect_left(spec.buckets, value)] += 1
+			values[-1] += value
+
+	def snapshot(self) -> dict:
+		with self._lock:
+			data = self._values.to_json()
+		rss_kb = _read_rss_kb()
+		if rss_kb is not None:
+			data["gauges"].append([PROCESS_RSS.name, [socket.gethostname(), str(os.getpid())], rss_kb * 1024])
+		data["pid"] = os.getpid()
+		data["written_at"] = time.time()
+		return data
+
+	def write_snapshot(self) -> None:
+		path = self.path
+		path.parent.mkdir(parents=True, exist_ok=True)
+		tmp = path.with_suffix(".tmp")
+		tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+		os.replace(tmp, path)
+
+
+def collect_metrics(
+	directory: str | Path,
+	*,
+	live_after_s: float | None = None,
+	ttl_s: float | None = None,
+	now: float | None = None,
+) -> MetricValues:
+	"""
+	Merge every process file in `directory`.
+
+	Gauges only come from files written in the last `live_after_s` seconds (3 flush
+	intervals by default); files older than `ttl_s` are deleted.
+	"""
+	now = now or time.time()
+	if live_after_s is None:
+		live_after_s = 3 * float(getattr(settings, "METRICS_FLUSH_INTERVAL_S", 10))
+	if ttl_s is None:
+		ttl_s = float(getattr(settings, "METRICS_FILE_TTL_S", 86400))
+
+	merged = MetricValues()
+	try:
+		paths = sorted(Path(directory).glob("*.json"))
+	except OSError:
+		return merged
+	for path in paths:
+		try:
+			age = now - path.stat().st_mtime
+			if ttl_s > 0 and age > ttl_s:
+				path.unlink(missing_ok=True)
+				continue
+			data = json.loads(path.read_text(encoding="utf-8"))
+		except (OSError, ValueError):
+			# Deleted or replaced while we were reading it.
+			continue
+		merged.merge_json(data, gauges=age <= live_after_s)
+	return merged
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+	parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values, strict=False)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	if float(value).is_integer() and abs(value) < 1e15:
+		return str(int(value))
+	return repr(float(value))
+
+
+def system_gauges(m: SystemMetrics) -> dict[SeriesKey, float]:
+	out: dict[SeriesKey, float] = {}
+	for period, value in (("1m", m.loadavg_1), ("5m", m.loadavg_5), ("15m", m.loadavg_15)):
+		if value is not None:
+			out[(LOAD_AVERAGE.name, (period,))] = value
+	if m.mem_total_kb is not None:
+		out[(MEMORY_TOTAL.name, ())] = m.mem_total_kb * 1024
+	if m.mem_available_kb is not None:
+		out[(MEMORY_AVAILABLE.name, ())] = m.mem_available_kb * 1024
+	out[(DISK_TOTAL.name, ())] = m.disk_total_bytes
+	out[(DISK_USED.name, ())] = m.disk_used_bytes
+	out[(DISK_FREE.name, ())] = m.disk_free_bytes
+	return out
+
+
+def render_text(values: MetricValues) -> str:
+	"""
+	Prometheus text exposition format (version 0.0.4), metrics in registration order.
+	"""
+	by_name: dict[str, list[tuple[tuple[str, ...], object]]] = {}
+	for source in (values.counters, values.histograms, values.gauges):
+		for (name, labels), value in source.items():
+			by_name.setdefault(name, []).append((labels, value))
+
+	lines: list[str] = []
+	for name, spec in METRICS.items():
+		series = by_name.get(name)
+		if not series:
+			continue
+		lines.append(f"# HELP {name} {spec.help}")
+		lines.append(f"# TYPE {name} {spec.kind}")
+		for labels, value in sorted(series, key=lambda s: s[0]):
+			if spec.kind != "histogram":
+				lines.append(f"{name}{_labels(spec.labels, labels)} {_fmt(value)}")
+				continue
+			counts, total = value[:-1], value[-1]
+			cumulative = 0.0
+			for bound, n in zip((*spec.buckets, float("inf")), counts, strict=False):
+				cumulative += n
+				le = _labels(spec.labels, labels, 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"')
+				lines.append(f"{name}_bucket{le} {_fmt(cumulative)}")
+			lines.append(f"{name}_sum{_labels(spec.labels, labels)} {_fmt(total)}")
+			lines.append(f"{name}_count{_labels(spec.labels, labels)} {_fmt(cumulative)}")
+	return "\n".join(lines) + "\n"
+
+
+_registry: MetricsRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+	global _registry
+	if _registry is None:
+		with _registry_lock:
+			if _registry is None:
+				_registry = MetricsRegistry()
+	return _registry
+
+
+def _enabled() -> bool:
+	return bool(getattr(settings, "METRICS_ENABLED", True))
+
+
+def render_metrics() -> str:
+	"""
+	Body for /metrics: this worker's latest values are written first so the scrape
+	is never behind by a flush interval for the process serving it.
+	"""
+	registry = get_metrics_registry()
+	registry.write_snapshot()
+	values = collect_metrics(registry.directory)
+	values.gauges.update(system_gauges(get_system_metrics()))
+	return render_text(values)
+
+
+def metrics_access_allowed(request) -> bool:
+	"""
+	- "Authorization: Bearer <METRICS_TOKEN>" (when a token is configured), or
+	- a direct connection from METRICS_ALLOWED_IPS (addresses or CIDRs). Requests that
+	  came through the reverse proxy (X-Forwarded-For set) need the token: behind nginx
+	  every REMOTE_ADDR is 127.0.0.1.
+	"""
+	token = getattr(settings, "METRICS_TOKEN", "") or ""
+	auth = request.headers.get("Authorization", "")
+	if token and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].strip(), token):
+		return True
+	if request.headers.get("X-Forwarded-For"):
+		return False
+	try:
+		addr = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+	except ValueError:
+		return False
+	for allowed in getattr(settings, "METRICS_ALLOWED_IPS", []) or []:
+		try:
+			if addr in ipaddress.ip_network(allowed, strict=False):
+				return True
+		except ValueError:
+			continue
+	return False
+
+
+def record_request_metrics(request, status_code: int, duration_ms: float) -> None:
+	if not _enabled():
+		return
+	match = getattr(request, "resolver_match", None)
+	route = ((getattr(match, "view_name", "") or "") if match else "") or "<unresolved>"
+	registry = get_metrics_registry()
+	registry.observe(
+		HTTP_REQUEST_DURATION,
+		(route, (getattr(request, "method", "") or "").upper(), status_class(status_code)),
+		duration_ms / 1000,
+	)
+	logger = getattr(request, "_db_query_logger", None)
+	if logger is not None and logger.query_count:
+		registry.inc(DB_QUERIES, (route,), logger.query_count)
+		registry.inc(DB_QUERY_SECONDS, (route,), logger.db_ms / 1000)
+
+
+def record_log_writes(levels: Iterable[str]) -> None:
+	if not _enabled():
+		return
+	registry = get_metrics_registry()
+	for level, n in Counter(levels).items():
+		registry.inc(LOG_RECORDS_WRITTEN, (str(level),), n)
+
+
+def record_log_drops(reason: str, count: int = 1) -> None:
+	if _enabled() and count:
+		get_metrics_registry().inc(LOG_RECORDS_DROPPED, (reason,), count)
+
+
+def record_audit_write(status: str) -> None:
+	if _enabled():
+		get_metrics_registry().inc(AUDIT_EVENTS_WRITTEN, (str(status),))
+
+
+def record_quota_check(key: str, result: str) -> None:
+	"""
+	result: "allowed" | "exceeded" (soft mode, still allowed) | "blocked" (hard mode)
+	| "throttled" (API token bucket empty).
+	"""
+	if _enabled():
+		get_metrics_registry().inc(QUOTA_CHECKS, (key, result))
+
+
+def record_quota_usage(key: str, delta: int) -> None:
+	if _enabled() and delta:
+		get_metrics_registry().inc(QUOTA_USAGE_ADDED, (key,), delta)
+
+
+_task_starts: dict[str, float] = {}
+
+
+def _task_prerun(sender=None, task_id=None, **kwargs) -> None:
+	if task_id:
+		_task_starts[task_id] = time.perf_counter()
+
+
+def _task_postrun(sender=None, task_id=None, state=None, **kwargs) -> None:
+	start = _task_starts.pop(task_id, None) if task_id else None
+	if start is None or not _enabled():
+		return
+	name = getattr(sender, "name", "") or "<unknown>"
+	get_metrics_registry().observe(CELERY_TASK_DURATION, (name, state or "UNKNOWN"), time.perf_counter() - start)
+
+
+def connect_celery_signals() -> None:
+	"""
+	Time Celery tasks (worker processes write their own metrics files; point the
+	worker's METRICS_MULTIPROC_DIR at the web's so /metrics includes them).
+	"""
+	try:
+		from celery.signals import task_postrun, task_prerun
+	except Exception:  # pragma: no cover
+		return
+	task_prerun.connect(_task_prerun, weak=False, dispatch_uid="hh_metrics_task_prerun")
+	task_postrun.connect(_task_postrun, weak=False, dispatch_uid="hh_metrics_task_postrun")
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+
+@dataclass
+class _Window:
+	started: float
+	schema: str
+	level: str
+	logger: str
+	template: str
+	pathname: str
+	lineno: int | None
+	seen: int = 0
+	suppressed: int = 0
+	first_suppressed: float | None = None
+	last_suppressed: float | None = None
+
+
+@dataclass(frozen=True)
+class SuppressedSummary:
+	fingerprint: str
+	schema: str
+	level: str
+	logger: str
+	template: str
+	pathname: str
+	lineno: int | None
+	suppressed: int
+	window_s: int
+	first_suppressed: float
+	last_suppressed: float
+
+
+@dataclass
+class LogSamplingConfig:
+	window_s: int = 60
+	burst: int = 20
+	max_keys: int = 10_000
+	sample_rates: dict[str, float] = field(default_factory=dict)
+
+	@classmethod
+	def from_settings(cls) -> LogSamplingConfig:
+		raw = getattr(settings, "LOG_SAMPLING", None) or {}
+		return cls(
+			window_s=max(int(raw.get("window_s", 60)), 1),
+			burst=max(int(raw.get("burst", 20)), 0),
+			max_keys=max(int(raw.get("max_keys", 10_000)), 1),
+			sample_rates={str(k): float(v) for k, v in (raw.get("sample_rates") or {}).items()},
+		)
+
+
+def record_fingerprint(record: logging.LogRecord) -> str:
+	"""
+	Stable identity of a log call site: logger + message template + code location.
+
+	Uses `record.msg` (the un-interpolated template) so "user 1 failed" / "user 2 failed"
+	from the same line collapse into one fingerprint.
+	"""
+	raw = f"{record.name}\0{record.msg}\0{record.pathname}\0{record.lineno}"
+	return hashlib.sha1(raw.encode("utf-8", "replace")).hexdigest()[:16]
+
+
+class LogRateLimiter:
+	"""
+	Per-logger sampling + per-fingerprint rate limiting for runtime logs.
+
+	- sampling: records below ERROR are kept with probability `sample_rates[logger]`
+	  (longest dotted-prefix match, default 1.0)
+	- rate limiting: the first `burst` records per (schema, fingerprint) in each
+	  `window_s` window are kept; the rest are counted and reported once via
+	  pop_summaries() after the window closes
+	"""
+
+	def __init__(self, config: LogSamplingConfig | None = None, *, clock=time.monotonic, wall_clock=time.time):
+		self.config = config or LogSamplingConfig()
+		self.sampled_out = 0
+		self._clock = clock
+		self._wall_clock = wall_clock
+		self._windows: dict[tuple[str, str], _Window] = {}
+		self._pending: list[SuppressedSummary] = []
+		self._lock = threading.Lock()
+		self._rate_cache: dict[str, float] = {}
+
+	def sample_rate(self, logger_name: str) -> float:
+		rate = self._rate_cache.get(logger_name)
+		if rate is not None:
+			return rate
+		rates = self.config.sample_rates
+		name = logger_name
+		rate = 1.0
+		while name:
+			if name in rates:
+				rate = rates[name]
+				break
+			name = name.rpartition(".")[0]
+		self._rate_cache[logger_name] = rate
+		return rate
+
+	def allow(self, record: logging.LogRecord, schema: str) -> bool:
+		if record.levelno < logging.ERROR:
+			rate = self.sample_rate(record.name)
+			if rate < 1.0 and random.random() >= rate:
+				self.sampled_out += 1
+				return False
+
+		if self.config.burst <= 0:
+			return True
+
+		now = self._clock()
+		key = (schema, record_fingerprint(record))
+		with self._lock:
+			win = self._windows.get(key)
+			if win is None or (now - win.started) >= self.config.window_s:
+				if win is not None and win.suppressed:
+					# Window rolled over without a sweep; keep counts for the summary.
+					return self._admit_after_rollover(key, win, record, schema, now)
+				if win is None and len(self._windows) >= self.config.max_keys:
+					self._evict(now)
+					if len(self._windows) >= self.config.max_keys:
+						# Bounded memory: untracked fingerprints pass through.
+						return True
+				win = self._new_window(record, schema, now)
+				self._windows[key] = win
+
+			win.seen += 1
+			if win.seen <= self.config.burst:
+				return True
+
+			wall = self._wall_clock()
+			win.suppressed += 1
+			win.first_suppressed = win.first_suppressed or wall
+			win.last_suppressed = wall
+			return False
+
+	def pop_summaries(self) -> list[SuppressedSummary]:
+		"""
+		Return (and forget) closed windows that suppressed records.
+		"""
+		now = self._clock()
+		out: list[SuppressedSummary] = []
+		with self._lock:
+			for key, win in list(self._windows.items()):
+				if (now - win.started) < self.config.window_s:
+					continue
+				del self._windows[key]
+				if win.suppressed:
+					out.append(self._summary(key[1], win))
+			out.extend(self._pending)
+			self._pending = []
+		return out
+
+	def _admit_after_rollover(self, key, win: _Window, record, schema: str, now: float) -> bool:
+		self._pending.append(self._summary(key[1], win))
+		new = self._new_window(record, schema, now)
+		new.seen = 1
+		self._windows[key] = new
+		return True
+
+	def _new_window(self, record: logging.LogRecord, schema: str, now: float) -> _Window:
+		return _Window(
+			started=now,
+			schema=schema,
+			level=record.levelname,
+			logger=record.name,
+			template=str(record.msg)[:500],
+			pathname=record.pathname or "",
+			lineno=record.lineno,
+		)
+
+	def _evict(self, now: float) -> None:
+		for key, win in list(self._windows.items()):
+			if (now - win.started) >= self.config.window_s and not win.suppressed:
+				del self._windows[key]
+
+	def _summary(self, fingerprint: str, win: _Window) -> SuppressedSummary:
+		return SuppressedSummary(
+			fingerprint=fingerprint,
+			schema=win.schema,
+			level=win.level,
+			logger=win.logger,
+			template=win.template,
+			pathname=win.pathname,
+			lineno=win.lineno,
+			suppressed=win.suppressed,
+			window_s=self.config.window_s,
+			first_suppressed=win.first_suppressed or 0.0,
+			last_suppressed=win.last_suppressed or 0.0,
+		)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import re
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+from apps.audits.middleware import get_audit_context
+
+# Keys we emit, in the (sorted) order they appear in the comment.
+TAG_KEYS = ("request_id", "route", "task", "tenant")
+_MAX_VALUE_LEN = 100
+# Anything else becomes "_": no quotes, "*/" or "%" (psycopg placeholders) can reach the SQL.
+_UNSAFE_VALUE_RE = re.compile(r"[^A-Za-z0-9_.:/-]")
+_TAG_COMMENT_RE = re.compile(r"\s*/\*((?:\w+='[^']*',?)+)\*/\s*$")
+_TAG_RE = re.compile(r"(\w+)='([^']*)'")
+
+# Connection housekeeping issued by django-tenants; never tagged.
+_UNTAGGED_PREFIXES = ("SET search_path",)
+
+_sql_tags: ContextVar[dict[str, str] | None] = ContextVar("sql_tags", default=None)
+
+
+def _enabled() -> bool:
+	return bool(getattr(settings, "SQL_COMMENTER_ENABLED", True))
+
+
+def format_sql_comment(tags: dict[str, str]) -> str:
+	"""
+	sqlcommenter-style comment: keys sorted, values sanitised and capped, so the same
+	tags always produce the same text ("/*request_id='..',tenant='acme'*/").
+	"""
+	parts = [
+		f"{key}='{_UNSAFE_VALUE_RE.sub('_', str(value)[:_MAX_VALUE_LEN])}'"
+		for key, value in sorted(tags.items())
+		if value
+	]
+	return f"/*{','.join(parts)}*/" if parts else ""
+
+
+def parse_sql_tags(sql: str) -> dict[str, str]:
+	"""
+	Tags from a trailing comment written by format_sql_comment() ({} if there is none).
+	"""
+	match = _TAG_COMMENT_RE.search(sql or "")
+	if not match:
+		return {}
+	return dict(_TAG_RE.findall(match.group(1)))
+
+
+def strip_sql_comment(sql: str) -> str:
+	return _TAG_COMMENT_RE.sub("", sql or "")
+
+
+def current_sql_tags() -> dict[str, str]:
+	"""
+	Tags for a query issued now: the schema the connection is pointed at, plus the
+	route / Celery task and request id of the current request or task.
+	"""
+	tags = dict(_sql_tags.get() or {})
+	if "request_id" not in tags:
+		ctx = get_audit_context()
+		if ctx is not None and ctx.request_id:
+			tags["request_id"] = ctx.request_id
+	schema = getattr(connection, "schema_name", "") or ""
+	if schema:
+		tags["tenant"] = schema
+	return tags
+
+
+def set_sql_tags(**tags: str):
+	"""
+	Replace the route/task/request_id tags for the current context; returns a reset token.
+	"""
+	return _sql_tags.set({k: v for k, v in tags.items() if v})
+
+
+def reset_sql_tags(token) -> None:
+	_sql_tags.reset(token)
+
+
+def sql_comment_wrapper(execute, sql, params, many, context):
+	"""
+	Connection-level execute wrapper appending the tag comment to every statement.
+	"""
+	if _enabled() and isinstance(sql, str) and not sql.startswith(_UNTAGGED_PREFIXES):
+		comment = format_sql_comment(current_sql_tags())
+		if comment:
+			sql = f"{sql} {comment}"
+	return execute(sql, params, many, context)
+
+
+def install_sql_commenter(sender=None, connection=None, **kwargs) -> None:
+	"""
+	connection_created receiver: make the tagging wrapper the outermost execute wrapper
+	(so per-request wrappers such as DBQueryLogger see the tagged SQL).
+	"""
+	if connection is None or connection.vendor != "postgresql":
+		return
+	if sql_comment_wrapper not in connection.execute_wrappers:
+		connection.execute_wrappers.insert(0, sql_comment_wrapper)
+
+
+class SQLCommenterMiddleware:
+	"""
+	Tags the request's queries with its URL name (resolved in process_view, so
+	middleware queries before that carry only tenant + request_id).
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		token = set_sql_tags()
+		try:
+			return self.get_response(request)
+		finally:
+			reset_sql_tags(token)
+
+	def process_view(self, request, view_func, view_args, view_kwargs):
+		match = getattr(request, "resolver_match", None)
+		route = (getattr(match, "view_name", "") or "") if match else ""
+		if route:
+			_sql_tags.set({**(_sql_tags.get() or {}), "route": route})
+		return None
+
+
+_task_tokens: dict[str, object] = {}
+
+
+def _task_prerun(sender=None, task_id=None, **kwargs) -> None:
+	if task_id:
+		_task_tokens[task_id] = set_sql_tags(task=getattr(sender, "name", "") or "", request_id=task_id)
+
+
+def _task_postrun(sender=None, task_id=None, **kwargs) -> None:
+	token = _task_tokens.pop(task_id, None) if task_id else None
+	if token is not None:
+		try:
+			reset_sql_tags(token)
+		except ValueError:
+			# Reset from a different context (e.g. a thread pool worker): just clear.
+			_sql_tags.set(None)
+
+
+def connect_signals() -> None:
+	from django.db.backends.signals import connection_created
+
+	connection_created.connect(install_sql_commenter, dispatch_uid="hh_sql_commenter")
+	try:
+		from celery.signals import task_postrun, task_prerun
+	except Exception:  # pragma: no cover
+		return
+	task_prerun.connect(_task_prerun, weak=False, dispatch_uid="hh_sql_commenter_task_prerun")
+	task_postrun.connect(_task_postrun, weak=False, dispatch_uid="hh_sql_commenter_task_postrun")
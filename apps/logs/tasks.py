@@ -12,3 +12,35 @@ def purge_audit_events_task(days: int = 90) -> None:
 	"""
 	call_command("purge_audit_events", days=days)
 
+
+
+@shared_task
+def maintain_partitions_task() -> None:
+	"""
+	Daily: pre-create upcoming LogEntry/AuditEvent partitions in every schema.
+	Expired partitions are dropped by `purge_retention_task`.
+	"""
+	call_command("maintain_partitions", all_tenants=True, no_retention=True)
+
+
+@shared_task(ignore_result=True)
+def drain_audit_outbox_task(max_batches: int = 20) -> dict:
+	"""
+	AUDIT_WRITE_MODE="outbox": move queued audit events into AuditEvent in every schema.
+	Safe to run on several workers at once (rows are claimed with SKIP LOCKED).
+	"""
+	from apps.audits.outbox import drain_audit_outbox, outbox_enabled
+
+	if not outbox_enabled():
+		return {}
+	return {schema: n for schema, n in drain_audit_outbox(max_batches=max_batches).items() if n}
+
+
+@shared_task(ignore_result=True)
+def explain_slow_query_task(**kwargs) -> None:
+	"""
+	SLOW_QUERY_EXPLAIN="celery": EXPLAIN a sampled slow query in the tenant's schema.
+	"""
+	from apps.logs.explain import explain_and_store
+
+	explain_and_store(**kwargs)
@@ -1,2 +1,392 @@
+from __future__ import annotations
 
-# Create your tests here.
+import json
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.logs import prometheus
+from apps.logs.explain import analyse_plan, maybe_explain
+from apps.logs.handlers import DatabaseLogHandler
+from apps.logs.models import LogEntry
+from apps.logs.perf import DBQueryLogger, fingerprint_sql
+from apps.logs.profiling import PROFILE_HEADER, RequestProfilerMiddleware, make_profile_token
+from apps.logs.sampling import LogRateLimiter, LogSamplingConfig
+from apps.logs.sqlcomment import (
+	SQLCommenterMiddleware,
+	format_sql_comment,
+	parse_sql_tags,
+	reset_sql_tags,
+	set_sql_tags,
+	strip_sql_comment,
+)
+from apps.logs.timing import ServerTimingMiddleware, TenantTimingMark, ViewTimingMark
+from apps.logs.views import client_log_view, prometheus_metrics_view
+from apps.platform.models import QueryPlan, RequestProfile
+
+
+def _record(msg: str, level: int = logging.WARNING) -> logging.LogRecord:
+	return logging.LogRecord("tests.logs", level, __file__, 1, msg, None, None)
+
+
+class DatabaseLogHandlerAsyncTests(TestCase):
+	def setUp(self):
+		# Long interval: the background thread stays idle, the test drains explicitly.
+		self.handler = DatabaseLogHandler(mode="async", batch_size=100, flush_interval=60, max_queue=2)
+		self.addCleanup(self.handler.close)
+
+	def test_emit_queues_until_flush(self):
+		self.handler.emit(_record("first"))
+		self.handler.emit(_record("second"))
+		self.assertFalse(LogEntry.objects.filter(logger="tests.logs").exists())
+
+		self.handler.flush()
+
+		messages = set(LogEntry.objects.filter(logger="tests.logs").values_list("message", flat=True))
+		self.assertEqual(messages, {"first", "second"})
+		self.assertEqual(self.handler.writer.stats()["written"], 2)
+
+	def test_overflow_is_counted_and_reported(self):
+		for i in range(3):
+			self.handler.emit(_record(f"msg {i}"))
+
+		self.assertEqual(self.handler.writer.dropped, 1)
+		self.handler.flush()
+
+		self.assertEqual(LogEntry.objects.filter(logger="tests.logs").count(), 2)
+		self.assertTrue(LogEntry.objects.filter(logger="logs.handler", extra__dropped=1).exists())
+
+	def test_forked_child_does_not_reuse_a_held_parent_lock(self):
+		writer = self.handler.writer
+		writer.submit("public", LogEntry(logger="tests.logs", message="parent"))
+		# As if forked while the parent held the lock.
+		writer._lock.acquire()
+		writer._pid = -1
+
+		child = threading.Thread(target=writer.submit, args=("public", LogEntry(logger="tests.logs", message="child")))
+		child.start()
+		child.join(2)
+
+		self.assertFalse(child.is_alive())
+		self.assertEqual(writer.stats()["queued"], 1)
+		self.assertFalse(writer._lock.locked())
+		writer.flush()
+		self.assertEqual(list(LogEntry.objects.filter(logger="tests.logs").values_list("message", flat=True)), ["child"])
+
+
+class LogRateLimiterTests(SimpleTestCase):
+	def setUp(self):
+		self.now = 0.0
+		self.limiter = LogRateLimiter(
+			LogSamplingConfig(window_s=60, burst=2, sample_rates={"db.query": 0.0}),
+			clock=lambda: self.now,
+		)
+
+	def test_keeps_burst_then_summarises_window(self):
+		allowed = [self.limiter.allow(_record("boom %s"), "acme") for _ in range(5)]
+		self.assertEqual(allowed, [True, True, False, False, False])
+		self.assertEqual(self.limiter.pop_summaries(), [])
+
+		self.now = 61.0
+		summaries = self.limiter.pop_summaries()
+		self.assertEqual(len(summaries), 1)
+		self.assertEqual(summaries[0].suppressed, 3)
+		self.assertEqual(summaries[0].schema, "acme")
+
+	def test_fingerprints_are_per_schema(self):
+		self.assertTrue(self.limiter.allow(_record("x"), "a"))
+		self.assertTrue(self.limiter.allow(_record("x"), "a"))
+		self.assertTrue(self.limiter.allow(_record("x"), "b"))
+
+	def test_sampling_is_per_logger_prefix_and_spares_errors(self):
+		warning = logging.LogRecord("db.query.slow", logging.WARNING, __file__, 1, "slow", None, None)
+		error = logging.LogRecord("db.query", logging.ERROR, __file__, 1, "failed", None, None)
+		self.assertFalse(self.limiter.allow(warning, "public"))
+		self.assertTrue(self.limiter.allow(error, "public"))
+
+
+@override_settings(CLIENT_LOG_INGEST={"max_events": 3, "max_bytes": 10_000, "per_ip": 2, "per_tenant": 0})
+class ClientLogViewTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.factory = RequestFactory()
+
+	def _post(self, payload):
+		request = self.factory.post("/logs/client/", data=json.dumps(payload), content_type="application/json")
+		return client_log_view(request)
+
+	def test_batch_dedupes_stacks_and_caps_count(self):
+		events = [
+			{"level": "error", "message": "boom", "stack": "at f (ui.js:1)"},
+			{"level": "error", "message": "boom again", "stack": "at f (ui.js:1)"},
+			{"level": "warning", "message": "slow"},
+			{"level": "error", "message": "over the cap"},
+		]
+		resp = self._post(events)
+
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(json.loads(resp.content), {"ok": True, "accepted": 2, "dropped": 1})
+		boom = LogEntry.objects.get(logger="frontend", level="ERROR")
+		self.assertEqual(boom.extra["occurrences"], 2)
+		self.assertTrue(LogEntry.objects.filter(logger="frontend", level="WARNING", message="slow").exists())
+
+	def test_rate_limited_per_ip_before_parsing(self):
+		self.assertEqual(self._post({"message": "a"}).status_code, 200)
+		self.assertEqual(self._post({"message": "b"}).status_code, 200)
+
+		request = self.factory.post("/logs/client/", data="not json", content_type="application/json")
+		resp = client_log_view(request)
+
+		self.assertEqual(resp.status_code, 429)
+		self.assertEqual(resp["Retry-After"], "60")
+
+
+class QueryProfileTests(TestCase):
+	def test_fingerprint_ignores_literals_and_in_list_size(self):
+		a, _ = fingerprint_sql("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x'")
+		b, norm = fingerprint_sql("SELECT *  FROM t WHERE id IN (%s, %s, %s) AND name = 'y' /* c */")
+		self.assertEqual(a, b)
+		self.assertEqual(norm, "SELECT * FROM t WHERE id IN (...) AND name = ?")
+
+	@override_settings(DB_DUPLICATE_QUERY_THRESHOLD=3)
+	def test_repeated_queries_logged_once_per_request(self):
+		with self.assertLogs("db.profile", level="WARNING") as logs:
+			with DBQueryLogger(method="GET", path="/units/", sample_rate=1.0):
+				for i in range(5):
+					list(LogEntry.objects.filter(pk=i))
+				list(LogEntry.objects.all()[:1])
+
+		self.assertEqual(len(logs.records), 1)
+		record = logs.records[0]
+		self.assertEqual(record.query_count, 6)
+		self.assertEqual([d["count"] for d in record.duplicates], [5])
+
+	def test_unsampled_request_is_not_profiled(self):
+		logger = DBQueryLogger(sample_rate=0.0)
+		with logger:
+			list(LogEntry.objects.all()[:1])
+		self.assertIsNone(logger.profile)
+
+
+class ServerTimingTests(SimpleTestCase):
+	def setUp(self):
+		def view(request):
+			return HttpResponse(engines["django"].from_string("{{ x }}").render({"x": 1}))
+
+		self.stack = ServerTimingMiddleware(TenantTimingMark(ViewTimingMark(view)))
+		self.factory = RequestFactory()
+
+	def _metrics(self, response) -> set[str]:
+		return {part.split(";", 1)[0].strip() for part in response["Server-Timing"].split(",")}
+
+	@override_settings(SERVER_TIMING="all")
+	def test_header_lists_phases_view_and_render(self):
+		response = self.stack(self.factory.get("/"))
+		self.assertEqual(self._metrics(response), {"tenant", "middleware", "view", "render", "total"})
+
+	@override_settings(SERVER_TIMING="staff")
+	def test_staff_mode_hides_header_from_anonymous_users(self):
+		self.assertFalse(self.stack(self.factory.get("/")).has_header("Server-Timing"))
+
+	@override_settings(SERVER_TIMING="off")
+	def test_off(self):
+		self.assertFalse(self.stack(self.factory.get("/")).has_header("Server-Timing"))
+
+
+def _busy_view(request):
+	end = time.perf_counter() + 0.05
+	while time.perf_counter() < end:
+		pass
+	return HttpResponse("ok")
+
+
+@override_settings(PROFILE_INTERVAL_MS=1, PROFILE_SLOW_SAMPLE_RATE=0.0)
+class RequestProfilerTests(TestCase):
+	def setUp(self):
+		self.middleware = RequestProfilerMiddleware(_busy_view)
+		self.factory = RequestFactory()
+
+	def test_staff_query_flag_stores_profile(self):
+		request = self.factory.get("/units/", {"_profile": "1"})
+		request.user = SimpleNamespace(is_staff=True)
+		request.audit_request_id = "req-1"
+
+		response = self.middleware(request)
+
+		self.assertEqual(response["X-HH-Profile-Id"], "req-1")
+		profile = RequestProfile.objects.get(request_id="req-1")
+		self.assertGreater(profile.samples, 0)
+		self.assertIn("_busy_view", profile.stacks)
+
+	def test_flag_ignored_for_non_staff_but_signed_header_works(self):
+		request = self.factory.get("/units/", {"_profile": "1"})
+		request.user = SimpleNamespace(is_staff=False)
+		self.assertFalse(self.middleware(request).has_header("X-HH-Profile-Id"))
+
+		request = self.factory.get("/units/", headers={PROFILE_HEADER: make_profile_token()})
+		request.audit_request_id = "req-2"
+		self.middleware(request)
+		self.assertTrue(RequestProfile.objects.filter(request_id="req-2").exists())
+
+
+class PrometheusMetricsTests(SimpleTestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+
+	def test_counters_and_histograms_are_summed_across_process_files(self):
+		for amount in (2, 3):
+			registry = prometheus.MetricsRegistry(directory=self.tmp.name)
+			registry.inc(prometheus.QUOTA_CHECKS, ("max_units", "allowed"), amount)
+			registry.observe(prometheus.HTTP_REQUEST_DURATION, ("web:home", "GET", "2xx"), 0.04)
+			registry.write_snapshot()
+
+		text = prometheus.render_text(prometheus.collect_metrics(self.tmp.name))
+
+		self.assertIn("# TYPE hh_quota_checks_total counter", text)
+		self.assertIn('hh_quota_checks_total{key="max_units",result="allowed"} 5', text)
+		labels = 'route="web:home",method="GET",status="2xx"'
+		self.assertIn(f'hh_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 0', text)
+		self.assertIn(f'hh_http_request_duration_seconds_bucket{{{labels},le="0.05"}} 2', text)
+		self.assertIn(f'hh_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+		self.assertIn(f"hh_http_request_duration_seconds_count{{{labels}}} 2", text)
+
+	def test_stale_files_keep_counters_but_not_gauges(self):
+		registry = prometheus.MetricsRegistry(directory=self.tmp.name)
+		registry.inc(prometheus.AUDIT_EVENTS_WRITTEN, ("success",))
+		registry.write_snapshot()
+
+		values = prometheus.collect_metrics(self.tmp.name, live_after_s=30, now=time.time() + 60)
+
+		self.assertEqual(values.counters[(prometheus.AUDIT_EVENTS_WRITTEN.name, ("success",))], 1)
+		self.assertFalse(values.gauges)
+		prometheus.collect_metrics(self.tmp.name, ttl_s=30, now=time.time() + 60)
+		self.assertFalse(list(Path(self.tmp.name).glob("*.json")))
+
+	def test_endpoint_requires_allowed_ip_or_token(self):
+		factory = RequestFactory()
+		with override_settings(METRICS_MULTIPROC_DIR=self.tmp.name, METRICS_TOKEN="s3cret", METRICS_ALLOWED_IPS=["127.0.0.1"]):
+			prometheus._registry = None
+			self.addCleanup(setattr, prometheus, "_registry", None)
+
+			self.assertEqual(prometheus_metrics_view(factory.get("/metrics", REMOTE_ADDR="10.0.0.5")).status_code, 403)
+			proxied = factory.get("/metrics", REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.9")
+			self.assertEqual(prometheus_metrics_view(proxied).status_code, 403)
+
+			response = prometheus_metrics_view(
+				factory.get("/metrics", REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION="Bearer s3cret")
+			)
+			self.assertEqual(response.status_code, 200)
+			self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+			self.assertIn("hh_disk_total_bytes", response.content.decode())
+			self.assertEqual(prometheus_metrics_view(factory.get("/metrics", REMOTE_ADDR="127.0.0.1")).status_code, 200)
+
+
+class SlowQueryExplainTests(TestCase):
+	sql = 'SELECT * FROM "platform_requestprofile" WHERE "path" = %s'
+
+	def setUp(self):
+		cache.clear()
+
+	def test_analyse_plan_flags_selective_scan_on_large_table(self):
+		plan = {
+			"Plan": {
+				"Node Type": "Hash Join",
+				"Plans": [
+					{"Node Type": "Seq Scan", "Relation Name": "leases_lease", "Plan Rows": 3, "Filter": "((status)::text = 'open'::text)"},
+					{"Node Type": "Seq Scan", "Relation Name": "properties_unit", "Plan Rows": 40},
+				],
+			}
+		}
+		with override_settings(QUERY_PLAN_LARGE_TABLE_ROWS=1000):
+			scans = analyse_plan(plan, {"leases_lease": 50_000, "properties_unit": 40})
+
+		self.assertEqual([s["relation"] for s in scans], ["leases_lease", "properties_unit"])
+		self.assertTrue(scans[0]["index_candidate"])
+		self.assertEqual(scans[0]["columns"], ["status"])
+		self.assertFalse(scans[1]["large"])
+
+	@override_settings(SLOW_QUERY_EXPLAIN="thread", SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1.0)
+	def test_slow_select_is_explained_once_per_fingerprint(self):
+		connection.ensure_connection()
+		kwargs = {"many": False, "raw_connection": connection.connection, "fingerprint": "abc123", "normalized": "SELECT ...", "duration_ms": 900}
+		with mock.patch("apps.logs.explain._submit", side_effect=lambda fn, **kw: fn(**kw) is not None) as submit:
+			self.assertTrue(maybe_explain(self.sql, ["/units/"], **kwargs))
+			self.assertFalse(maybe_explain(self.sql, ["/units/"], **kwargs))
+			self.assertFalse(maybe_explain("UPDATE platform_routelatency SET count = 0", None, **{**kwargs, "fingerprint": "upd"}))
+
+		self.assertEqual(submit.call_count, 1)
+		self.assertIn("'/units/'", submit.call_args.kwargs["sql"])
+		plan = QueryPlan.objects.get(fingerprint="abc123")
+		self.assertEqual(plan.tenant_schema, "public")
+		self.assertEqual(plan.seq_scans[0]["relation"], "platform_requestprofile")
+		self.assertEqual(plan.seq_scans[0]["columns"], ["path"])
+		self.assertEqual(plan.plan["Plan"]["Node Type"], "Seq Scan")
+
+	def test_off_by_default(self):
+		connection.ensure_connection()
+		self.assertFalse(
+			maybe_explain(self.sql, ["/units/"], many=False, raw_connection=connection.connection, fingerprint="x", normalized="", duration_ms=1)
+		)
+
+
+class SQLCommenterTests(TestCase):
+	def _capture(self, fn):
+		seen: list[str] = []
+
+		def spy(execute, sql, params, many, context):
+			seen.append(sql)
+			return execute(sql, params, many, context)
+
+		with connection.execute_wrapper(spy):
+			fn()
+		return seen
+
+	def test_comment_round_trip_is_stable_and_safe(self):
+		tags = {"tenant": "acme", "route": "properties:unit_list", "request_id": "ab12", "task": ""}
+		comment = format_sql_comment(tags)
+		self.assertEqual(comment, "/*request_id='ab12',route='properties:unit_list',tenant='acme'*/")
+		self.assertEqual(parse_sql_tags(f"SELECT 1 {comment}"), {k: v for k, v in tags.items() if v})
+		self.assertEqual(strip_sql_comment(f"SELECT 1 {comment}"), "SELECT 1")
+		# No quotes, comment terminators or psycopg placeholders from tag values.
+		self.assertEqual(format_sql_comment({"route": "x'*/%s"}), "/*route='x__/_s'*/")
+
+	def test_queries_carry_request_tags(self):
+		def run():
+			token = set_sql_tags(route="platform:db", request_id="req-1")
+			try:
+				with connection.cursor() as cur:
+					cur.execute("SELECT %s", [1])
+			finally:
+				reset_sql_tags(token)
+
+		sql = self._capture(run)[-1]
+		self.assertEqual(parse_sql_tags(sql), {"request_id": "req-1", "route": "platform:db", "tenant": "public"})
+
+	def test_middleware_tags_route_and_search_path_untouched(self):
+		request = RequestFactory().get("/")
+		request.resolver_match = SimpleNamespace(view_name="platform:db")
+
+		def view(req):
+			mw.process_view(req, None, (), {})
+			with connection.cursor() as cur:
+				cur.execute("SET search_path = public")
+				cur.execute("SELECT 1")
+			return HttpResponse("ok")
+
+		mw = SQLCommenterMiddleware(view)
+		seen = self._capture(lambda: mw(request))
+
+		self.assertTrue(all(not parse_sql_tags(sql) for sql in seen if sql.startswith("SET search_path")))
+		self.assertEqual(parse_sql_tags(seen[-1])["route"], "platform:db")
+		self.assertEqual(self._capture(lambda: connection.cursor().execute("SELECT 1"))[-1], "SELECT 1 /*tenant='public'*/")
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+# Query param a staff user can use to switch the header on/off for their session.
+TOGGLE_PARAM = "server_timing"
+SESSION_KEY = "server_timing"
+
+
+class ServerTiming:
+	"""
+	Named durations (ms) collected for one request, rendered as a Server-Timing header.
+
+	Middleware phases are measured by mark middlewares placed between the real ones:
+	a phase owns the time between the previous mark and its own mark on the way in,
+	and between its own mark and the previous mark on the way out.
+	"""
+
+	def __init__(self):
+		self.start = time.perf_counter()
+		self.metrics: dict[str, float] = {}
+		self.descriptions: dict[str, str] = {}
+		self._last_in = self.start
+		self._last_out: float | None = None
+		self._pending_out: str | None = None
+		self._render_depth = 0
+
+	def add(self, name: str, duration_ms: float, desc: str = "") -> None:
+		self.metrics[name] = self.metrics.get(name, 0.0) + duration_ms
+		if desc:
+			self.descriptions[name] = desc
+
+	def enter(self, phase: str) -> float:
+		now = time.perf_counter()
+		self.add(phase, (now - self._last_in) * 1000)
+		self._last_in = now
+		return now
+
+	def leave(self, phase: str) -> float:
+		now = time.perf_counter()
+		self.finish_pending(now)
+		self._pending_out = phase
+		self._last_out = now
+		return now
+
+	def finish_pending(self, now: float | None = None) -> None:
+		if self._pending_out is None or self._last_out is None:
+			return
+		now = now or time.perf_counter()
+		self.add(self._pending_out, (now - self._last_out) * 1000)
+		self._pending_out = None
+
+	def header_value(self) -> str:
+		parts = []
+		for name, dur in self.metrics.items():
+			part = f"{name};dur={dur:.1f}"
+			desc = self.descriptions.get(name)
+			if desc:
+				part += f';desc="{desc}"'
+			parts.append(part)
+		return ", ".join(parts)
+
+
+_timing: ContextVar[ServerTiming | None] = ContextVar("server_timing", default=None)
+
+
+def current_timing() -> ServerTiming | None:
+	return _timing.get()
+
+
+def _mode() -> str:
+	value = (getattr(settings, "SERVER_TIMING", "staff") or "off").strip().lower()
+	return value if value in {"off", "staff", "all"} else "off"
+
+
+def _header_enabled(request) -> bool:
+	mode = _mode()
+	if mode == "all":
+		return True
+	if mode != "staff":
+		return False
+	user = getattr(request, "user", None)
+	if not getattr(user, "is_staff", False):
+		return False
+	session = getattr(request, "session", None)
+	return True if session is None else bool(session.get(SESSION_KEY, True))
+
+
+def _apply_staff_toggle(request) -> None:
+	toggle = (request.GET.get(TOGGLE_PARAM) or "").strip().lower()
+	session = getattr(request, "session", None)
+	if not toggle or session is None or not getattr(getattr(request, "user", None), "is_staff", False):
+		return
+	if toggle in {"0", "off"}:
+		session[SESSION_KEY] = False
+	elif toggle in {"1", "on"}:
+		session[SESSION_KEY] = True
+
+
+class ServerTimingMiddleware:
+	"""
+	Adds a Server-Timing header: total, db (time + query count), one entry per
+	middleware phase (see *TimingMark below), view and template render.
+
+	SERVER_TIMING: "off" | "staff" (staff users; ?server_timing=off|on per session) | "all".
+	Place it first so `total` and `request._perf_start` cover the whole stack.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		if _mode() == "off":
+			return self.get_response(request)
+
+		timing = ServerTiming()
+		request._perf_start = timing.start
+		request._server_timing = timing
+		token = _timing.set(timing)
+		try:
+			response = self.get_response(request)
+		finally:
+			_timing.reset(token)
+
+		timing.finish_pending()
+		if not _header_enabled(request):
+			return response
+
+		logger = getattr(request, "_db_query_logger", None)
+		if logger is not None:
+			timing.add("db", logger.db_ms, desc=f"{logger.query_count} queries")
+		timing.add("total", (time.perf_counter() - timing.start) * 1000)
+		response["Server-Timing"] = timing.header_value()
+		return response
+
+
+class _TimingMark:
+	"""
+	Marks the end of a middleware phase. `phase` owns the middlewares placed between
+	the previous mark (or ServerTimingMiddleware) and this one.
+	"""
+
+	phase = ""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		timing = getattr(request, "_server_timing", None)
+		if timing is None:
+			return self.get_response(request)
+		timing.enter(self.phase)
+		response = self.get_response(request)
+		timing.leave(self.phase)
+		return response
+
+
+class TenantTimingMark(_TimingMark):
+	phase = "tenant"
+
+
+class ContextTimingMark(_TimingMark):
+	phase = "context"
+
+
+class AuthTimingMark(_TimingMark):
+	"""
+	Also applies a staff user's ?server_timing=on|off (the session is still writable here).
+	"""
+
+	phase = "auth"
+
+	def __call__(self, request):
+		if getattr(request, "_server_timing", None) is not None and _mode() == "staff":
+			_apply_staff_toggle(request)
+		return super().__call__(request)
+
+
+class ViewTimingMark(_TimingMark):
+	"""
+	Last middleware: its phase covers the remaining middlewares; everything inside
+	is the view (minus template rendering, reported as `render`).
+	"""
+
+	phase = "middleware"
+
+	def __call__(self, request):
+		timing = getattr(request, "_server_timing", None)
+		if timing is None:
+			return self.get_response(request)
+		start = timing.enter(self.phase)
+		render_before = timing.metrics.get("render", 0.0)
+		response = self.get_response(request)
+		end = timing.leave(self.phase)
+		render = timing.metrics.get("render", 0.0) - render_before
+		timing.add("view", max((end - start) * 1000 - render, 0.0))
+		return response
+
+
+class _TimedTemplate(DjangoTemplate):
+	def render(self, context=None, request=None):
+		timing = current_timing()
+		if timing is None:
+			return super().render(context, request)
+		timing._render_depth += 1
+		start = time.perf_counter()
+		try:
+			return super().render(context, request)
+		finally:
+			timing._render_depth -= 1
+			if timing._render_depth == 0:
+				timing.add("render", (time.perf_counter() - start) * 1000)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+	"""
+	DjangoTemplates backend that reports top-level render time to Server-Timing.
+	"""
+
+	def from_string(self, template_code):
+		return _TimedTemplate(super().from_string(template_code).template, self)
+
+	def get_template(self, template_name):
+		return _TimedTemplate(super().get_template(template_name).template, self)
@@ -1,67 +1,86 @@
 from __future__ import annotations
 
 import json
-from typing import Any
 
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
 
 from apps.audits.middleware import get_audit_context
-from apps.audits.utils import to_jsonable
+from apps.logs.ingest import ClientLogLimits, build_client_entries, hit_rate_limit, normalize_events
 from apps.logs.models import LogEntry
+from apps.logs.prometheus import CONTENT_TYPE, metrics_access_allowed, record_log_writes, render_metrics
+
+
+def _too_many(window_s: int) -> HttpResponse:
+	resp = JsonResponse({"ok": False, "error": "rate_limited"}, status=429)
+	resp["Retry-After"] = str(window_s)
+	return resp
 
 
 @csrf_exempt
 def client_log_view(request: HttpRequest) -> HttpResponse:
 	"""
 	Frontend/browser logging endpoint.
-	Accepts JSON: { level, message, ... } and writes a LogEntry.
+	Accepts JSON: one event { level, message, ... }, an array of events, or { events: [...] }.
 
-	Note: CSRF-exempt so it can capture errors pre-login. Keep payload small.
+	- per-IP / per-tenant request limits return 429 before the body is read
+	- batches are capped by bytes (413) and by count (extra events are dropped)
+	- identical stack traces in a batch are stored once with extra.occurrences
+	- the batch is written with a single bulk_create
+
+	Note: CSRF-exempt so it can capture errors pre-login (and navigator.sendBeacon can post).
 	"""
 	if request.method != "POST":
 		return HttpResponse(status=405)
 
+	limits = ClientLogLimits.from_settings()
+	ctx = get_audit_context()
+	ip = (ctx.ip_address if ctx else None) or request.META.get("REMOTE_ADDR", "")
+	tenant = getattr(request, "tenant", None)
+	schema = getattr(tenant, "schema_name", "") or (ctx.tenant_schema if ctx else "")
+	if hit_rate_limit("ip", ip, limits.per_ip, limits.window_s):
+		return _too_many(limits.window_s)
+	if hit_rate_limit("tenant", schema, limits.per_tenant, limits.window_s):
+		return _too_many(limits.window_s)
+
+	try:
+		declared = int(request.META.get("CONTENT_LENGTH") or 0)
+	except ValueError:
+		declared = 0
+	if declared > limits.max_bytes:
+		return JsonResponse({"ok": False, "error": "payload_too_large"}, status=413)
+
 	try:
 		body = request.body.decode("utf-8") if request.body else ""
 		# hard cap to avoid abuse
-		if len(body) > 50_000:
+		if len(body) > limits.max_bytes:
 			return JsonResponse({"ok": False, "error": "payload_too_large"}, status=413)
-		data: dict[str, Any] = json.loads(body or "{}")
+		events = normalize_events(json.loads(body or "{}"))
 	except Exception:
 		return JsonResponse({"ok": False, "error": "invalid_json"}, status=400)
 
-	level = str(data.get("level") or "ERROR").upper()[:10]
-	if level not in {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}:
-		level = "ERROR"
-
-	message = str(data.get("message") or "")[:5000]
-	if not message:
+	dropped = max(len(events) - limits.max_events, 0)
+	entries = build_client_entries(events[: limits.max_events], ctx)
+	if not entries:
 		return JsonResponse({"ok": False, "error": "missing_message"}, status=400)
 
-	ctx = get_audit_context()
-	extra = to_jsonable({k: v for k, v in data.items() if k not in {"level", "message"}})
-
-	LogEntry.objects.create(
-		level=level,
-		logger="frontend",
-		message=message,
-		pathname="",
-		lineno=None,
-		func_name="",
-		module="",
-		process=None,
-		thread=None,
-		exc_text=str(data.get("stack") or "")[:10000],
-		request_id=(ctx.request_id if ctx else ""),
-		tenant_schema=(ctx.tenant_schema if ctx else ""),
-		request_method=(ctx.request_method if ctx else ""),
-		request_path=(ctx.request_path if ctx else ""),
-		actor_user_id=(ctx.actor_user_id if ctx else ""),
-		actor_email=(ctx.actor_email if ctx else ""),
-		ip_address=(ctx.ip_address if ctx else None),
-		user_agent=(ctx.user_agent if ctx else ""),
-		extra=extra,
-	)
-
-	return JsonResponse({"ok": True})
+	LogEntry.objects.bulk_create(entries)
+	record_log_writes(e.level for e in entries)
+
+	return JsonResponse({"ok": True, "accepted": len(entries), "dropped": dropped})
+
+
+@never_cache
+def prometheus_metrics_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Prometheus scrape target (/metrics): request latency, DB, log/audit, Celery and
+	quota metrics summed across every worker, plus host system gauges.
+	Access: METRICS_TOKEN bearer token or a direct connection from METRICS_ALLOWED_IPS.
+	"""
+	if not getattr(settings, "METRICS_ENABLED", True):
+		raise Http404
+	if not metrics_access_allowed(request):
+		return HttpResponse("Forbidden", status=403, content_type="text/plain")
+	return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
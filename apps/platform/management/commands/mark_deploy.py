@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.platform.models import SnapshotKind
+from apps.platform.statements import take_statement_snapshot
+
+
+class Command(BaseCommand):
+	help = (
+		"Record a deploy marker: a pg_stat_statements snapshot labelled with the release, "
+		"so Platform -> DB -> Snapshots can compare before/after the deploy."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("label", help="Release name / git sha.")
+
+	def handle(self, *args, **opts):
+		try:
+			snapshot = take_statement_snapshot(label=opts["label"], kind=SnapshotKind.DEPLOY)
+		except Exception as e:
+			raise CommandError(f"pg_stat_statements snapshot failed: {type(e).__name__}: {e}") from e
+		self.stdout.write(f"deploy marker {snapshot.label!r} at {snapshot.taken_at:%Y-%m-%d %H:%M:%S} ({snapshot.statements} statements)")
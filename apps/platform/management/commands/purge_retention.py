@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.platform.retention import RETENTION_POLICIES, run_retention
+
+
+class Command(BaseCommand):
+	help = (
+		"Apply retention policies (audits, logs, activity) across public + tenant schemas "
+		"in bounded batches. Re-running with the same --run-key resumes."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("--model", action="append", dest="models", help="Only this model label (repeatable).")
+		parser.add_argument("--schema", action="append", dest="schemas", help="Only this schema (repeatable).")
+		parser.add_argument("--run-key", default="", help="Checkpoint key (default: today's UTC date).")
+		parser.add_argument("--workers", type=int, default=None, help="Schemas processed concurrently.")
+		parser.add_argument("--batch-size", type=int, default=None, help="Rows deleted per transaction.")
+		parser.add_argument("--batch-sleep-ms", type=int, default=None, help="Pause between batches.")
+
+	def handle(self, *args, **opts):
+		unknown = set(opts["models"] or []) - set(RETENTION_POLICIES)
+		if unknown:
+			raise CommandError(f"No retention policy for: {', '.join(sorted(unknown))}")
+
+		report = run_retention(
+			schemas=opts["schemas"],
+			model_labels=opts["models"],
+			run_key=opts["run_key"],
+			progress=self.stdout.write if int(opts["verbosity"]) > 1 else None,
+			workers=opts["workers"],
+			batch_size=opts["batch_size"],
+			batch_sleep_s=None if opts["batch_sleep_ms"] is None else opts["batch_sleep_ms"] / 1000.0,
+		)
+
+		for r in sorted(report.results, key=lambda r: (r.schema_name, r.model_label)):
+			if r.error:
+				self.stderr.write(f"{r.schema_name}: {r.model_label} FAILED: {r.error}")
+				continue
+			state = "already done" if r.skipped else "ok"
+			self.stdout.write(
+				f"{r.schema_name}: {r.model_label} deleted={r.rows_deleted} "
+				f"partitions_dropped={r.partitions_dropped} bytes={r.bytes_reclaimed} ({state})"
+			)
+		self.stdout.write(
+			f"run {report.run_key}: deleted {report.rows_deleted} rows, reclaimed {report.bytes_reclaimed} bytes, "
+			f"{len(report.failed)} failed."
+		)
+		if report.failed:
+			raise CommandError("Retention finished with failures; re-run with the same --run-key to resume.")
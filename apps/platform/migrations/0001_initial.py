@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_key', models.CharField(db_index=True, max_length=64)),
+                ('schema_name', models.CharField(max_length=63)),
+                ('model_label', models.CharField(max_length=100)),
+                ('cutoff', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=16)),
+                ('rows_deleted', models.BigIntegerField(default=0)),
+                ('partitions_dropped', models.IntegerField(default=0)),
+                ('bytes_reclaimed', models.BigIntegerField(default=0)),
+                ('batches', models.IntegerField(default=0)),
+                ('retries', models.IntegerField(default=0)),
+                ('last_id', models.BigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('run_key', 'schema_name', 'model_label'), name='platform_retention_unique_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:55
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteLatency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(db_index=True)),
+                ('route', models.CharField(max_length=200)),
+                ('method', models.CharField(max_length=10)),
+                ('status_class', models.CharField(max_length=3)),
+                ('tenant_schema', models.CharField(blank=True, max_length=63)),
+                ('count', models.BigIntegerField(default=0)),
+                ('sum_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('buckets', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'indexes': [models.Index(fields=['route', 'period_start'], name='platform_ro_route_6e1f0b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period_start', 'route', 'method', 'status_class', 'tenant_schema'), name='platform_route_latency_unique_key')],
+            },
+        ),
+    ]
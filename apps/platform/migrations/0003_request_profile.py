@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform', '0002_route_latency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(db_index=True, max_length=64)),
+                ('trigger', models.CharField(choices=[('manual', 'Manual'), ('slow', 'Slow request')], max_length=16)),
+                ('tenant_schema', models.CharField(blank=True, db_index=True, max_length=63)),
+                ('method', models.CharField(blank=True, max_length=10)),
+                ('path', models.CharField(blank=True, max_length=300)),
+                ('route', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.IntegerField(default=0)),
+                ('duration_ms', models.IntegerField(default=0)),
+                ('samples', models.IntegerField(default=0)),
+                ('interval_ms', models.IntegerField(default=0)),
+                ('stacks', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
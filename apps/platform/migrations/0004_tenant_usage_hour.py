@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform', '0003_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantUsageHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant_schema', models.CharField(max_length=63)),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('requests', models.BigIntegerField(default=0)),
+                ('wall_ms', models.FloatField(default=0)),
+                ('db_ms', models.FloatField(default=0)),
+                ('queries', models.BigIntegerField(default=0)),
+                ('bytes_out', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-hour', 'tenant_schema'],
+                'constraints': [models.UniqueConstraint(fields=('tenant_schema', 'hour'), name='platform_tenant_usage_unique_hour')],
+            },
+        ),
+    ]
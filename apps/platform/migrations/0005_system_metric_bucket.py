@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform', '0004_tenant_usage_hour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemMetricBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=100)),
+                ('pid', models.IntegerField()),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('slot', models.IntegerField()),
+                ('metric', models.CharField(max_length=32)),
+                ('bucket_start', models.DateTimeField()),
+                ('min_value', models.FloatField(default=0)),
+                ('max_value', models.FloatField(default=0)),
+                ('sum_value', models.FloatField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['resolution', 'metric', 'bucket_start'], name='platform_sysmetric_series_idx')],
+                'constraints': [models.UniqueConstraint(fields=('host', 'pid', 'resolution', 'slot', 'metric'), name='platform_system_metric_ring_slot')],
+            },
+        ),
+    ]
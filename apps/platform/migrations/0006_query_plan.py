@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform', '0005_system_metric_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=16)),
+                ('tenant_schema', models.CharField(max_length=63)),
+                ('sql', models.TextField(blank=True)),
+                ('plan', models.JSONField(default=dict)),
+                ('total_cost', models.FloatField(default=0)),
+                ('seq_scans', models.JSONField(default=list)),
+                ('has_large_seq_scan', models.BooleanField(default=False)),
+                ('has_index_candidate', models.BooleanField(default=False)),
+                ('duration_ms', models.IntegerField(default=0)),
+                ('request_id', models.CharField(blank=True, max_length=64)),
+                ('samples', models.IntegerField(default=1)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'constraints': [models.UniqueConstraint(fields=('fingerprint', 'tenant_schema'), name='platform_query_plan_unique_fingerprint')],
+            },
+        ),
+    ]
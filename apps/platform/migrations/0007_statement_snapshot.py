@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform', '0006_query_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('kind', models.CharField(choices=[('periodic', 'Periodic'), ('deploy', 'Deploy marker')], db_index=True, default='periodic', max_length=16)),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('stats_reset', models.DateTimeField(blank=True, null=True)),
+                ('statements', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatementStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('queryid', models.BigIntegerField()),
+                ('query', models.TextField(blank=True)),
+                ('calls', models.BigIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('rows', models.BigIntegerField(default=0)),
+                ('shared_blks_hit', models.BigIntegerField(default=0)),
+                ('shared_blks_read', models.BigIntegerField(default=0)),
+                ('temp_blks_written', models.BigIntegerField(default=0)),
+                ('snapshot', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='platform.statementsnapshot')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('snapshot', 'queryid'), name='platform_statement_stat_unique_query')],
+            },
+        ),
+    ]
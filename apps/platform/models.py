@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.utils import timezone
+
+
+class RetentionStatus(models.TextChoices):
+	PENDING = "pending", "Pending"
+	RUNNING = "running", "Running"
+	DONE = "done", "Done"
+	FAILED = "failed", "Failed"
+
+
+class RetentionCheckpoint(models.Model):
+	"""
+	Progress of one retention run for one (schema, model) pair (PUBLIC schema).
+
+	`run_key` identifies a run (default: the UTC date), so re-running the same
+	run resumes: finished pairs are skipped and the cutoff stays fixed.
+	"""
+
+	run_key = models.CharField(max_length=64, db_index=True)
+	schema_name = models.CharField(max_length=63)
+	model_label = models.CharField(max_length=100)
+	cutoff = models.DateTimeField()
+
+	status = models.CharField(max_length=16, choices=RetentionStatus.choices, default=RetentionStatus.PENDING, db_index=True)
+	rows_deleted = models.BigIntegerField(default=0)
+	partitions_dropped = models.IntegerField(default=0)
+	bytes_reclaimed = models.BigIntegerField(default=0)
+	batches = models.IntegerField(default=0)
+	retries = models.IntegerField(default=0)
+	last_id = models.BigIntegerField(null=True, blank=True)
+	error = models.TextField(blank=True)
+
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+	created_at = models.DateTimeField(default=timezone.now, db_index=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ["-created_at"]
+		constraints = [
+			models.UniqueConstraint(fields=["run_key", "schema_name", "model_label"], name="platform_retention_unique_pair"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.run_key} {self.schema_name} {self.model_label} ({self.status})"
+
+
+class RouteLatency(models.Model):
+	"""
+	Request latency histogram for one route/method/status class/tenant per period (PUBLIC schema).
+
+	Rows are upserted by every web worker (apps.logs.latency), so one row holds the
+	merged counts of all workers for that period. `buckets[i]` counts requests with
+	duration <= LATENCY_BUCKETS_MS[i]; the last bucket is the overflow.
+	"""
+
+	period_start = models.DateTimeField(db_index=True)
+	route = models.CharField(max_length=200)
+	method = models.CharField(max_length=10)
+	status_class = models.CharField(max_length=3)
+	tenant_schema = models.CharField(max_length=63, blank=True)
+
+	count = models.BigIntegerField(default=0)
+	sum_ms = models.FloatField(default=0)
+	max_ms = models.FloatField(default=0)
+	buckets = ArrayField(models.BigIntegerField(), default=list)
+
+	class Meta:
+		ordering = ["-period_start"]
+		constraints = [
+			models.UniqueConstraint(
+				fields=["period_start", "route", "method", "status_class", "tenant_schema"],
+				name="platform_route_latency_unique_key",
+			),
+		]
+		indexes = [
+			models.Index(fields=["route", "period_start"], name="platform_ro_route_6e1f0b_idx"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.period_start:%Y-%m-%d %H:%M} {self.method} {self.route} {self.status_class} n={self.count}"
+
+
+class ProfileTrigger(models.TextChoices):
+	MANUAL = "manual", "Manual"
+	SLOW = "slow", "Slow request"
+
+
+class RequestProfile(models.Model):
+	"""
+	Sampled stack profile of one request (PUBLIC schema, all tenants).
+
+	`stacks` is in folded format ("frame;frame;leaf count" per line), which
+	flamegraph.pl / speedscope read directly.
+	"""
+
+	request_id = models.CharField(max_length=64, db_index=True)
+	trigger = models.CharField(max_length=16, choices=ProfileTrigger.choices)
+	tenant_schema = models.CharField(max_length=63, blank=True, db_index=True)
+	method = models.CharField(max_length=10, blank=True)
+	path = models.CharField(max_length=300, blank=True)
+	route = models.CharField(max_length=200, blank=True)
+	status_code = models.IntegerField(default=0)
+	duration_ms = models.IntegerField(default=0)
+	samples = models.IntegerField(default=0)
+	interval_ms = models.IntegerField(default=0)
+	stacks = models.TextField(blank=True)
+	created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+	class Meta:
+		ordering = ["-created_at"]
+
+	def __str__(self) -> str:
+		return f"{self.method} {self.path} {self.duration_ms}ms ({self.request_id})"
+
+
+class TenantUsageHour(models.Model):
+	"""
+	Resource use per tenant per hour (PUBLIC schema), summed across web workers
+	by apps.logs.accounting. `tenant_schema` is "public" for control-plane traffic.
+	"""
+
+	tenant_schema = models.CharField(max_length=63)
+	hour = models.DateTimeField(db_index=True)
+
+	requests = models.BigIntegerField(default=0)
+	wall_ms = models.FloatField(default=0)
+	db_ms = models.FloatField(default=0)
+	queries = models.BigIntegerField(default=0)
+	bytes_out = models.BigIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ["-hour", "tenant_schema"]
+		constraints = [
+			models.UniqueConstraint(fields=["tenant_schema", "hour"], name="platform_tenant_usage_unique_hour"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.tenant_schema} {self.hour:%Y-%m-%d %H:00} requests={self.requests}"
+
+
+class MetricResolution(models.TextChoices):
+	MINUTE = "1m", "1 minute"
+	HOUR = "1h", "1 hour"
+	DAY = "1d", "1 day"
+
+
+class SystemMetricBucket(models.Model):
+	"""
+	Downsampled system metric (min/max/sum/count) for one host + pid per 1m/1h/1d bucket
+	(PUBLIC schema), written by apps.logs.metrics_history.
+
+	Stored as a fixed-size ring: `slot` is the bucket number modulo the resolution's
+	slot count, so a series keeps at most RESOLUTIONS[res][1] buckets and old buckets
+	are overwritten in place. pid 0 holds host-wide metrics (load, memory, disk).
+	"""
+
+	host = models.CharField(max_length=100)
+	pid = models.IntegerField()
+	resolution = models.CharField(max_length=2, choices=MetricResolution.choices)
+	slot = models.IntegerField()
+	metric = models.CharField(max_length=32)
+	bucket_start = models.DateTimeField()
+
+	min_value = models.FloatField(default=0)
+	max_value = models.FloatField(default=0)
+	sum_value = models.FloatField(default=0)
+	count = models.IntegerField(default=0)
+
+	class Meta:
+		ordering = ["bucket_start"]
+		constraints = [
+			models.UniqueConstraint(
+				fields=["host", "pid", "resolution", "slot", "metric"], name="platform_system_metric_ring_slot"
+			),
+		]
+		indexes = [
+			models.Index(fields=["resolution", "metric", "bucket_start"], name="platform_sysmetric_series_idx"),
+		]
+
+	@property
+	def avg_value(self) -> float | None:
+		return self.sum_value / self.count if self.count else None
+
+	def __str__(self) -> str:
+		return f"{self.host}:{self.pid} {self.metric} {self.resolution} {self.bucket_start:%Y-%m-%d %H:%M}"
+
+
+class QueryPlan(models.Model):
+	"""
+	EXPLAIN (FORMAT JSON) of a sampled slow SELECT, one row per query fingerprint and
+	tenant schema (PUBLIC schema), refreshed at most every SLOW_QUERY_EXPLAIN_TTL_S.
+
+	`fingerprint` matches the "Slow DB query" log entry's extra["fingerprint"];
+	`seq_scans` is apps.logs.explain.analyse_plan() output.
+	"""
+
+	fingerprint = models.CharField(max_length=16)
+	tenant_schema = models.CharField(max_length=63)
+	sql = models.TextField(blank=True)
+	plan = models.JSONField(default=dict)
+	total_cost = models.FloatField(default=0)
+	seq_scans = models.JSONField(default=list)
+	has_large_seq_scan = models.BooleanField(default=False)
+	has_index_candidate = models.BooleanField(default=False)
+	duration_ms = models.IntegerField(default=0)
+	request_id = models.CharField(max_length=64, blank=True)
+	samples = models.IntegerField(default=1)
+	created_at = models.DateTimeField(default=timezone.now, db_index=True)
+	updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+	class Meta:
+		ordering = ["-updated_at"]
+		constraints = [
+			models.UniqueConstraint(fields=["fingerprint", "tenant_schema"], name="platform_query_plan_unique_fingerprint"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.tenant_schema} {self.fingerprint} cost={self.total_cost:.0f}"
+
+
+class SnapshotKind(models.TextChoices):
+	PERIODIC = "periodic", "Periodic"
+	DEPLOY = "deploy", "Deploy marker"
+
+
+class StatementSnapshot(models.Model):
+	"""
+	One capture of pg_stat_statements for this database (PUBLIC schema), taken by
+	the periodic task or `mark_deploy`. Counters are cumulative since `stats_reset`;
+	apps.platform.statements diffs two snapshots into per-interval deltas.
+	"""
+
+	taken_at = models.DateTimeField(default=timezone.now, db_index=True)
+	kind = models.CharField(max_length=16, choices=SnapshotKind.choices, default=SnapshotKind.PERIODIC, db_index=True)
+	label = models.CharField(max_length=200, blank=True)
+	stats_reset = models.DateTimeField(null=True, blank=True)
+	statements = models.IntegerField(default=0)
+
+	class Meta:
+		ordering = ["-taken_at"]
+
+	def __str__(self) -> str:
+		name = self.label or self.get_kind_display()
+		return f"{self.taken_at:%Y-%m-%d %H:%M} {name}"
+
+
+class StatementStat(models.Model):
+	"""
+	Cumulative pg_stat_statements counters of one queryid in one StatementSnapshot.
+
+	No database FK constraint: retention deletes these and their snapshots in
+	independent batches (both by `taken_at`).
+	"""
+
+	snapshot = models.ForeignKey(StatementSnapshot, on_delete=models.CASCADE, related_name="stats", db_constraint=False)
+	taken_at = models.DateTimeField(db_index=True)
+	queryid = models.BigIntegerField()
+	query = models.TextField(blank=True)
+
+	calls = models.BigIntegerField(default=0)
+	total_ms = models.FloatField(default=0)
+	rows = models.BigIntegerField(default=0)
+	shared_blks_hit = models.BigIntegerField(default=0)
+	shared_blks_read = models.BigIntegerField(default=0)
+	temp_blks_written = models.BigIntegerField(default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["snapshot", "queryid"], name="platform_statement_stat_unique_query"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.queryid} calls={self.calls} total_ms={self.total_ms:.0f}"
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from apps.core.partitioning import default_partition_name, drop_partitions_before, is_partitioned
+from apps.platform.models import RetentionCheckpoint, RetentionStatus
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+	"""
+	Age-based retention for one model.
+
+	`days_setting` names the settings value holding the retention in days
+	(0/None disables the policy). `public_only` policies skip tenant schemas
+	(shared-app tables, visible from tenants through the search_path).
+	"""
+
+	model_label: str
+	days_setting: str
+	date_field: str = "created_at"
+	public_only: bool = False
+
+	@property
+	def model(self):
+		return django_apps.get_model(self.model_label)
+
+	@property
+	def days(self) -> int:
+		return int(getattr(settings, self.days_setting, 0) or 0)
+
+
+RETENTION_POLICIES: dict[str, RetentionPolicy] = {}
+
+
+def register_policy(
+	model_label: str, *, days_setting: str, date_field: str = "created_at", public_only: bool = False
+) -> RetentionPolicy:
+	policy = RetentionPolicy(
+		model_label=model_label, days_setting=days_setting, date_field=date_field, public_only=public_only
+	)
+	RETENTION_POLICIES[model_label] = policy
+	return policy
+
+
+register_policy("audits.AuditEvent", days_setting="AUDIT_RETENTION_DAYS")
+register_policy("logs.LogEntry", days_setting="LOG_RETENTION_DAYS")
+register_policy("activity.ActivityEvent", days_setting="ACTIVITY_RETENTION_DAYS")
+register_policy("activity.Note", days_setting="NOTE_RETENTION_DAYS")
+register_policy("platform.RouteLatency", days_setting="LATENCY_RETENTION_DAYS", date_field="period_start", public_only=True)
+register_policy("platform.RequestProfile", days_setting="PROFILE_RETENTION_DAYS", public_only=True)
+register_policy("platform.TenantUsageHour", days_setting="TENANT_USAGE_RETENTION_DAYS", date_field="hour", public_only=True)
+register_policy("platform.QueryPlan", days_setting="QUERY_PLAN_RETENTION_DAYS", date_field="updated_at", public_only=True)
+register_policy("platform.StatementStat", days_setting="STATEMENT_SNAPSHOT_RETENTION_DAYS", date_field="taken_at", public_only=True)
+register_policy("platform.StatementSnapshot", days_setting="STATEMENT_SNAPSHOT_RETENTION_DAYS", date_field="taken_at", public_only=True)
+
+
+@dataclass(frozen=True)
+class RetentionSettings:
+	batch_size: int = 5000
+	batch_sleep_s: float = 0.05
+	workers: int = 4
+	lock_timeout_ms: int = 2000
+	max_retries: int = 5
+
+	@classmethod
+	def from_settings(cls, **overrides) -> RetentionSettings:
+		values = {
+			"batch_size": int(getattr(settings, "RETENTION_BATCH_SIZE", 5000)),
+			"batch_sleep_s": int(getattr(settings, "RETENTION_BATCH_SLEEP_MS", 50)) / 1000.0,
+			"workers": int(getattr(settings, "RETENTION_WORKERS", 4)),
+			"lock_timeout_ms": int(getattr(settings, "RETENTION_LOCK_TIMEOUT_MS", 2000)),
+			"max_retries": int(getattr(settings, "RETENTION_MAX_RETRIES", 5)),
+		}
+		values.update({k: v for k, v in overrides.items() if v is not None})
+		values["batch_size"] = max(int(values["batch_size"]), 1)
+		values["workers"] = max(int(values["workers"]), 1)
+		return cls(**values)
+
+
+@dataclass
+class RetentionResult:
+	schema_name: str
+	model_label: str
+	rows_deleted: int = 0
+	partitions_dropped: int = 0
+	bytes_reclaimed: int = 0
+	skipped: bool = False
+	error: str = ""
+
+
+@dataclass
+class RetentionReport:
+	run_key: str
+	results: list[RetentionResult] = field(default_factory=list)
+
+	@property
+	def rows_deleted(self) -> int:
+		return sum(r.rows_deleted for r in self.results)
+
+	@property
+	def bytes_reclaimed(self) -> int:
+		return sum(r.bytes_reclaimed for r in self.results)
+
+	@property
+	def failed(self) -> list[RetentionResult]:
+		return [r for r in self.results if r.error]
+
+
+def _schema(schema_name: str):
+	return schema_context(schema_name) if schema_context is not None else nullcontext()
+
+
+def _public():
+	return _schema("public")
+
+
+def _table_exists(table: str) -> bool:
+	with connection.cursor() as cur:
+		cur.execute("SELECT to_regclass(%s) IS NOT NULL", [table])
+		return bool(cur.fetchone()[0])
+
+
+def _delete_batch(
+	table: str, pk: str, date_field: str, cutoff: datetime, cfg: RetentionSettings, after_pk: int | None = None
+) -> tuple[int, int, int | None]:
+	"""
+	Delete up to batch_size expired rows (lowest PKs above `after_pk` first) in one short
+	transaction. Returns (rows, bytes, max_pk_deleted).
+	"""
+	qn = connection.ops.quote_name
+	# Keyset: start past the previous batch instead of re-walking its dead index entries.
+	after = f"AND {qn(pk)} > %s" if after_pk is not None else ""
+	params = [cutoff, *([after_pk] if after_pk is not None else []), cfg.batch_size]
+	with transaction.atomic(), connection.cursor() as cur:
+		cur.execute(f"SET LOCAL lock_timeout = {int(cfg.lock_timeout_ms)}")
+		cur.execute(
+			f"""
+			WITH doomed AS (
+				SELECT {qn(pk)} FROM {qn(table)}
+				WHERE {qn(date_field)} < %s {after}
+				ORDER BY {qn(pk)}
+				LIMIT %s
+			), deleted AS (
+				DELETE FROM {qn(table)} t
+				WHERE t.{qn(pk)} IN (SELECT {qn(pk)} FROM doomed)
+				RETURNING t.{qn(pk)} AS pk, pg_column_size(t.*) AS size
+			)
+			SELECT COUNT(*), COALESCE(SUM(size), 0), MAX(pk) FROM deleted
+			""",
+			params,
+		)
+		rows, size, max_pk = cur.fetchone()
+	return int(rows or 0), int(size or 0), max_pk
+
+
+def _save_checkpoint(checkpoint_id: int, **fields) -> None:
+	with _public():
+		RetentionCheckpoint.objects.filter(pk=checkpoint_id).update(updated_at=timezone.now(), **fields)
+
+
+def purge_model(
+	policy: RetentionPolicy,
+	cutoff: datetime,
+	*,
+	cfg: RetentionSettings,
+	schema_name: str,
+	checkpoint: RetentionCheckpoint | None = None,
+	progress: Callable[[str], None] | None = None,
+) -> RetentionResult:
+	"""
+	Apply one policy in the current schema.
+
+	- partitioned tables: whole expired partitions are dropped first, then only the
+	  default partition is deleted row-wise
+	- rows are deleted in PK-ordered batches, each in its own short transaction with a
+	  lock_timeout; lock failures back off exponentially up to max_retries
+	- each batch starts after the last PK deleted (checkpoint.last_id on resume)
+	"""
+	model = policy.model
+	table = model._meta.db_table
+	pk = model._meta.pk.column
+	date_field = model._meta.get_field(policy.date_field).column
+	result = RetentionResult(schema_name=schema_name, model_label=policy.model_label)
+	if checkpoint is not None:
+		result.rows_deleted = checkpoint.rows_deleted
+		result.partitions_dropped = checkpoint.partitions_dropped
+		result.bytes_reclaimed = checkpoint.bytes_reclaimed
+
+	if not _table_exists(table):
+		# App not migrated in this schema (e.g. shared-only table); nothing to purge.
+		result.skipped = True
+		return result
+
+	delete_from = table
+	if is_partitioned(table):
+		removed = drop_partitions_before(table, cutoff)
+		result.partitions_dropped += len(removed)
+		result.bytes_reclaimed += sum(size for _, size in removed)
+		delete_from = default_partition_name(table)
+
+	batches = checkpoint.batches if checkpoint is not None else 0
+	last_pk = checkpoint.last_id if checkpoint is not None else None
+	retries = 0
+	while True:
+		try:
+			rows, size, max_pk = _delete_batch(delete_from, pk, date_field, cutoff, cfg, after_pk=last_pk)
+		except OperationalError as e:
+			retries += 1
+			if retries > cfg.max_retries:
+				raise
+			backoff = min(cfg.batch_sleep_s * (2 ** retries), 30.0)
+			log.warning("Retention batch on %s.%s failed (%s); retry %s in %.2fs", schema_name, table, e, retries, backoff)
+			time.sleep(backoff)
+			continue
+
+		if rows == 0:
+			break
+		batches += 1
+		last_pk = max_pk
+		result.rows_deleted += rows
+		result.bytes_reclaimed += size
+		if checkpoint is not None:
+			_save_checkpoint(
+				checkpoint.pk,
+				rows_deleted=result.rows_deleted,
+				bytes_reclaimed=result.bytes_reclaimed,
+				partitions_dropped=result.partitions_dropped,
+				batches=batches,
+				retries=checkpoint.retries + retries,
+				last_id=max_pk,
+			)
+		if progress is not None:
+			progress(f"{schema_name}: {policy.model_label} batch {batches} deleted={result.rows_deleted}")
+		if rows < cfg.batch_size:
+			break
+		if cfg.batch_sleep_s:
+			time.sleep(cfg.batch_sleep_s)
+
+	return result
+
+
+def purge_schema(
+	schema_name: str,
+	policies: list[RetentionPolicy],
+	*,
+	run_key: str,
+	now: datetime,
+	cfg: RetentionSettings,
+	progress: Callable[[str], None] | None = None,
+) -> list[RetentionResult]:
+	results: list[RetentionResult] = []
+	for policy in policies:
+		if policy.public_only and schema_name != "public":
+			continue
+		cutoff = now - timedelta(days=policy.days)
+		with _public():
+			RetentionCheckpoint.objects.bulk_create(
+				[RetentionCheckpoint(run_key=run_key, schema_name=schema_name, model_label=policy.model_label, cutoff=cutoff)],
+				ignore_conflicts=True,
+			)
+			checkpoint = RetentionCheckpoint.objects.get(
+				run_key=run_key, schema_name=schema_name, model_label=policy.model_label
+			)
+
+		if checkpoint.status == RetentionStatus.DONE:
+			results.append(
+				RetentionResult(
+					schema_name=schema_name,
+					model_label=policy.model_label,
+					rows_deleted=checkpoint.rows_deleted,
+					partitions_dropped=checkpoint.partitions_dropped,
+					bytes_reclaimed=checkpoint.bytes_reclaimed,
+					skipped=True,
+				)
+			)
+			continue
+
+		_save_checkpoint(
+			checkpoint.pk, status=RetentionStatus.RUNNING, started_at=checkpoint.started_at or timezone.now(), error=""
+		)
+		try:
+			with _schema(schema_name):
+				res = purge_model(
+					policy, checkpoint.cutoff, cfg=cfg, schema_name=schema_name, checkpoint=checkpoint, progress=progress
+				)
+		except Exception as e:
+			log.exception("Retention failed for %s %s", schema_name, policy.model_label)
+			_save_checkpoint(checkpoint.pk, status=RetentionStatus.FAILED, error=f"{type(e).__name__}: {e}"[:2000])
+			results.append(RetentionResult(schema_name=schema_name, model_label=policy.model_label, error=str(e)))
+			continue
+
+		_save_checkpoint(
+			checkpoint.pk,
+			status=RetentionStatus.DONE,
+			rows_deleted=res.rows_deleted,
+			partitions_dropped=res.partitions_dropped,
+			bytes_reclaimed=res.bytes_reclaimed,
+			finished_at=timezone.now(),
+		)
+		results.append(res)
+	return results
+
+
+def list_schemas() -> list[str]:
+	if schema_context is None:
+		return ["public"]
+	from apps.tenancy.models import Tenant
+
+	with schema_context("public"):
+		tenants = list(Tenant.objects.exclude(schema_name="public").order_by("schema_name").values_list("schema_name", flat=True))
+	return ["public", *tenants]
+
+
+def run_retention(
+	*,
+	schemas: list[str] | None = None,
+	model_labels: list[str] | None = None,
+	run_key: str = "",
+	now: datetime | None = None,
+	progress: Callable[[str], None] | None = None,
+	**overrides,
+) -> RetentionReport:
+	"""
+	Apply every enabled policy to every schema (public + tenants by default).
+
+	Schemas are processed concurrently on a pool of `workers` threads (one DB
+	connection each). With workers=1 everything runs on the calling thread.
+	"""
+	cfg = RetentionSettings.from_settings(**overrides)
+	now = now or timezone.now()
+	run_key = run_key or now.strftime("%Y-%m-%d")
+	policies = [
+		p for label, p in RETENTION_POLICIES.items()
+		if p.days > 0 and (not model_labels or label in model_labels)
+	]
+	schemas = schemas or list_schemas()
+	report = RetentionReport(run_key=run_key)
+	if not policies:
+		return report
+
+	def _work(schema_name: str) -> list[RetentionResult]:
+		try:
+			return purge_schema(schema_name, policies, run_key=run_key, now=now, cfg=cfg, progress=progress)
+		finally:
+			if cfg.workers > 1:
+				close_old_connections()
+				connection.close()
+
+	if cfg.workers == 1:
+		for schema_name in schemas:
+			report.results.extend(_work(schema_name))
+		return report
+
+	with ThreadPoolExecutor(max_workers=cfg.workers, thread_name_prefix="retention") as pool:
+		futures = {pool.submit(_work, s): s for s in schemas}
+		for fut in as_completed(futures):
+			try:
+				report.results.extend(fut.result())
+			except Exception as e:
+				report.results.append(RetentionResult(schema_name=futures[fut], model_label="*", error=str(e)))
+	return report
@@ -3,6 +3,7 @@ from __future__ import annotations
 import subprocess
 import sys
 import time
+from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -169,7 +170,8 @@ def get_pg_stat_statements(
 
 			def match(row) -> bool:
 				q = (row.get("query") or "").lower()
-				return (f"{sf}." in q) or (f"\"{sf}\"." in q)
+				# Schema-qualified SQL, or the SQL commenter's tenant tag (first-seen text).
+				return (f"{sf}." in q) or (f"\"{sf}\"." in q) or (f"tenant='{sf}'" in q)
 
 			rows = [r for r in rows if match(r)]
 
@@ -184,3 +186,445 @@ def get_pg_stat_statements(
 	top_calls = _fetch("calls DESC")
 	return top_total, top_mean, top_calls
 
+
+def get_db_activity(*, tenant_schema: str = "", include_idle: bool = False) -> dict:
+	"""
+	Sessions of this database from pg_stat_activity, attributed through the SQL
+	commenter tags (apps.logs.sqlcomment) of their current / last statement.
+
+	Returns { sessions, by_tenant, by_source }: sessions (longest-running first) and
+	non-idle session counts per tenant and per route / Celery task.
+	"""
+	from apps.logs.sqlcomment import parse_sql_tags, strip_sql_comment
+
+	idle_sql = "" if include_idle else "AND state IS DISTINCT FROM 'idle'"
+	with connection.cursor() as cur:
+		cur.execute(
+			f"""
+			SELECT
+			  pid,
+			  state,
+			  wait_event_type,
+			  wait_event,
+			  application_name,
+			  EXTRACT(EPOCH FROM (now() - query_start)) * 1000 AS query_ms,
+			  EXTRACT(EPOCH FROM (now() - xact_start)) * 1000 AS xact_ms,
+			  query
+			FROM pg_stat_activity
+			WHERE datname = current_database()
+			  AND pid <> pg_backend_pid()
+			  AND backend_type = 'client backend'
+			  {idle_sql}
+			ORDER BY query_start ASC NULLS LAST
+			"""
+		)
+		cols = [c[0] for c in cur.description]
+		rows = [dict(zip(cols, r, strict=False)) for r in cur.fetchall()]
+
+	sessions: list[dict] = []
+	by_tenant: Counter[str] = Counter()
+	by_source: Counter[str] = Counter()
+	for r in rows:
+		tags = parse_sql_tags(r.get("query") or "")
+		if tenant_schema and tags.get("tenant") != tenant_schema:
+			continue
+		q = strip_sql_comment(r.get("query") or "").strip()
+		r.update(
+			{
+				"tags": tags,
+				"tenant": tags.get("tenant", ""),
+				"source": tags.get("route") or tags.get("task") or "",
+				"request_id": tags.get("request_id", ""),
+				"query_ms": int(r["query_ms"] or 0),
+				"xact_ms": int(r["xact_ms"] or 0),
+				"query_short": (q[:300] + "…") if len(q) > 300 else q,
+			}
+		)
+		sessions.append(r)
+		if r.get("state") != "idle":
+			by_tenant[r["tenant"] or "(untagged)"] += 1
+			by_source[r["source"] or "(untagged)"] += 1
+
+	def _ranked(counts: Counter[str]) -> list[dict]:
+		return [{"name": k, "sessions": v} for k, v in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+	return {"sessions": sessions, "by_tenant": _ranked(by_tenant), "by_source": _ranked(by_source)}
+
+
+def _latency_rows(*, since, tenant_schema: str = "", route: str = ""):
+	from apps.platform.models import RouteLatency
+
+	qs = RouteLatency.objects.filter(period_start__gte=since)
+	if tenant_schema:
+		qs = qs.filter(tenant_schema=tenant_schema)
+	if route:
+		qs = qs.filter(route=route)
+	return qs.values_list("period_start", "route", "method", "count", "sum_ms", "max_ms", "buckets").iterator()
+
+
+def _latency_row(hist, **extra) -> dict:
+	return {
+		**extra,
+		"count": hist.count,
+		"mean_ms": hist.mean_ms,
+		"p50_ms": hist.percentile(0.50),
+		"p95_ms": hist.percentile(0.95),
+		"p99_ms": hist.percentile(0.99),
+		"max_ms": hist.max_ms,
+		"total_ms": hist.sum_ms,
+	}
+
+
+def get_route_latency_summary(*, since, tenant_schema: str = "", limit: int = 100) -> list[dict]:
+	"""
+	Merge RouteLatency histograms (all workers/periods since `since`) per route + method.
+	Sorted by total time spent, highest first.
+	"""
+	from apps.logs.latency import Histogram
+
+	merged: dict[tuple[str, str], Histogram] = {}
+	for _, route, method, count, sum_ms, max_ms, buckets in _latency_rows(since=since, tenant_schema=tenant_schema):
+		merged.setdefault((route, method), Histogram()).merge(buckets, count, sum_ms, max_ms)
+	rows = [_latency_row(h, route=route, method=method) for (route, method), h in merged.items()]
+	rows.sort(key=lambda r: r["total_ms"], reverse=True)
+	return rows[: max(int(limit), 1)]
+
+
+def get_route_latency_series(*, route: str, since, step_s: int, tenant_schema: str = "") -> list[dict]:
+	"""
+	Percentiles for one route over time, in `step_s` buckets (oldest first).
+	"""
+	from apps.logs.latency import Histogram, period_start
+
+	merged: dict = {}
+	for start, _, _, count, sum_ms, max_ms, buckets in _latency_rows(since=since, tenant_schema=tenant_schema, route=route):
+		merged.setdefault(period_start(start, step_s), Histogram()).merge(buckets, count, sum_ms, max_ms)
+	return [_latency_row(merged[start], start=start) for start in sorted(merged)]
+
+
+def build_flame_rows(stacks: str, *, min_width_pct: float = 0.2, max_depth: int = 64) -> tuple[list[dict], int]:
+	"""
+	Lay out folded stacks ("a;b;c 12" per line) as flame graph boxes.
+
+	Returns (rows, total_samples); each row is
+	  { depth, left_pct, width_pct, label, samples }
+	Boxes narrower than `min_width_pct` are dropped (with their children).
+	"""
+	root: dict = {"children": {}, "samples": 0}
+	for line in (stacks or "").splitlines():
+		stack, _, count = line.rpartition(" ")
+		if not stack or not count.isdigit():
+			continue
+		n = int(count)
+		root["samples"] += n
+		node = root
+		for label in stack.split(";")[:max_depth]:
+			node = node["children"].setdefault(label, {"children": {}, "samples": 0})
+			node["samples"] += n
+
+	total = root["samples"]
+	rows: list[dict] = []
+	if not total:
+		return rows, 0
+
+	def walk(node: dict, depth: int, left: float) -> None:
+		for label, child in sorted(node["children"].items()):
+			width = child["samples"] * 100.0 / total
+			if width >= min_width_pct:
+				rows.append(
+					{"depth": depth, "left_pct": left, "width_pct": width, "label": label, "samples": child["samples"]}
+				)
+				walk(child, depth + 1, left)
+			left += width
+
+	walk(root, 0, 0.0)
+	return rows, total
+
+
+USAGE_METRICS = ("requests", "wall_ms", "db_ms", "queries", "bytes_out")
+
+
+def get_top_consumers(*, since, until=None, order_by: str = "wall_ms", limit: int = 50) -> list[dict]:
+	"""
+	Per-tenant resource totals from TenantUsageHour, heaviest first.
+	"""
+	from django.db.models import Sum
+
+	from apps.platform.models import TenantUsageHour
+
+	order_by = order_by if order_by in USAGE_METRICS else "wall_ms"
+	qs = TenantUsageHour.objects.filter(hour__gte=since)
+	if until is not None:
+		qs = qs.filter(hour__lt=until)
+	rows = list(
+		qs.values("tenant_schema")
+		.annotate(**{m: Sum(m) for m in USAGE_METRICS})
+		.order_by(f"-{order_by}")[: max(int(limit), 1)]
+	)
+	grand = {m: sum(r[m] or 0 for r in rows) for m in USAGE_METRICS}
+	for r in rows:
+		r["share_pct"] = (r[order_by] or 0) * 100.0 / grand[order_by] if grand[order_by] else 0.0
+	return rows
+
+
+def get_tenant_usage(tenant_schema: str, *, since, until=None) -> dict:
+	"""
+	Totals + hourly rows for one tenant (entitlements / billing reads use this).
+
+	Returns { tenant_schema, totals: {metric: value}, hours: [{hour, metric...}] }
+	"""
+	from apps.platform.models import TenantUsageHour
+
+	qs = TenantUsageHour.objects.filter(tenant_schema=tenant_schema, hour__gte=since)
+	if until is not None:
+		qs = qs.filter(hour__lt=until)
+	hours = list(qs.order_by("hour").values("hour", *USAGE_METRICS))
+	totals = {m: sum(h[m] or 0 for h in hours) for m in USAGE_METRICS}
+	return {"tenant_schema": tenant_schema, "totals": totals, "hours": hours}
+
+
+def get_system_metric_series(*, metric: str, resolution: str, since, host: str = "", pid: int | None = None) -> list[dict]:
+	"""
+	min / avg / max per bucket (oldest first), merged across the matching hosts and pids.
+	"""
+	from django.db.models import Max, Min, Sum
+
+	from apps.platform.models import SystemMetricBucket
+
+	qs = SystemMetricBucket.objects.filter(metric=metric, resolution=resolution, bucket_start__gte=since)
+	if host:
+		qs = qs.filter(host=host)
+	if pid is not None:
+		qs = qs.filter(pid=pid)
+	rows = (
+		qs.values("bucket_start")
+		.annotate(lo=Min("min_value"), hi=Max("max_value"), total=Sum("sum_value"), n=Sum("count"))
+		.order_by("bucket_start")
+	)
+	return [
+		{"start": r["bucket_start"], "min": r["lo"], "avg": r["total"] / r["n"] if r["n"] else None, "max": r["hi"]}
+		for r in rows
+	]
+
+
+def get_rss_growth(*, window_minutes: int, now=None, threshold_kb_per_hour: float | None = None) -> list[dict]:
+	"""
+	RSS trend per host/pid from the 1m buckets of the last `window_minutes`: least-squares
+	slope of the per-minute average, in kB/hour. Fastest growing first.
+
+	Each row: { host, pid, points, last_kb, slope_kb_per_hour, alert }. Series with
+	fewer than max(5, window/4) points get no slope (process too young or idle).
+	"""
+	from datetime import timedelta
+
+	from django.utils import timezone
+
+	from apps.platform.models import SystemMetricBucket
+
+	now = now or timezone.now()
+	since = now - timedelta(minutes=window_minutes)
+	min_points = max(5, window_minutes // 4)
+	series: dict[tuple[str, int], list[tuple[float, float]]] = {}
+	qs = SystemMetricBucket.objects.filter(metric="rss_kb", resolution="1m", bucket_start__gte=since).order_by("bucket_start")
+	for host, pid, start, total, n in qs.values_list("host", "pid", "bucket_start", "sum_value", "count").iterator():
+		if n:
+			series.setdefault((host, pid), []).append(((start - since).total_seconds() / 3600, total / n))
+
+	rows = []
+	for (host, pid), points in series.items():
+		slope = None
+		if len(points) >= min_points:
+			mean_x = sum(x for x, _ in points) / len(points)
+			mean_y = sum(y for _, y in points) / len(points)
+			var_x = sum((x - mean_x) ** 2 for x, _ in points)
+			if var_x:
+				slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+		rows.append(
+			{
+				"host": host,
+				"pid": pid,
+				"points": len(points),
+				"last_kb": points[-1][1],
+				"slope_kb_per_hour": slope,
+				"alert": slope is not None and threshold_kb_per_hour is not None and slope > threshold_kb_per_hour,
+			}
+		)
+	rows.sort(key=lambda r: r["slope_kb_per_hour"] if r["slope_kb_per_hour"] is not None else float("-inf"), reverse=True)
+	return rows
+
+
+def check_rss_growth(*, now=None) -> list[dict]:
+	"""
+	Audit an "alert.rss_growth" failure (Platform -> Alerts) for every process whose RSS
+	grows faster than RSS_GROWTH_ALERT_KB_PER_HOUR; at most once per process per window.
+	"""
+	from django.conf import settings
+	from django.core.cache import cache
+
+	from apps.audits.models import AuditStatus
+	from apps.audits.services import audit_log
+
+	window = int(getattr(settings, "RSS_GROWTH_WINDOW_MIN", 60))
+	threshold = float(getattr(settings, "RSS_GROWTH_ALERT_KB_PER_HOUR", 50 * 1024))
+	alerts = [r for r in get_rss_growth(window_minutes=window, now=now, threshold_kb_per_hour=threshold) if r["alert"]]
+	for r in alerts:
+		if not cache.add(f"platform:rss_growth_alert:{r['host']}:{r['pid']}", 1, timeout=window * 60):
+			continue
+		audit_log(
+			action="alert.rss_growth",
+			status=AuditStatus.FAILURE,
+			message=f"RSS of {r['host']}:{r['pid']} growing {r['slope_kb_per_hour'] / 1024:.1f} MB/h (now {r['last_kb'] / 1024:.0f} MB)",
+			metadata={**r, "window_minutes": window, "threshold_kb_per_hour": threshold},
+			tenant_schema="public",
+			defer=False,
+		)
+	return alerts
+
+
+def build_metric_chart(series: list[dict], *, width: int = 800, height: int = 160) -> dict | None:
+	"""
+	SVG coordinates for a min/avg/max series: an avg polyline over a min-max band.
+	"""
+	points = [s for s in series if s["avg"] is not None]
+	if not points:
+		return None
+	lo = min(s["min"] for s in points)
+	hi = max(s["max"] for s in points)
+	span = (hi - lo) or 1.0
+	step = width / max(len(points) - 1, 1)
+
+	def y(value: float) -> float:
+		return round(height - (value - lo) * height / span, 1)
+
+	xs = [round(i * step, 1) for i in range(len(points))]
+	avg = " ".join(f"{x},{y(s['avg'])}" for x, s in zip(xs, points, strict=True))
+	upper = [f"{x},{y(s['max'])}" for x, s in zip(xs, points, strict=True)]
+	lower = [f"{x},{y(s['min'])}" for x, s in zip(xs, points, strict=True)]
+	return {
+		"width": width,
+		"height": height,
+		"avg_points": avg,
+		"band_points": " ".join(upper + lower[::-1]),
+		"min": lo,
+		"max": hi,
+		"first": points[0]["start"],
+		"last": points[-1]["start"],
+	}
+
+
+def get_statement_diff(*, base_id: int | None = None, head_id: int | None = None, regressed_only: bool = False, limit: int = 100) -> dict:
+	"""
+	Compare two pg_stat_statements snapshots (platform.StatementSnapshot).
+
+	Defaults: head = latest snapshot; base = latest deploy marker before head, else the
+	snapshot before head. Returns { snapshots, base, head, deltas, regressions, reset, base_truncated }.
+	"""
+	from apps.platform.models import SnapshotKind, StatementSnapshot
+	from apps.platform.statements import diff_snapshots, snapshot_truncated
+
+	snapshots = list(StatementSnapshot.objects.all()[:200])
+	by_id = {s.pk: s for s in snapshots}
+
+	def _snapshot(pk: int):
+		return by_id.get(pk) or StatementSnapshot.objects.filter(pk=pk).first()
+
+	head = _snapshot(head_id) if head_id else (snapshots[0] if snapshots else None)
+	base = _snapshot(base_id) if base_id else None
+	if base is None and head is not None:
+		earlier = StatementSnapshot.objects.filter(taken_at__lt=head.taken_at)
+		base = earlier.filter(kind=SnapshotKind.DEPLOY).first() or earlier.first()
+	if base is not None and head is not None and base.taken_at > head.taken_at:
+		base, head = head, base
+
+	deltas = diff_snapshots(base, head) if base is not None and head is not None else []
+	regressions = [d for d in deltas if d.regressed]
+	return {
+		"snapshots": snapshots,
+		"base": base,
+		"head": head,
+		"deltas": (regressions if regressed_only else deltas)[: max(int(limit), 1)],
+		"regressions": len(regressions),
+		"reset": any(d.reset for d in deltas),
+		"base_truncated": base is not None and snapshot_truncated(base),
+	}
+
+
+def get_query_plans(*, tenant_schema: str = "", flagged_only: bool = False, limit: int = 50) -> list:
+	"""
+	Captured slow-query plans, worst (large seq scan / index candidate, then cost) first.
+	"""
+	from apps.platform.models import QueryPlan
+
+	qs = QueryPlan.objects.all()
+	if tenant_schema:
+		qs = qs.filter(tenant_schema=tenant_schema)
+	if flagged_only:
+		qs = qs.filter(has_large_seq_scan=True)
+	qs = qs.order_by("-has_index_candidate", "-has_large_seq_scan", "-total_cost")
+	return list(qs[: max(int(limit), 1)])
+
+
+def get_index_candidates(*, tenant_schema: str = "") -> list[dict]:
+	"""
+	Missing-index candidates per tenant schema: selective seq scans on large tables,
+	grouped by (schema, table, filtered columns).
+
+	Each row: { tenant_schema, relation, columns, table_rows, plans, fingerprints }.
+	"""
+	from apps.platform.models import QueryPlan
+
+	qs = QueryPlan.objects.filter(has_index_candidate=True)
+	if tenant_schema:
+		qs = qs.filter(tenant_schema=tenant_schema)
+	grouped: dict[tuple[str, str, tuple[str, ...]], dict] = {}
+	for schema, fingerprint, scans in qs.values_list("tenant_schema", "fingerprint", "seq_scans").iterator():
+		for scan in scans or []:
+			if not scan.get("index_candidate"):
+				continue
+			key = (schema, scan.get("relation") or "", tuple(scan.get("columns") or ()))
+			row = grouped.setdefault(
+				key,
+				{"tenant_schema": schema, "relation": key[1], "columns": list(key[2]), "table_rows": 0, "plans": 0, "fingerprints": []},
+			)
+			row["table_rows"] = max(row["table_rows"], int(scan.get("table_rows") or 0))
+			row["plans"] += 1
+			row["fingerprints"].append(fingerprint)
+	return sorted(grouped.values(), key=lambda r: (r["tenant_schema"], -r["table_rows"]))
+
+
+def get_audit_outbox_lag(*, now=None) -> dict:
+	"""
+	AUDIT_WRITE_MODE="outbox" backlog per schema (pending rows, age of the oldest);
+	`lagging` = schemas whose oldest row is older than AUDIT_OUTBOX_LAG_ALERT_S.
+	"""
+	from django.conf import settings
+
+	from apps.audits.outbox import outbox_enabled, outbox_lag
+
+	alert_s = int(getattr(settings, "AUDIT_OUTBOX_LAG_ALERT_S", 60))
+	if not outbox_enabled():
+		return {"enabled": False, "rows": [], "lagging": [], "alert_s": alert_s}
+	rows = outbox_lag(now=now)
+	for r in rows:
+		r["lagging"] = r["lag_s"] > alert_s
+	return {
+		"enabled": True,
+		"rows": rows,
+		"lagging": [r["schema"] for r in rows if r["lagging"]],
+		"pending": sum(r["pending"] for r in rows),
+		"alert_s": alert_s,
+	}
+
+
+def get_throttled_tenants() -> list[dict]:
+	"""
+	Tenants whose API token bucket ran dry within API_THROTTLED_WINDOW_S (most recent first).
+	"""
+	from apps.entitlements.ratelimit import get_throttled_tenants as _throttled
+	from apps.tenancy.models import Tenant
+
+	tenants = {str(t.id): t for t in Tenant.objects.exclude(schema_name="public").only("id", "slug", "schema_name")}
+	rows = _throttled(list(tenants))
+	for r in rows:
+		r["tenant"] = tenants.get(r["tenant_id"])
+	return rows
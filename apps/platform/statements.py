@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+COUNTERS = ("calls", "total_ms", "rows", "shared_blks_hit", "shared_blks_read", "temp_blks_written")
+
+# One row per queryid for this database (pg_stat_statements splits by user and
+# top-level flag). Modern column names first, then the pre-13 ones.
+_STAT_QUERIES = [
+	"""
+	SELECT
+	  queryid,
+	  SUM(calls) AS calls,
+	  SUM(total_exec_time) AS total_ms,
+	  SUM(rows) AS rows,
+	  SUM(shared_blks_hit) AS shared_blks_hit,
+	  SUM(shared_blks_read) AS shared_blks_read,
+	  SUM(temp_blks_written) AS temp_blks_written,
+	  MIN(query) AS query
+	FROM pg_stat_statements
+	WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+	  AND queryid IS NOT NULL
+	GROUP BY queryid
+	ORDER BY SUM(total_exec_time) DESC
+	LIMIT %s
+	""",
+	"""
+	SELECT
+	  queryid,
+	  SUM(calls) AS calls,
+	  SUM(total_time) AS total_ms,
+	  SUM(rows) AS rows,
+	  SUM(shared_blks_hit) AS shared_blks_hit,
+	  SUM(shared_blks_read) AS shared_blks_read,
+	  SUM(temp_blks_written) AS temp_blks_written,
+	  MIN(query) AS query
+	FROM pg_stat_statements
+	WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+	  AND queryid IS NOT NULL
+	GROUP BY queryid
+	ORDER BY SUM(total_time) DESC
+	LIMIT %s
+	""",
+]
+
+
+def _max_rows() -> int:
+	return int(getattr(settings, "STATEMENT_SNAPSHOT_MAX_ROWS", 2000))
+
+
+def fetch_statement_stats(limit: int | None = None) -> list[dict]:
+	"""
+	Current cumulative pg_stat_statements counters per queryid (this database),
+	heaviest total time first. Raises if the extension is unavailable.
+	"""
+	limit = limit or _max_rows()
+	last_exc: Exception | None = None
+	for sql in _STAT_QUERIES:
+		try:
+			with transaction.atomic(), connection.cursor() as cur:
+				cur.execute(sql, [limit])
+				cols = [c[0] for c in cur.description]
+				return [dict(zip(cols, r, strict=False)) for r in cur.fetchall()]
+		except Exception as e:
+			last_exc = e
+	raise last_exc  # type: ignore[misc]
+
+
+def _stats_reset():
+	# pg_stat_statements_info exists from PG 14 / extension 1.9.
+	try:
+		with transaction.atomic(), connection.cursor() as cur:
+			cur.execute("SELECT stats_reset FROM pg_stat_statements_info")
+			row = cur.fetchone()
+			return row[0] if row else None
+	except Exception:
+		return None
+
+
+def take_statement_snapshot(*, label: str = "", kind: str = "periodic", rows: list[dict] | None = None):
+	"""
+	Store the current pg_stat_statements counters as a platform.StatementSnapshot
+	(PUBLIC schema). `kind="deploy"` + `label` marks a release (see `mark_deploy`).
+	"""
+	from apps.platform.models import StatementSnapshot, StatementStat
+
+	def _take():
+		stats = fetch_statement_stats() if rows is None else rows
+		with transaction.atomic():
+			snapshot = StatementSnapshot.objects.create(
+				taken_at=timezone.now(), label=label[:200], kind=kind, stats_reset=_stats_reset(), statements=len(stats)
+			)
+			StatementStat.objects.bulk_create(
+				[
+					StatementStat(
+						snapshot=snapshot,
+						taken_at=snapshot.taken_at,
+						queryid=int(r["queryid"]),
+						query=(r.get("query") or "")[:2000],
+						**{c: r.get(c) or 0 for c in COUNTERS},
+					)
+					for r in stats
+				],
+				batch_size=500,
+			)
+		return snapshot
+
+	if schema_context is None:
+		return _take()
+	with schema_context("public"):
+		return _take()
+
+
+@dataclass
+class StatementDelta:
+	queryid: int
+	query: str
+	calls: int
+	total_ms: float
+	rows: int
+	shared_blks_hit: int
+	shared_blks_read: int
+	temp_blks_written: int
+	before_mean_ms: float | None
+	new: bool = False
+	reset: bool = False
+	regressed: bool = False
+
+	@property
+	def mean_ms(self) -> float:
+		return self.total_ms / self.calls if self.calls else 0.0
+
+	@property
+	def mean_change(self) -> float | None:
+		"""
+		Interval mean / mean before the base snapshot (None without a baseline).
+		"""
+		if not self.before_mean_ms or not self.calls:
+			return None
+		return self.mean_ms / self.before_mean_ms
+
+
+def diff_statement_stats(
+	base: dict[int, dict],
+	head: dict[int, dict],
+	*,
+	reset: bool = False,
+	base_truncated: bool = False,
+	min_calls: int | None = None,
+	ratio: float | None = None,
+) -> list[StatementDelta]:
+	"""
+	Per-queryid deltas between two snapshots' counters ({queryid: {counter: value}}).
+
+	- calls going backwards (stats reset, statement evicted) restarts that queryid from 0
+	- `reset=True` (pg_stat_statements reset in between) restarts all of them
+	- `base_truncated=True` (base hit STATEMENT_SNAPSHOT_MAX_ROWS): a queryid missing from
+	  the base has no baseline (its lifetime totals are not an interval delta) and is skipped
+	- regressed: at least STATEMENT_REGRESSION_MIN_CALLS calls in the interval with a mean
+	  STATEMENT_REGRESSION_RATIO times the cumulative mean at the base snapshot
+
+	Sorted by interval total time, heaviest first.
+	"""
+	min_calls = int(getattr(settings, "STATEMENT_REGRESSION_MIN_CALLS", 20) if min_calls is None else min_calls)
+	ratio = float(getattr(settings, "STATEMENT_REGRESSION_RATIO", 1.5) if ratio is None else ratio)
+	out: list[StatementDelta] = []
+	for queryid, h in head.items():
+		b = base.get(queryid)
+		if b is None and base_truncated and not reset:
+			continue
+		restarted = reset or (b is not None and (h.get("calls") or 0) < (b.get("calls") or 0))
+		prev = {} if b is None or restarted else b
+		delta = {c: (h.get(c) or 0) - (prev.get(c) or 0) for c in COUNTERS}
+		if delta["calls"] <= 0:
+			continue
+		before_mean = (b["total_ms"] / b["calls"]) if b and b.get("calls") else None
+		d = StatementDelta(
+			queryid=queryid,
+			query=h.get("query") or "",
+			before_mean_ms=before_mean,
+			new=b is None,
+			reset=restarted,
+			**{c: delta[c] for c in COUNTERS},
+		)
+		change = d.mean_change
+		d.regressed = bool(change is not None and d.calls >= min_calls and change >= ratio)
+		out.append(d)
+	out.sort(key=lambda d: d.total_ms, reverse=True)
+	return out
+
+
+def snapshot_counters(snapshot) -> dict[int, dict]:
+	from apps.platform.models import StatementStat
+
+	return {
+		r["queryid"]: r
+		for r in StatementStat.objects.filter(snapshot=snapshot).values("queryid", "query", *COUNTERS).iterator()
+	}
+
+
+def snapshot_truncated(snapshot) -> bool:
+	"""
+	True when the snapshot hit STATEMENT_SNAPSHOT_MAX_ROWS (lighter statements not stored).
+	"""
+	return snapshot.statements >= _max_rows()
+
+
+def diff_snapshots(base, head) -> list[StatementDelta]:
+	"""
+	diff_statement_stats() for two StatementSnapshot rows (base taken before head).
+	"""
+	reset = bool(head.stats_reset and (base.stats_reset is None or head.stats_reset > base.stats_reset))
+	return diff_statement_stats(
+		snapshot_counters(base),
+		snapshot_counters(head),
+		reset=reset,
+		base_truncated=snapshot_truncated(base),
+	)
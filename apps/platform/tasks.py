@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from celery import shared_task
+from django.core.management import call_command
+
+try:
+	from django_tenants.utils import schema_context
+except Exception:  # pragma: no cover
+	schema_context = None
+
+
+@shared_task
+def purge_retention_task() -> None:
+	"""
+	Daily: apply retention policies (audits, logs, activity) to public + all tenants.
+	Resumes the same day's run if a previous attempt was interrupted.
+	"""
+	call_command("purge_retention")
+
+
+@shared_task
+def check_system_metrics_task() -> int:
+	"""
+	Every 15 minutes: reap expired system metric buckets and raise RSS growth alerts.
+	"""
+	from apps.logs.metrics_history import prune_metric_buckets
+	from apps.platform.services import check_rss_growth
+
+	if schema_context is None:
+		prune_metric_buckets()
+		return len(check_rss_growth())
+	with schema_context("public"):
+		prune_metric_buckets()
+		return len(check_rss_growth())
+
+
+@shared_task
+def snapshot_statements_task() -> int:
+	"""
+	Every STATEMENT_SNAPSHOT_INTERVAL_S: store pg_stat_statements counters for diffing.
+	"""
+	from apps.platform.statements import take_statement_snapshot
+
+	return take_statement_snapshot().statements
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.activity.models import ActivityEvent
+from apps.audits.models import AuditEvent
+from apps.logs.accounting import TenantUsageAccumulator
+from apps.logs.latency import Histogram, LatencyRecorder
+from apps.logs.metrics import SystemMetrics
+from apps.logs.metrics_history import RingBuffer, SystemMetricsSampler, bucket_slot
+from apps.platform.models import (
+	RetentionCheckpoint,
+	RetentionStatus,
+	RouteLatency,
+	SnapshotKind,
+	StatementSnapshot,
+	StatementStat,
+	SystemMetricBucket,
+)
+from apps.platform.retention import run_retention
+from apps.platform.services import (
+	build_flame_rows,
+	check_rss_growth,
+	get_route_latency_summary,
+	get_statement_diff,
+	get_tenant_usage,
+	get_top_consumers,
+)
+from apps.platform.statements import diff_snapshots, diff_statement_stats, take_statement_snapshot
+
+
+@override_settings(ACTIVITY_RETENTION_DAYS=30)
+class RetentionTests(TestCase):
+	def setUp(self):
+		ct = ContentType.objects.get_for_model(ActivityEvent)
+		now = timezone.now()
+		ActivityEvent.objects.bulk_create(
+			[ActivityEvent(verb="old", content_type=ct, object_id=str(i), created_at=now - timedelta(days=40)) for i in range(5)]
+			+ [ActivityEvent(verb="new", content_type=ct, object_id="x", created_at=now)]
+		)
+
+	def _run(self):
+		return run_retention(
+			schemas=["public"],
+			model_labels=["activity.ActivityEvent"],
+			run_key="test",
+			workers=1,
+			batch_size=2,
+			batch_sleep_s=0,
+		)
+
+	def test_deletes_expired_rows_in_batches_and_checkpoints(self):
+		last_old = ActivityEvent.objects.filter(verb="old").order_by("-pk").values_list("pk", flat=True).first()
+		report = self._run()
+
+		self.assertEqual(report.rows_deleted, 5)
+		self.assertGreater(report.bytes_reclaimed, 0)
+		self.assertEqual(list(ActivityEvent.objects.values_list("verb", flat=True)), ["new"])
+		cp = RetentionCheckpoint.objects.get(run_key="test", model_label="activity.ActivityEvent")
+		self.assertEqual(cp.status, RetentionStatus.DONE)
+		self.assertEqual(cp.batches, 3)
+		self.assertEqual(cp.last_id, last_old)
+
+	def test_resumed_run_continues_after_last_deleted_pk(self):
+		old = list(ActivityEvent.objects.filter(verb="old").order_by("pk").values_list("pk", flat=True))
+		RetentionCheckpoint.objects.create(
+			run_key="test",
+			schema_name="public",
+			model_label="activity.ActivityEvent",
+			cutoff=timezone.now() - timedelta(days=30),
+			status=RetentionStatus.RUNNING,
+			last_id=old[1],
+		)
+
+		report = self._run()
+
+		self.assertEqual(report.rows_deleted, 3)
+		self.assertEqual(list(ActivityEvent.objects.filter(verb="old").order_by("pk").values_list("pk", flat=True)), old[:2])
+
+	def test_rerun_with_same_key_skips_finished_pairs(self):
+		self._run()
+		report = self._run()
+
+		self.assertTrue(all(r.skipped for r in report.results))
+		self.assertEqual(RetentionCheckpoint.objects.filter(run_key="test").count(), 1)
+
+
+class HistogramTests(SimpleTestCase):
+	def test_percentiles_interpolate_within_buckets(self):
+		hist = Histogram()
+		for ms in [1] * 90 + [400] * 9 + [20_000]:
+			hist.observe(ms)
+
+		self.assertLessEqual(hist.percentile(0.5), 5)
+		self.assertTrue(300 < hist.percentile(0.95) <= 500)
+		self.assertEqual(hist.percentile(1.0), 20_000)
+
+
+class RouteLatencyFlushTests(TestCase):
+	def test_flushes_from_several_workers_merge_into_one_row(self):
+		now = datetime(2026, 1, 1, 12, 0, 30, tzinfo=UTC)
+		key = ("properties:unit_list", "GET", "2xx", "acme")
+		for durations in ([10, 20], [30]):
+			recorder = LatencyRecorder(period_s=60, flush_interval=60)
+			for ms in durations:
+				recorder.observe(key, ms)
+			self.assertEqual(recorder.flush_now(now=now), 1)
+
+		row = RouteLatency.objects.get()
+		self.assertEqual(row.period_start, datetime(2026, 1, 1, 12, 0, tzinfo=UTC))
+		self.assertEqual((row.count, row.sum_ms, row.max_ms), (3, 60.0, 30.0))
+		self.assertEqual(sum(row.buckets), 3)
+
+		summary = get_route_latency_summary(since=now - timedelta(hours=1))
+		self.assertEqual([(r["route"], r["count"]) for r in summary], [("properties:unit_list", 3)])
+
+
+class FlameRowsTests(SimpleTestCase):
+	def test_lays_out_folded_stacks(self):
+		rows, total = build_flame_rows("main;a;x 3\nmain;b 1\nbad line")
+
+		self.assertEqual(total, 4)
+		boxes = {r["label"]: (r["depth"], r["left_pct"], r["width_pct"]) for r in rows}
+		self.assertEqual(boxes["main"], (0, 0.0, 100.0))
+		self.assertEqual(boxes["a"], (1, 0.0, 75.0))
+		self.assertEqual(boxes["b"], (1, 75.0, 25.0))
+		self.assertEqual(boxes["x"], (2, 0.0, 75.0))
+
+
+class TenantUsageTests(TestCase):
+	def test_counters_roll_up_per_tenant_hour(self):
+		now = datetime(2026, 1, 1, 12, 30, tzinfo=UTC)
+		for _ in range(2):
+			acc = TenantUsageAccumulator(flush_interval=60)
+			acc.record("acme", wall_ms=100, db_ms=40, queries=5, bytes_out=1000, now=now)
+			acc.record("beta", wall_ms=10, now=now)
+			acc.flush_now()
+
+		since = now - timedelta(hours=1)
+		top = get_top_consumers(since=since)
+		self.assertEqual([r["tenant_schema"] for r in top], ["acme", "beta"])
+		self.assertEqual((top[0]["requests"], top[0]["wall_ms"], top[0]["queries"]), (2, 200.0, 10))
+
+		usage = get_tenant_usage("acme", since=since)
+		self.assertEqual(usage["totals"]["bytes_out"], 2000)
+		self.assertEqual([h["hour"] for h in usage["hours"]], [datetime(2026, 1, 1, 12, tzinfo=UTC)])
+
+
+def _system_metrics(rss_kb: int) -> SystemMetrics:
+	return SystemMetrics(
+		loadavg_1=0.5,
+		loadavg_5=0.5,
+		loadavg_15=0.5,
+		mem_total_kb=1000,
+		mem_available_kb=500,
+		rss_kb=rss_kb,
+		disk_total_bytes=100,
+		disk_used_bytes=40,
+		disk_free_bytes=60,
+	)
+
+
+class SystemMetricsHistoryTests(TestCase):
+	def setUp(self):
+		cache.clear()
+
+	def test_ring_buffer_keeps_newest_samples(self):
+		ring = RingBuffer(3)
+		for i in range(5):
+			ring.append(float(i + 1), i * 10.0)
+		self.assertEqual(ring.since(0), [(3.0, 20.0), (4.0, 30.0), (5.0, 40.0)])
+		self.assertEqual(ring.since(4.0), [(5.0, 40.0)])
+
+	def test_samples_roll_up_into_minute_hour_and_day_buckets(self):
+		sampler = SystemMetricsSampler(capacity=10)
+		t0 = datetime(2026, 1, 5, 10, 0, tzinfo=UTC).timestamp()
+		sampler.sample(t0, _system_metrics(100))
+		sampler.sample(t0 + 15, _system_metrics(300))
+		sampler.sample(t0 + 70, _system_metrics(200))
+		sampler.flush_now()
+		sampler.sample(t0 + 80, _system_metrics(400))
+		sampler.flush_now()
+
+		rss = SystemMetricBucket.objects.filter(metric="rss_kb")
+		minutes = list(rss.filter(resolution="1m").order_by("bucket_start"))
+		self.assertEqual([(b.min_value, b.max_value, b.count) for b in minutes], [(100, 300, 2), (200, 400, 2)])
+		hour = rss.get(resolution="1h")
+		self.assertEqual((hour.count, hour.avg_value), (4, 250))
+		self.assertEqual(rss.filter(resolution="1d").count(), 1)
+		self.assertEqual(SystemMetricBucket.objects.get(metric="load1", resolution="1h").pid, 0)
+
+	def test_wrapped_slot_is_overwritten_not_merged(self):
+		sampler = SystemMetricsSampler(capacity=10)
+		t0 = datetime(2026, 1, 5, 10, 0, tzinfo=UTC).timestamp()
+		sampler.sample(t0, _system_metrics(100))
+		sampler.flush_now()
+		later = t0 + 60 * 1440  # same 1m slot, one ring length later
+		self.assertEqual(bucket_slot(t0, "1m")[1], bucket_slot(later, "1m")[1])
+		sampler.sample(later, _system_metrics(900))
+		sampler.flush_now()
+
+		bucket = SystemMetricBucket.objects.get(metric="rss_kb", resolution="1m")
+		self.assertEqual((bucket.min_value, bucket.count), (900, 1))
+		self.assertEqual(bucket.bucket_start.timestamp(), later)
+
+	@override_settings(RSS_GROWTH_WINDOW_MIN=60, RSS_GROWTH_ALERT_KB_PER_HOUR=1024)
+	def test_rss_growth_alert_is_raised_once(self):
+		now = timezone.now().replace(second=0, microsecond=0)
+		for i in range(30):
+			start = now - timedelta(minutes=30 - i)
+			rss = 100_000 + i * 100  # +6000 kB/h
+			SystemMetricBucket.objects.create(
+				host="web-1", pid=42, resolution="1m", slot=i, metric="rss_kb",
+				bucket_start=start, min_value=rss, max_value=rss, sum_value=rss, count=1,
+			)
+
+		alerts = check_rss_growth(now=now)
+
+		self.assertEqual([(a["host"], a["pid"]) for a in alerts], [("web-1", 42)])
+		self.assertAlmostEqual(alerts[0]["slope_kb_per_hour"], 6000, delta=1)
+		check_rss_growth(now=now)
+		self.assertEqual(AuditEvent.objects.filter(action="alert.rss_growth").count(), 1)
+
+
+def _stat(calls, total_ms, query="SELECT 1", **extra):
+	return {"query": query, "calls": calls, "total_ms": total_ms, "rows": calls, **extra}
+
+
+class StatementSnapshotTests(TestCase):
+	def test_interval_deltas_and_regressions(self):
+		base = {1: _stat(100, 100.0), 2: _stat(50, 500.0), 3: _stat(500, 50.0)}
+		head = {1: _stat(200, 400.0), 2: _stat(60, 600.0), 3: _stat(10, 5.0), 4: _stat(5, 5.0)}
+
+		deltas = {d.queryid: d for d in diff_statement_stats(base, head, min_calls=20, ratio=1.5)}
+
+		self.assertEqual((deltas[1].calls, deltas[1].total_ms, deltas[1].mean_ms), (100, 300.0, 3.0))
+		self.assertTrue(deltas[1].regressed)  # 3 ms vs 1 ms before
+		self.assertFalse(deltas[2].regressed)  # too few calls in the interval
+		self.assertTrue(deltas[3].reset)  # calls went backwards: counted from zero
+		self.assertEqual(deltas[3].calls, 10)
+		self.assertTrue(deltas[4].new)
+		self.assertEqual(list(deltas), [1, 2, 3, 4])  # heaviest interval total first
+
+	def test_compare_defaults_to_last_deploy_marker(self):
+		take_statement_snapshot(rows=[{"queryid": 7, **_stat(10, 10.0)}])
+		deploy = take_statement_snapshot(rows=[{"queryid": 7, **_stat(20, 20.0)}], label="v2", kind=SnapshotKind.DEPLOY)
+		take_statement_snapshot(rows=[{"queryid": 7, **_stat(50, 110.0)}])
+		self.assertEqual(StatementStat.objects.count(), 3)
+
+		diff = get_statement_diff()
+
+		self.assertEqual(diff["base"], deploy)
+		self.assertEqual([(d.queryid, d.calls, d.total_ms) for d in diff["deltas"]], [(7, 30, 90.0)])
+		self.assertEqual(diff["regressions"], 1)
+
+	@override_settings(STATEMENT_SNAPSHOT_MAX_ROWS=1)
+	def test_truncated_base_has_no_baseline_for_missing_statements(self):
+		base = take_statement_snapshot(rows=[{"queryid": 7, **_stat(10, 10.0)}])
+		head = take_statement_snapshot(rows=[{"queryid": 7, **_stat(20, 20.0)}, {"queryid": 8, **_stat(900, 9000.0)}])
+
+		self.assertEqual([d.queryid for d in diff_snapshots(base, head)], [7])
+		with override_settings(STATEMENT_SNAPSHOT_MAX_ROWS=2):
+			self.assertEqual([(d.queryid, d.new) for d in diff_snapshots(base, head)], [(8, True), (7, False)])
+
+	@override_settings(STATEMENT_SNAPSHOT_RETENTION_DAYS=14)
+	def test_retention_prunes_snapshots_and_rows(self):
+		old = take_statement_snapshot(rows=[{"queryid": 7, **_stat(10, 10.0)}])
+		take_statement_snapshot(rows=[{"queryid": 7, **_stat(20, 20.0)}])
+		past = timezone.now() - timedelta(days=20)
+		StatementSnapshot.objects.filter(pk=old.pk).update(taken_at=past)
+		StatementStat.objects.filter(snapshot=old).update(taken_at=past)
+
+		run_retention(
+			schemas=["public"], model_labels=["platform.StatementStat", "platform.StatementSnapshot"], run_key="t", workers=1
+		)
+
+		self.assertFalse(StatementSnapshot.objects.filter(pk=old.pk).exists())
+		self.assertEqual(StatementStat.objects.count(), 1)
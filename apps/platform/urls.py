@@ -8,11 +8,14 @@ urlpatterns = [
 	path("", views.dashboard_view, name="dashboard"),
 	path("tests/", views.tests_view, name="tests"),
 	path("db/", views.db_view, name="db"),
+	path("db/activity/", views.db_activity_view, name="db_activity"),
+	path("db/snapshots/", views.db_snapshots_view, name="db_snapshots"),
 	path("switch/", views.tenant_switch_view, name="tenant_switch"),
 	path("entitlements/", views.entitlements_dashboard_view, name="entitlements_dashboard"),
 	path("entitlements/plans/", views.plan_list_view, name="plan_list"),
 	path("entitlements/tenants/", views.tenant_plan_list_view, name="tenant_plan_list"),
 	path("entitlements/tenants/<int:tenant_id>/set/", views.tenant_plan_set_view, name="tenant_plan_set"),
+	path("entitlements/throttled/", views.api_throttled_view, name="api_throttled"),
 	path("tenant-requests/", views.tenant_request_list_view, name="tenant_request_list"),
 	path(
 		"tenant-requests/<int:pk>/approve-provision/",
@@ -31,6 +34,12 @@ urlpatterns = [
 	path("audits/", views.audit_list_view, name="audit_list"),
 	path("alerts/", views.alert_list_view, name="alert_list"),
 	path("metrics/", views.metrics_view, name="metrics"),
+	path("latency/", views.latency_view, name="latency"),
+	path("usage/", views.usage_view, name="usage"),
+	path("usage/api/", views.usage_api_view, name="usage_api"),
+	path("profiles/", views.profile_list_view, name="profile_list"),
+	path("profiles/<str:request_id>/", views.profile_detail_view, name="profile_detail"),
+	path("profiles/<str:request_id>/download/", views.profile_download_view, name="profile_download"),
 	path("system-logs/", views.system_logs_view, name="system_logs"),
 ]
 
@@ -4,14 +4,17 @@ import json
 import shutil
 import subprocess
 from collections.abc import Callable
+from datetime import UTC, timedelta
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import Http404, HttpRequest, HttpResponse
+from django.db.models import Q
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from apps.audits.models import AuditEvent, AuditStatus
 from apps.audits.services import audit_log
@@ -19,6 +22,7 @@ from apps.entitlements.models import Plan, TenantPlan, TenantPlanStatus
 from apps.logs.metrics import get_system_metrics
 from apps.logs.models import LogEntry
 from apps.onboarding.models import TenantRequest, TenantRequestStatus
+from apps.platform.models import RequestProfile
 from apps.tenancy.models import Domain, Tenant, TenantStatus
 from apps.tenancy.services.onboarding import activate_tenant, provision_tenant, suspend_tenant
 
@@ -84,6 +88,19 @@ def entitlements_dashboard_view(request: HttpRequest) -> HttpResponse:
 	return render(request, "platform/entitlements_dashboard.html")
 
 
+@staff_member_required
+@_public_schema_required
+def api_throttled_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Tenants currently hitting their API burst limit (token bucket empty).
+	"""
+	return render(
+		request,
+		"platform/api_throttled.html",
+		{"rows": platform_services.get_throttled_tenants(), "window_s": getattr(settings, "API_THROTTLED_WINDOW_S", 300)},
+	)
+
+
 @staff_member_required
 @_public_schema_required
 def plan_list_view(request: HttpRequest) -> HttpResponse:
@@ -612,7 +629,8 @@ def audit_list_view(request: HttpRequest) -> HttpResponse:
 @_public_schema_required
 def alert_list_view(request: HttpRequest) -> HttpResponse:
 	"""
-	Alerts = high-severity runtime logs + failing audit events (simple, production-safe baseline).
+	Alerts = high-severity runtime logs + failing audit events (simple, production-safe baseline),
+	plus the audit outbox backlog when AUDIT_WRITE_MODE="outbox".
 	"""
 	schema = (request.GET.get("schema") or "public").strip()
 	limit = min(int(request.GET.get("limit") or 200), 1000)
@@ -645,7 +663,14 @@ def alert_list_view(request: HttpRequest) -> HttpResponse:
 	return render(
 		request,
 		"platform/alert_list.html",
-		{"schema": schema, "schemas": schemas, "limit": limit, "error_logs": error_logs, "failed_audits": failed_audits},
+		{
+			"schema": schema,
+			"schemas": schemas,
+			"limit": limit,
+			"error_logs": error_logs,
+			"failed_audits": failed_audits,
+			"outbox": platform_services.get_audit_outbox_lag(),
+		},
 	)
 
 
@@ -697,8 +722,175 @@ def system_logs_view(request: HttpRequest) -> HttpResponse:
 @staff_member_required
 @_public_schema_required
 def metrics_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Current system metrics (this worker) + history from the per-process samplers:
+	min/avg/max chart for metric=<name> at res=1m|1h|1d, and RSS growth per process.
+	Optional: host=<hostname>, pid=<pid> (0 = host-wide metrics).
+	"""
+	from apps.logs.metrics_history import METRIC_NAMES, RESOLUTIONS
+
 	m = get_system_metrics()
-	return render(request, "platform/metrics.html", {"m": m})
+	metric = request.GET.get("metric") if request.GET.get("metric") in METRIC_NAMES else "rss_kb"
+	resolution = request.GET.get("res") if request.GET.get("res") in RESOLUTIONS else "1m"
+	step_s, slots = RESOLUTIONS[resolution]
+	max_hours = step_s * slots // 3600
+	default_hours = {"1m": 6, "1h": 48, "1d": 24 * 90}[resolution]
+	hours = min(max(int(request.GET.get("hours") or default_hours), 1), max_hours)
+	host = (request.GET.get("host") or "").strip()
+	pid = request.GET.get("pid")
+	pid = int(pid) if pid and pid.isdigit() else None
+
+	series = platform_services.get_system_metric_series(
+		metric=metric, resolution=resolution, since=timezone.now() - timedelta(hours=hours), host=host, pid=pid
+	)
+	window = int(getattr(settings, "RSS_GROWTH_WINDOW_MIN", 60))
+	threshold = float(getattr(settings, "RSS_GROWTH_ALERT_KB_PER_HOUR", 50 * 1024))
+	processes = platform_services.get_rss_growth(window_minutes=window, threshold_kb_per_hour=threshold)
+	return render(
+		request,
+		"platform/metrics.html",
+		{
+			"m": m,
+			"metric": metric,
+			"metrics": METRIC_NAMES,
+			"resolution": resolution,
+			"resolutions": list(RESOLUTIONS),
+			"hours": hours,
+			"max_hours": max_hours,
+			"host": host,
+			"pid": "" if pid is None else pid,
+			"series": series,
+			"chart": platform_services.build_metric_chart(series),
+			"processes": processes,
+			"growth_window": window,
+			"growth_threshold_mb": threshold / 1024,
+		},
+	)
+
+
+@staff_member_required
+@_public_schema_required
+def latency_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Request latency percentiles per route, merged from every web worker's histograms.
+	Optional: schema=<tenant_schema>, route=<url name> (adds a percentile-over-time table).
+	"""
+	hours = min(max(int(request.GET.get("hours") or 24), 1), 24 * 14)
+	schema = (request.GET.get("schema") or "").strip()
+	route = (request.GET.get("route") or "").strip()
+	since = timezone.now() - timedelta(hours=hours)
+
+	rows = platform_services.get_route_latency_summary(since=since, tenant_schema=schema)
+	series = []
+	if route:
+		# ~48 points across the window, never finer than the flush period.
+		step_s = max(int(getattr(settings, "LATENCY_PERIOD_S", 60)), hours * 3600 // 48)
+		series = platform_services.get_route_latency_series(route=route, since=since, step_s=step_s, tenant_schema=schema)
+
+	schemas = list(Tenant.objects.values_list("schema_name", flat=True).order_by("schema_name"))
+	return render(
+		request,
+		"platform/latency.html",
+		{"rows": rows, "series": series, "hours": hours, "schema": schema, "schemas": schemas, "route": route},
+	)
+
+
+@staff_member_required
+@_public_schema_required
+def profile_list_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Stored request profiles (manual + slow-request samples). Optional: q=<path or request id>.
+	"""
+	q = (request.GET.get("q") or "").strip()
+	limit = min(int(request.GET.get("limit") or 100), 500)
+	qs = RequestProfile.objects.defer("stacks").order_by("-created_at")
+	if q:
+		qs = qs.filter(Q(path__icontains=q) | Q(request_id=q) | Q(route=q))
+	return render(request, "platform/profile_list.html", {"profiles": list(qs[:limit]), "q": q, "limit": limit})
+
+
+@staff_member_required
+@_public_schema_required
+def profile_detail_view(request: HttpRequest, request_id: str) -> HttpResponse:
+	profile = RequestProfile.objects.filter(request_id=request_id).order_by("-created_at").first()
+	if profile is None:
+		raise Http404()
+	rows, total = platform_services.build_flame_rows(profile.stacks)
+	for r in rows:
+		r["top_px"] = r["depth"] * 18
+	depth = max((r["depth"] for r in rows), default=0) + 1
+	return render(
+		request,
+		"platform/profile_detail.html",
+		{"profile": profile, "rows": rows, "total": total, "height_px": depth * 18},
+	)
+
+
+@staff_member_required
+@_public_schema_required
+def profile_download_view(request: HttpRequest, request_id: str) -> HttpResponse:
+	"""
+	Folded stacks as text (load into speedscope.app or flamegraph.pl).
+	"""
+	profile = RequestProfile.objects.filter(request_id=request_id).order_by("-created_at").first()
+	if profile is None:
+		raise Http404()
+	resp = HttpResponse(profile.stacks + "\n", content_type="text/plain; charset=utf-8")
+	resp["Content-Disposition"] = f'attachment; filename="profile-{profile.request_id}.folded"'
+	return resp
+
+
+@staff_member_required
+@_public_schema_required
+def usage_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Top consumers: per-tenant requests, wall time, DB time, queries and bytes served.
+	"""
+	hours = min(max(int(request.GET.get("hours") or 24), 1), 24 * 90)
+	order = (request.GET.get("order") or "wall_ms").strip()
+	rows = platform_services.get_top_consumers(since=timezone.now() - timedelta(hours=hours), order_by=order)
+	return render(
+		request,
+		"platform/usage.html",
+		{"rows": rows, "hours": hours, "order": order, "metrics": platform_services.USAGE_METRICS},
+	)
+
+
+@staff_member_required
+@_public_schema_required
+def usage_api_view(request: HttpRequest) -> HttpResponse:
+	"""
+	JSON usage for billing/entitlements tooling.
+
+	- ?tenant=<schema>: totals + hourly rows for that tenant
+	- otherwise: top consumers
+	Window: ?since=<ISO datetime>&until=<ISO datetime>, or ?hours=N (default 24).
+	"""
+	try:
+		since = _parse_dt(request.GET.get("since"))
+		until = _parse_dt(request.GET.get("until"))
+	except ValueError:
+		return JsonResponse({"ok": False, "error": "invalid_datetime"}, status=400)
+	if since is None:
+		hours = min(max(int(request.GET.get("hours") or 24), 1), 24 * 400)
+		since = timezone.now() - timedelta(hours=hours)
+
+	tenant = (request.GET.get("tenant") or "").strip()
+	if tenant:
+		data = platform_services.get_tenant_usage(tenant, since=since, until=until)
+	else:
+		order = (request.GET.get("order") or "wall_ms").strip()
+		data = {"tenants": platform_services.get_top_consumers(since=since, until=until, order_by=order)}
+	return JsonResponse({"ok": True, "since": since, "until": until, **data})
+
+
+def _parse_dt(value: str | None):
+	if not value:
+		return None
+	dt = parse_datetime(value.strip())
+	if dt is None:
+		raise ValueError(value)
+	return dt if timezone.is_aware(dt) else timezone.make_aware(dt, UTC)
 
 
 @staff_member_required
@@ -710,6 +902,9 @@ def db_view(request: HttpRequest) -> HttpResponse:
 	Notes:
 	- This is cluster-wide, not schema-per-tenant. We provide a best-effort
 	  schema filter by matching SQL text (useful when queries include schema-qualified tables).
+	- Captured slow-query plans (SLOW_QUERY_EXPLAIN) are per schema: seq scans on large
+	  tables are highlighted and selective ones listed as missing-index candidates.
+	  Optional: flagged=1 (only plans with a large seq scan).
 	"""
 	limit = min(int(request.GET.get("limit") or 50), 200)
 	schema_filter = (request.GET.get("schema_filter") or "").strip()
@@ -729,6 +924,11 @@ def db_view(request: HttpRequest) -> HttpResponse:
 		with schema_context("public"):
 			schemas = list(Tenant.objects.exclude(schema_name="public").values_list("schema_name", flat=True))
 
+	# Plans captured by SLOW_QUERY_EXPLAIN (stored per tenant schema, so this filter is exact).
+	flagged_only = request.GET.get("flagged") == "1"
+	plans = platform_services.get_query_plans(tenant_schema=schema_filter, flagged_only=flagged_only, limit=limit)
+	index_candidates = platform_services.get_index_candidates(tenant_schema=schema_filter)
+
 	return render(
 		request,
 		"platform/db.html",
@@ -740,6 +940,75 @@ def db_view(request: HttpRequest) -> HttpResponse:
 			"top_total": top_total,
 			"top_mean": top_mean,
 			"top_calls": top_calls,
+			"plans": plans,
+			"flagged_only": flagged_only,
+			"index_candidates": index_candidates,
+			"explain_mode": getattr(settings, "SLOW_QUERY_EXPLAIN", "off"),
+		},
+	)
+
+
+@staff_member_required
+@_public_schema_required
+def db_snapshots_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Per-interval pg_stat_statements deltas between two snapshots / deploy markers.
+
+	Optional: base, head (snapshot ids), regressed=1, limit.
+	"""
+	def _id(name: str) -> int | None:
+		value = request.GET.get(name) or ""
+		return int(value) if value.isdigit() else None
+
+	limit = min(int(request.GET.get("limit") or 100), 500)
+	regressed_only = request.GET.get("regressed") == "1"
+	diff = platform_services.get_statement_diff(
+		base_id=_id("base"), head_id=_id("head"), regressed_only=regressed_only, limit=limit
+	)
+	return render(
+		request,
+		"platform/db_snapshots.html",
+		{
+			"limit": limit,
+			"regressed_only": regressed_only,
+			"ratio": getattr(settings, "STATEMENT_REGRESSION_RATIO", 1.5),
+			"min_calls": getattr(settings, "STATEMENT_REGRESSION_MIN_CALLS", 20),
+			**diff,
+		},
+	)
+
+
+@staff_member_required
+@_public_schema_required
+def db_activity_view(request: HttpRequest) -> HttpResponse:
+	"""
+	Live pg_stat_activity, attributed per tenant / route / Celery task via the SQL
+	commenter tags. Optional: schema_filter, idle=1 (include idle sessions).
+	"""
+	schema_filter = (request.GET.get("schema_filter") or "").strip()
+	include_idle = request.GET.get("idle") == "1"
+	error = ""
+	activity = {"sessions": [], "by_tenant": [], "by_source": []}
+	try:
+		activity = platform_services.get_db_activity(tenant_schema=schema_filter, include_idle=include_idle)
+	except Exception as e:
+		error = f"{type(e).__name__}: {e}"
+
+	schemas: list[str] = []
+	if schema_context is not None:
+		with schema_context("public"):
+			schemas = list(Tenant.objects.values_list("schema_name", flat=True))
+
+	return render(
+		request,
+		"platform/db_activity.html",
+		{
+			"schema_filter": schema_filter,
+			"schemas": schemas,
+			"include_idle": include_idle,
+			"error": error,
+			"commenter_enabled": getattr(settings, "SQL_COMMENTER_ENABLED", True),
+			**activity,
 		},
 	)
 
@@ -3,6 +3,7 @@ from __future__ import annotations
 from django import forms
 
 from apps.core.forms import BootstrapModelForm
+from apps.entitlements.gauges import GAUGE_UNITS, get_usage_gauge
 from apps.entitlements.services import QUOTA_MAX_UNITS, enforce_quota
 from apps.properties.models import Property, Unit
 
@@ -44,7 +45,7 @@ class UnitForm(BootstrapModelForm):
 		if not tenant or getattr(tenant, "schema_name", None) == "public":
 			return cleaned
 
-		used_units = Unit.objects.count()
+		used_units = get_usage_gauge(tenant, GAUGE_UNITS)
 		try:
 			enforce_quota(
 				tenant,
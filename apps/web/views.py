@@ -6,6 +6,7 @@ from apps.addresses.forms import AddressForm
 from apps.addresses.models import Address
 from apps.contacts.forms import ContactForm
 from apps.contacts.models import Contact
+from apps.entitlements.gauges import GAUGE_PROPERTIES, GAUGE_UNITS, get_usage_gauge
 from apps.leases.forms import LeaseForm
 from apps.leases.models import Lease
 from apps.portfolio.forms import PortfolioForm
@@ -40,8 +41,9 @@ def crm_dashboard_view(request):
 	ctx = {
 		"totals": {
 			"portfolios": Portfolio.objects.count(),
-			"properties": Property.objects.count(),
-			"units": Unit.objects.count(),
+			# Billable counts come from the tenant's usage gauges (no table scan).
+			"properties": get_usage_gauge(tenant, GAUGE_PROPERTIES),
+			"units": get_usage_gauge(tenant, GAUGE_UNITS),
 			"leases": Lease.objects.count(),
 			"contacts": Contact.objects.count(),
 			"addresses": Address.objects.count(),
@@ -114,12 +114,35 @@ TENANT_MODEL = "tenancy.Tenant"
 TENANT_DOMAIN_MODEL = "tenancy.Domain"
 PUBLIC_SCHEMA_NAME = "public"
 
+# SQL commenter: every statement gets a trailing /*request_id=..,route=..,tenant=..*/
+# comment (Celery: task=..). pg_stat_statements ignores comments when fingerprinting;
+# Platform -> DB -> Activity parses them out of pg_stat_activity.
+SQL_COMMENTER_ENABLED = os.environ.get("SQL_COMMENTER_ENABLED", "1") in ("1", "true", "True")
+
 
 # -------------------------------------------------
 # Auth (tenant-local users)
 # -------------------------------------------------
 AUTH_USER_MODEL = "accounts.User"
 SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+# -------------------------------------------------
+# Cache (Redis when REDIS_CACHE_URL is set; per-process memory otherwise)
+# -------------------------------------------------
+REDIS_CACHE_URL = os.environ.get("REDIS_CACHE_URL", "").strip()
+if REDIS_CACHE_URL:
+	CACHES = {
+		"default": {
+			"BACKEND": "django.core.cache.backends.redis.RedisCache",
+			"LOCATION": REDIS_CACHE_URL,
+		}
+	}
+else:
+	CACHES = {
+		"default": {
+			"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+		}
+	}
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/accounts/profile/"
 LOGOUT_REDIRECT_URL = "/login/"
@@ -155,19 +178,29 @@ if SENTRY_DSN:
 # -------------------------------------------------
 MIDDLEWARE = [
 	"django.middleware.security.SecurityMiddleware",
+	# Server-Timing header; the *TimingMark entries below close each phase
+	"apps.logs.timing.ServerTimingMiddleware",
 	
 	# MUST be before auth/session middleware
 	"django_tenants.middleware.main.TenantMainMiddleware",
+	"apps.logs.timing.TenantTimingMark",
 	"apps.audits.middleware.AuditContextMiddleware",
+	# Tag SQL with tenant / route / request_id comments (after the request id exists)
+	"apps.logs.sqlcomment.SQLCommenterMiddleware",
 	
 	
 	"apps.tenancy.middleware.TenantStatusMiddleware",
+	"apps.entitlements.middleware.EntitlementSnapshotMiddleware",
 	"apps.entitlements.middleware.ApiQuotaMiddleware",
+	"apps.logs.timing.ContextTimingMark",
 	
 	"django.contrib.sessions.middleware.SessionMiddleware",
 	"django.middleware.common.CommonMiddleware",
 	"django.middleware.csrf.CsrfViewMiddleware",
 	"django.contrib.auth.middleware.AuthenticationMiddleware",
+	"apps.logs.timing.AuthTimingMark",
+	# Stack-sampling profiler (staff ?_profile=1, signed header, or sampled slow requests)
+	"apps.logs.profiling.RequestProfilerMiddleware",
 	"django.contrib.messages.middleware.MessageMiddleware",
 	# Guard Django admin access (public superuser-only; disabled on tenant schemas)
 	"apps.core.middleware.AdminPortalGuardMiddleware",
@@ -176,6 +209,7 @@ MIDDLEWARE = [
 	"apps.logs.middleware.PerformanceAlertMiddleware",
 	# Persist unhandled exceptions as alerts
 	"apps.logs.middleware.ExceptionAlertMiddleware",
+	"apps.logs.timing.ViewTimingMark",
 ]
 
 # -------------------------------------------------
@@ -184,6 +218,47 @@ MIDDLEWARE = [
 # - "soft": allow but log/audit quota violations
 # - "hard": raise ValidationError on violations (blocking writes)
 ENTITLEMENTS_ENFORCEMENT = os.environ.get("ENTITLEMENTS_ENFORCEMENT", "soft").strip().lower()
+# Entitlement snapshots (plan quotas / flags + overrides) are cached per process (LRU)
+# and in the shared cache; Plan / TenantPlan saves invalidate them.
+ENTITLEMENT_CACHE_ENABLED = os.environ.get("ENTITLEMENT_CACHE_ENABLED", "1") in ("1", "true", "True")
+ENTITLEMENT_CACHE_TTL_S = int(os.environ.get("ENTITLEMENT_CACHE_TTL_S", "30"))
+ENTITLEMENT_CACHE_MAX_TENANTS = int(os.environ.get("ENTITLEMENT_CACHE_MAX_TENANTS", "1024"))
+ENTITLEMENT_SHARED_CACHE_TTL_S = int(os.environ.get("ENTITLEMENT_SHARED_CACHE_TTL_S", "300"))
+# API request counters: "cache" = atomic INCR in the cache (Redis), reconciled into
+# QuotaUsage every QUOTA_COUNTER_FLUSH_INTERVAL_S; "db" = locked QuotaUsage row per request.
+# "cache" needs REDIS_CACHE_URL: with the per-process LocMem cache, and on cache errors,
+# counting falls back to "db".
+QUOTA_COUNTER_BACKEND = os.environ.get("QUOTA_COUNTER_BACKEND", "cache").strip().lower()
+QUOTA_COUNTER_FLUSH_INTERVAL_S = int(os.environ.get("QUOTA_COUNTER_FLUSH_INTERVAL_S", "60"))
+# API burst limits (Plan.quotas api_rate_per_second / api_burst, api_key_rate_per_second /
+# api_key_burst): "cache" = token buckets in Redis (Lua), in-process buckets when the
+# cache is not Redis or unreachable; "local" = in-process only.
+API_RATE_LIMIT_BACKEND = os.environ.get("API_RATE_LIMIT_BACKEND", "cache").strip().lower()
+# Platform "Throttled" page lists tenants throttled within this window.
+API_THROTTLED_WINDOW_S = int(os.environ.get("API_THROTTLED_WINDOW_S", "300"))
+
+# -------------------------------------------------
+# Audit events
+# -------------------------------------------------
+# Committed events of a request / Celery task are written with one INSERT per schema
+# at response / task end; a long task flushes every AUDIT_BATCH_MAX_EVENTS events.
+AUDIT_BATCH_MAX_EVENTS = int(os.environ.get("AUDIT_BATCH_MAX_EVENTS", "500"))
+# Model auditing covers every apps.* model except these ("app.Model" or "app.*").
+AUDIT_EXCLUDED_MODELS = ("logs.LogEntry", "platform.*")
+# Per-model options, e.g. {"properties.Unit": {"exclude_fields": ["updated_at"], "diff": True, "sample_rate": 1.0}}
+AUDIT_MODEL_OPTIONS: dict[str, dict] = {}
+# Bulk update() / bulk_create() / bulk_update() write one aggregated event per chunk of rows.
+AUDIT_BULK_CHUNK_SIZE = int(os.environ.get("AUDIT_BULK_CHUNK_SIZE", "1000"))
+# "direct": write AuditEvent rows from the request / task (above).
+# "outbox": append to the narrow per-schema AuditOutbox in the caller's transaction;
+#           Celery drains it into AuditEvent (SKIP LOCKED, so drainers can run in parallel).
+AUDIT_WRITE_MODE = os.environ.get("AUDIT_WRITE_MODE", "direct").strip().lower()
+AUDIT_OUTBOX_BATCH_SIZE = int(os.environ.get("AUDIT_OUTBOX_BATCH_SIZE", "1000"))
+AUDIT_OUTBOX_DRAIN_INTERVAL_S = int(os.environ.get("AUDIT_OUTBOX_DRAIN_INTERVAL_S", "5"))
+# Platform alerts flag outboxes whose oldest row is older than this.
+AUDIT_OUTBOX_LAG_ALERT_S = int(os.environ.get("AUDIT_OUTBOX_LAG_ALERT_S", "60"))
+# Drain right after commit in-process (tests / local dev without a worker).
+AUDIT_OUTBOX_SYNC = os.environ.get("AUDIT_OUTBOX_SYNC", "0") in ("1", "true", "True")
 
 # -------------------------------------------------
 # Celery (async jobs)
@@ -196,13 +271,67 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_ALWAYS_EAGER = os.environ.get("CELERY_TASK_ALWAYS_EAGER", "0") in ("1", "true", "True")
 
 CELERY_BEAT_SCHEDULE = {
-	"audit.purge.daily": {
-		"task": "apps.logs.tasks.purge_audit_events_task",
+	"retention.purge.daily": {
+		"task": "apps.platform.tasks.purge_retention_task",
 		"schedule": 60 * 60 * 24,
-		"args": (90,),
+	},
+	"partitions.maintain.daily": {
+		"task": "apps.logs.tasks.maintain_partitions_task",
+		"schedule": 60 * 60 * 24,
+	},
+	"system_metrics.check": {
+		"task": "apps.platform.tasks.check_system_metrics_task",
+		"schedule": 60 * 15,
+	},
+	"statements.snapshot": {
+		"task": "apps.platform.tasks.snapshot_statements_task",
+		"schedule": int(os.environ.get("STATEMENT_SNAPSHOT_INTERVAL_S", "3600")),
+	},
+	"entitlements.gauges.reconcile.daily": {
+		"task": "apps.entitlements.tasks.reconcile_usage_gauges_task",
+		"schedule": 60 * 60 * 24,
+	},
+	"entitlements.counters.reconcile": {
+		"task": "apps.entitlements.tasks.reconcile_usage_counters_task",
+		"schedule": QUOTA_COUNTER_FLUSH_INTERVAL_S,
+	},
+	"audits.outbox.drain": {
+		"task": "apps.logs.tasks.drain_audit_outbox_task",
+		"schedule": AUDIT_OUTBOX_DRAIN_INTERVAL_S,
 	},
 }
 
+# -------------------------------------------------
+# Time-partitioned append-only tables (LogEntry, AuditEvent)
+# -------------------------------------------------
+# - granularity: "month" or "day" (applies to partitions created from now on)
+# - premake: how many future partitions `maintain_partitions` keeps ready
+# - retention: whole partitions older than N days are dropped (0 = keep forever)
+PARTITION_GRANULARITY = os.environ.get("PARTITION_GRANULARITY", "month").strip().lower()
+PARTITION_PREMAKE = int(os.environ.get("PARTITION_PREMAKE", "3"))
+LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", "30"))
+AUDIT_RETENTION_DAYS = int(os.environ.get("AUDIT_RETENTION_DAYS", "90"))
+
+# -------------------------------------------------
+# Retention (`purge_retention`, apps.platform.retention)
+# -------------------------------------------------
+# - per-model days: LOG_/AUDIT_RETENTION_DAYS above, plus activity (0 = keep forever)
+# - deletes run in PK-ordered batches, one short transaction each, schemas in parallel
+# - activity / notes are tenant data and kept by default; to purge them set e.g.
+#   ACTIVITY_RETENTION_DAYS=365 (see docs/PRODUCTION.md "Retention")
+ACTIVITY_RETENTION_DAYS = int(os.environ.get("ACTIVITY_RETENTION_DAYS", "0"))
+NOTE_RETENTION_DAYS = int(os.environ.get("NOTE_RETENTION_DAYS", "0"))
+LATENCY_RETENTION_DAYS = int(os.environ.get("LATENCY_RETENTION_DAYS", "30"))
+PROFILE_RETENTION_DAYS = int(os.environ.get("PROFILE_RETENTION_DAYS", "14"))
+TENANT_USAGE_RETENTION_DAYS = int(os.environ.get("TENANT_USAGE_RETENTION_DAYS", "400"))
+QUERY_PLAN_RETENTION_DAYS = int(os.environ.get("QUERY_PLAN_RETENTION_DAYS", "30"))
+STATEMENT_SNAPSHOT_RETENTION_DAYS = int(os.environ.get("STATEMENT_SNAPSHOT_RETENTION_DAYS", "14"))
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "5000"))
+RETENTION_BATCH_SLEEP_MS = int(os.environ.get("RETENTION_BATCH_SLEEP_MS", "50"))
+RETENTION_WORKERS = int(os.environ.get("RETENTION_WORKERS", "4"))
+RETENTION_LOCK_TIMEOUT_MS = int(os.environ.get("RETENTION_LOCK_TIMEOUT_MS", "2000"))
+RETENTION_MAX_RETRIES = int(os.environ.get("RETENTION_MAX_RETRIES", "5"))
+
 # -------------------------------------------------
 # URLs / WSGI
 # -------------------------------------------------
@@ -214,7 +343,9 @@ WSGI_APPLICATION = "config.wsgi.application"
 # -------------------------------------------------
 TEMPLATES = [
 	{
-		"BACKEND": "django.template.backends.django.DjangoTemplates",
+		# DjangoTemplates + render time for the Server-Timing header
+		"BACKEND": "apps.logs.timing.TimedDjangoTemplates",
+		"NAME": "django",
 		"DIRS": [BASE_DIR / "templates"],
 		"APP_DIRS": True,
 		"OPTIONS": {
@@ -267,6 +398,12 @@ LOGGING = {
 		"db": {
 			"level": "INFO",
 			"class": "apps.logs.handlers.DatabaseLogHandler",
+			# - "sync": one INSERT per record on the calling thread
+			# - "async": queue in-process, bulk insert per schema from a background thread
+			"mode": os.environ.get("LOG_DB_MODE", "sync").strip().lower(),
+			"batch_size": int(os.environ.get("LOG_DB_BATCH_SIZE", "200")),
+			"flush_interval": float(os.environ.get("LOG_DB_FLUSH_INTERVAL", "2.0")),
+			"max_queue": int(os.environ.get("LOG_DB_MAX_QUEUE", "10000")),
 		},
 	},
 	"root": {
@@ -276,13 +413,104 @@ LOGGING = {
 	"loggers": {
 		# allow fine-grained level control without flooding logs
 		"db.query": {"level": "WARNING"},
+		"db.profile": {"level": "WARNING"},
 		"web.request": {"level": "WARNING"},
 	},
 }
 
+# Applied by DatabaseLogHandler before anything is written:
+# - sample_rates: fraction of sub-ERROR records kept per logger (dotted-prefix match)
+# - burst/window_s: identical records (logger + template + pathname + lineno) beyond
+#   `burst` per window are dropped and reported as one "Suppressed N similar records" row
+LOG_SAMPLING = {
+	"window_s": int(os.environ.get("LOG_RATE_WINDOW_S", "60")),
+	"burst": int(os.environ.get("LOG_RATE_BURST", "20")),
+	"max_keys": 10_000,
+	"sample_rates": {
+		"db.query": float(os.environ.get("LOG_SAMPLE_DB_QUERY", "1.0")),
+		"web.request": float(os.environ.get("LOG_SAMPLE_WEB_REQUEST", "1.0")),
+	},
+}
+
+# Browser log ingestion (/logs/client/):
+# - max_events/max_bytes: per POST (the browser batches and flushes with sendBeacon)
+# - per_ip/per_tenant: POSTs allowed per window_s before 429 (0 = unlimited)
+CLIENT_LOG_INGEST = {
+	"max_events": int(os.environ.get("CLIENT_LOG_MAX_EVENTS", "50")),
+	"max_bytes": int(os.environ.get("CLIENT_LOG_MAX_BYTES", "64000")),
+	"window_s": int(os.environ.get("CLIENT_LOG_RATE_WINDOW_S", "60")),
+	"per_ip": int(os.environ.get("CLIENT_LOG_RATE_PER_IP", "120")),
+	"per_tenant": int(os.environ.get("CLIENT_LOG_RATE_PER_TENANT", "1200")),
+}
+
 # -------------------------------------------------
 # Alert thresholds (ms)
 # -------------------------------------------------
 SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", "1000"))
 SLOW_DB_QUERY_MS = int(os.environ.get("SLOW_DB_QUERY_MS", "200"))
+# N+1 detection: fraction of requests whose queries are fingerprinted, and how many
+# repeats of one fingerprint in a request trigger a "Query profile" log.
+DB_QUERY_PROFILE_SAMPLE_RATE = float(os.environ.get("DB_QUERY_PROFILE_SAMPLE_RATE", "1.0"))
+DB_DUPLICATE_QUERY_THRESHOLD = int(os.environ.get("DB_DUPLICATE_QUERY_THRESHOLD", "10"))
+# Slow-query EXPLAIN capture (Platform -> DB): "off" | "thread" (background thread in
+# the web worker) | "celery". A sample of slow SELECTs is explained in the tenant's
+# search_path, one plan per query fingerprint + schema per TTL.
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "off").strip().lower()
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+SLOW_QUERY_EXPLAIN_TTL_S = int(os.environ.get("SLOW_QUERY_EXPLAIN_TTL_S", "3600"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.environ.get("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "2000"))
+# Seq scans on tables with at least this many rows are flagged (index candidates when selective).
+QUERY_PLAN_LARGE_TABLE_ROWS = int(os.environ.get("QUERY_PLAN_LARGE_TABLE_ROWS", "10000"))
+# pg_stat_statements snapshots (Platform -> DB -> Snapshots): taken every
+# STATEMENT_SNAPSHOT_INTERVAL_S (beat) and by `mark_deploy`, heaviest N queryids each.
+# An interval mean >= RATIO x the mean before it (with >= MIN_CALLS calls) is a regression.
+STATEMENT_SNAPSHOT_MAX_ROWS = int(os.environ.get("STATEMENT_SNAPSHOT_MAX_ROWS", "2000"))
+STATEMENT_REGRESSION_RATIO = float(os.environ.get("STATEMENT_REGRESSION_RATIO", "1.5"))
+STATEMENT_REGRESSION_MIN_CALLS = int(os.environ.get("STATEMENT_REGRESSION_MIN_CALLS", "20"))
+
+# Per-route latency histograms (Platform -> Latency): kept in process memory and
+# added to platform.RouteLatency every flush interval, one row per route per period.
+LATENCY_HISTOGRAMS_ENABLED = os.environ.get("LATENCY_HISTOGRAMS_ENABLED", "1") in ("1", "true", "True")
+LATENCY_FLUSH_INTERVAL_S = float(os.environ.get("LATENCY_FLUSH_INTERVAL_S", "30"))
+LATENCY_PERIOD_S = int(os.environ.get("LATENCY_PERIOD_S", "60"))
+
+# Server-Timing response header (total, db, middleware phases, view, render):
+# "off" | "staff" (staff users, toggle with ?server_timing=off|on) | "all"
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "staff").strip().lower()
+
+# Request profiles (Platform -> Profiles): stacks sampled every PROFILE_INTERVAL_MS.
+# PROFILE_SLOW_SAMPLE_RATE of requests are profiled speculatively and kept only when
+# slower than SLOW_REQUEST_MS.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "1") in ("1", "true", "True")
+PROFILE_INTERVAL_MS = int(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SLOW_SAMPLE_RATE = float(os.environ.get("PROFILE_SLOW_SAMPLE_RATE", "0.05"))
+PROFILE_TOKEN_MAX_AGE_S = int(os.environ.get("PROFILE_TOKEN_MAX_AGE_S", "3600"))
+
+# Per-tenant resource accounting (Platform -> Usage): requests, wall/DB time, queries
+# and bytes per tenant, summed in memory and added to platform.TenantUsageHour.
+TENANT_USAGE_ENABLED = os.environ.get("TENANT_USAGE_ENABLED", "1") in ("1", "true", "True")
+TENANT_USAGE_FLUSH_INTERVAL_S = float(os.environ.get("TENANT_USAGE_FLUSH_INTERVAL_S", "30"))
+
+# Prometheus /metrics: every web/worker process writes its counters and histograms to
+# METRICS_MULTIPROC_DIR; a scrape sums all files (use the same dir for gunicorn and celery).
+# Access: "Authorization: Bearer $METRICS_TOKEN", or a direct (non-proxied) connection
+# from METRICS_ALLOWED_IPS (comma-separated addresses/CIDRs).
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") in ("1", "true", "True")
+METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR", "/tmp/horstenhomes-metrics")
+METRICS_FLUSH_INTERVAL_S = float(os.environ.get("METRICS_FLUSH_INTERVAL_S", "10"))
+METRICS_FILE_TTL_S = int(os.environ.get("METRICS_FILE_TTL_S", "86400"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()]
+
+# System metric history (Platform -> Metrics): every web/worker process samples load,
+# memory, disk and its own RSS every SYSTEM_METRICS_SAMPLE_S into an in-memory ring of
+# SYSTEM_METRICS_RING_SIZE samples, rolled up into 1m/1h/1d platform.SystemMetricBucket
+# rows every flush interval. A process whose RSS grows faster than
+# RSS_GROWTH_ALERT_KB_PER_HOUR over RSS_GROWTH_WINDOW_MIN raises an alert.
+SYSTEM_METRICS_ENABLED = os.environ.get("SYSTEM_METRICS_ENABLED", "1") in ("1", "true", "True")
+SYSTEM_METRICS_SAMPLE_S = float(os.environ.get("SYSTEM_METRICS_SAMPLE_S", "15"))
+SYSTEM_METRICS_FLUSH_INTERVAL_S = float(os.environ.get("SYSTEM_METRICS_FLUSH_INTERVAL_S", "60"))
+SYSTEM_METRICS_RING_SIZE = int(os.environ.get("SYSTEM_METRICS_RING_SIZE", "240"))
+RSS_GROWTH_WINDOW_MIN = int(os.environ.get("RSS_GROWTH_WINDOW_MIN", "60"))
+RSS_GROWTH_ALERT_KB_PER_HOUR = int(os.environ.get("RSS_GROWTH_ALERT_KB_PER_HOUR", str(50 * 1024)))
 
@@ -2,6 +2,9 @@ from .base import *
 
 DEBUG = True
 
+# Every response carries Server-Timing in dev (devtools -> Network -> Timing).
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "all").strip().lower()
+
 
 ALLOWED_HOSTS = [
 	"localhost",
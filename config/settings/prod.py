@@ -30,6 +30,14 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = os.environ.get("X_FRAME_OPTIONS", "DENY")
 SECURE_REFERRER_POLICY = os.environ.get("SECURE_REFERRER_POLICY", "same-origin")
 
+# -------------------------------------------------
+# Logging (prod)
+# -------------------------------------------------
+# Keep DB log writes off the request thread.
+LOGGING["handlers"]["db"]["mode"] = os.environ.get("LOG_DB_MODE", "async").strip().lower()
+# Fingerprint a sample of requests only (see DBQueryLogger).
+DB_QUERY_PROFILE_SAMPLE_RATE = float(os.environ.get("DB_QUERY_PROFILE_SAMPLE_RATE", "0.1"))
+
 # CSRF trusted origins (needed for subdomains / reverse proxy)
 _csrf_env = os.environ.get("CSRF_TRUSTED_ORIGINS", "").strip()
 if _csrf_env:
@@ -5,6 +5,7 @@ from django.contrib.auth import views as auth_views
 from django.urls import include, path, reverse_lazy
 
 from apps.accounts.views import DevPasswordResetDoneView, DevPasswordResetView, tenant_aware_login_view
+from apps.logs.views import prometheus_metrics_view
 
 urlpatterns = [
     # Public marketing site (public schema)
@@ -34,6 +35,9 @@ urlpatterns = [
     # Client/runtime logging endpoints (tenant-local and public)
     path("logs/", include("apps.logs.urls")),
 
+    # Prometheus scrape target (token or allow-listed IP, see METRICS_* settings)
+    path("metrics", prometheus_metrics_view, name="metrics"),
+
     # Auth
     # - public schema: tenant locator (redirects to tenant host)
     # - tenant schema: normal login form
@@ -46,9 +46,105 @@
     return !!result.isConfirmed;
   }
 
+  // Browser error logging: events are buffered and POSTed to /logs/client/ in batches
+  // (sendBeacon when available, so flushes survive page unload). Limits mirror
+  // CLIENT_LOG_INGEST on the server.
+  const clientLog = (() => {
+    const endpoint = "/logs/client/";
+    const maxLen = 5000;
+    const maxEvents = 50;
+    const maxBytes = 60000;
+    const maxBuffered = 200;
+    const flushDelayMs = 5000;
+    let buffer = [];
+    let timer = null;
+
+    function post(body) {
+      try {
+        if (navigator.sendBeacon && navigator.sendBeacon(endpoint, new Blob([body], { type: "application/json" }))) return;
+      } catch (_) {}
+      fetch(endpoint, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body,
+        keepalive: true,
+      }).catch(() => {});
+    }
+
+    function flush() {
+      if (timer) {
+        clearTimeout(timer);
+        timer = null;
+      }
+      while (buffer.length) {
+        let batch = buffer.splice(0, maxEvents);
+        let body = JSON.stringify(batch);
+        // Stay under the byte cap (and the ~64KB sendBeacon limit) by halving the batch.
+        while (body.length > maxBytes && batch.length > 1) {
+          buffer = batch.splice(Math.ceil(batch.length / 2)).concat(buffer);
+          body = JSON.stringify(batch);
+        }
+        if (body.length <= maxBytes) post(body);
+      }
+    }
+
+    function send(level, message, extra = {}) {
+      try {
+        if (buffer.length >= maxBuffered) return;
+        buffer.push({
+          level,
+          message: ("" + message).slice(0, maxLen),
+          url: location.href,
+          ts: Date.now(),
+          ...extra,
+        });
+        if (buffer.length >= maxEvents) flush();
+        else if (!timer) timer = setTimeout(flush, flushDelayMs);
+      } catch (_) {}
+    }
+
+    window.addEventListener("pagehide", flush);
+    document.addEventListener("visibilitychange", () => {
+      if (document.visibilityState === "hidden") flush();
+    });
+
+    // Capture unhandled errors
+    window.addEventListener("error", (e) => {
+      send("ERROR", e.message || "window.error", {
+        source: e.filename,
+        lineno: e.lineno,
+        colno: e.colno,
+        stack: e.error && e.error.stack ? e.error.stack : "",
+      });
+    });
+
+    window.addEventListener("unhandledrejection", (e) => {
+      const reason = e.reason;
+      send("ERROR", "unhandledrejection", {
+        reason: reason ? (reason.message || ("" + reason)) : "",
+        stack: reason && reason.stack ? reason.stack : "",
+      });
+    });
+
+    // Hook console warnings/errors
+    const origWarn = console.warn;
+    const origErr = console.error;
+    console.warn = function (...args) {
+      send("WARNING", args.map(String).join(" ").slice(0, maxLen));
+      return origWarn.apply(console, args);
+    };
+    console.error = function (...args) {
+      send("ERROR", args.map(String).join(" ").slice(0, maxLen));
+      return origErr.apply(console, args);
+    };
+
+    return { send, flush };
+  })();
+
   // Expose a tiny API
   window.hhUI = {
     toast,
+    log: clientLog.send,
     confirm: confirmDialog,
     alert: (opts) => (hasSwal() ? window.Swal.fire(opts) : window.alert(opts?.text || opts?.title || "")),
   };